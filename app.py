@@ -1,18 +1,38 @@
+import os
+import shutil
+import tempfile
+import uuid
 import streamlit as st
-import pandas as pd
-from model_calculations import run_full_model, FARM_SIZE_ACRES, AGRILIFE_DEFAULTS
+from rice_analysis import instrumentation
+from rice_analysis.model_calculations import DEFAULT_ESTABLISHMENT_COSTS_PER_ACRE, DEFAULT_LAND_RENT_PER_ACRE, DEFAULT_SCENARIO_PARAMS as defaults
+from rice_analysis.result_cache import cache_from_environment
+from rice_analysis.job_runner import runner_from_environment
+from rice_analysis.history_store import HISTORY_SERIES, list_datasets, open_history, store_from_environment
+from rice_analysis.model_graph import ModelGraph
+from rice_analysis.budgets import apply_overrides, budget_overrides, compile_budget_cached, get_budget, list_budgets, parse_budget_csv, parse_budget_json
 
 st.set_page_config(layout="wide")
 
+# Field results larger than this are not offered as a browser download (Streamlit keeps download data in memory).
+PORTFOLIO_DOWNLOAD_LIMIT_MB = 200
+
+# Diagnostics patch the model module for the whole server process, so they are switched on once at
+# start-up (RICE_MODEL_INSTRUMENTATION=1 streamlit run app.py), never per session.
+app_laps = instrumentation.laps("app")
+app_laps.lap("sidebar")
+
 st.title("🌾 Rice Farming Financial Scenario Modeler")
 
+app_mode = st.sidebar.radio("Mode", ("Single Scenario", "Scenario Cube", "Portfolio", "Farm Plan"), horizontal=True, help="Scenario Cube evaluates every yield x price x tenure x ratoon combination at once. Portfolio evaluates a table of fields uploaded as CSV or Parquet. Farm Plan searches tenure, acreage, ratoon share and investment level for the best return at a given risk.")
+live_update = st.sidebar.toggle("Live Update", value=True, help="Update the single scenario results as inputs change. Only the parts of the model that depend on a changed input are recomputed.")
+
 # --- I. Model Setup and Key Input Variables ---
 st.sidebar.header("I. Model Setup & Inputs")
 
 # A. Farm & Operational Basics
 st.sidebar.subheader("A. Farm & Operational Basics")
 params = {}
-params["farm_size_acres"] = st.sidebar.number_input("Farm Size (Acres)", value=FARM_SIZE_ACRES, min_value=1, step=1)
+params["farm_size_acres"] = st.sidebar.number_input("Farm Size (Acres)", value=defaults["farm_size_acres"], min_value=1, step=1)
 params["land_tenure"] = st.sidebar.selectbox("Land Tenure", ("Owned", "Rented"))
 params["primary_crop"] = "Long-Grain Rice" # Fixed for this model
 st.sidebar.caption(f"Primary Crop: {params['primary_crop']}")
@@ -20,86 +40,615 @@ params["ratoon_crop_cultivation"] = st.sidebar.radio("Ratoon Crop Cultivation?",
 
 # B. Yield Scenarios
 st.sidebar.subheader("B. Yield Scenarios (per acre)")
-default_yields = {
-    "Low": 65.0,
-    "Average": 75.0,
-    "High": 85.0
-}
+default_yields = defaults["main_crop_yield_scenarios"]
 params["main_crop_yield_scenarios"] = {
     "Low": st.sidebar.number_input("Main Crop Yield - Low (cwt/acre)", value=default_yields["Low"], format="%.2f"),
     "Average": st.sidebar.number_input("Main Crop Yield - Average (cwt/acre)", value=default_yields["Average"], format="%.2f"),
     "High": st.sidebar.number_input("Main Crop Yield - High (cwt/acre)", value=default_yields["High"], format="%.2f")
 }
-params["active_yield_scenario"] = st.sidebar.selectbox("Active Main Crop Yield Scenario", list(default_yields.keys()), index=1)
+params["active_yield_scenario"] = st.sidebar.selectbox("Active Main Crop Yield Scenario", list(default_yields.keys()), index=list(default_yields).index(defaults["active_yield_scenario"]))
 
 if params["ratoon_crop_cultivation"] == "Yes":
-    params["ratoon_crop_yield"] = st.sidebar.number_input("Ratoon Crop Yield (cwt/acre)", value=16.0, format="%.2f")
+    params["ratoon_crop_yield"] = st.sidebar.number_input("Ratoon Crop Yield (cwt/acre)", value=defaults["ratoon_crop_yield"], format="%.2f")
 else:
     params["ratoon_crop_yield"] = 0.0
 
 # C. Price Scenarios
 st.sidebar.subheader("C. Price Scenarios (per cwt)")
-default_prices = {
-    "Baseline ($16.00)": 16.00,
-    "Alternative 1 ($14.20)": 14.20,
-    "Alternative 2 (User-defined)": 15.00 # Placeholder for user-defined
-}
+default_prices = defaults["price_scenarios"] # Alternative 2 is the user-defined one
 params["price_scenarios"] = {
     "Baseline ($16.00)": default_prices["Baseline ($16.00)"], # Fixed based on name
     "Alternative 1 ($14.20)": default_prices["Alternative 1 ($14.20)"], # Fixed
     "Alternative 2 (User-defined)": st.sidebar.number_input("Long-Grain Rice Price - Alternative 2 ($/cwt)", value=default_prices["Alternative 2 (User-defined)"], format="%.2f")
 }
-params["active_price_scenario"] = st.sidebar.selectbox("Active Price Scenario", list(default_prices.keys()), index=0)
+params["active_price_scenario"] = st.sidebar.selectbox("Active Price Scenario", list(default_prices.keys()), index=list(default_prices).index(defaults["active_price_scenario"]))
 
-# D. Financial Parameters (for future advanced analysis)
+# D. Financial Parameters (for NPV/IRR)
 st.sidebar.subheader("D. Financial Parameters (for NPV/IRR)")
-params["discount_rate"] = st.sidebar.slider("Discount Rate (%)", 0.0, 20.0, 7.0, 0.5)
-params["project_time_horizon"] = st.sidebar.slider("Project Time Horizon (Years)", 1, 30, 10, 1)
+params["discount_rate"] = st.sidebar.slider("Discount Rate (%)", 0.0, 20.0, defaults["discount_rate"], 0.5)
+params["project_time_horizon"] = st.sidebar.slider("Project Time Horizon (Years)", 1, 30, defaults["project_time_horizon"], 1)
+params["salvage_value"] = st.sidebar.number_input("Salvage Value at End of Horizon (Total $)", value=defaults["salvage_value"], format="%.2f", help="Resale value of land improvements and equipment in the final year.")
+params["add_back_depreciation"] = st.sidebar.checkbox("Add Back Machinery Depreciation (Non-Cash)", value=defaults["add_back_depreciation"], help="Machinery depreciation is a cost in NPBT but not a cash outflow.")
 # Financing details can be complex; for now, let's assume these are handled within establishment or operational costs if interest is paid.
 
 # Placeholder for Government Payments (from Revenue section)
-params["government_program_payments"] = st.sidebar.number_input("Government Program Payments (Total $)", value=0.0, format="%.2f")
+params["government_program_payments"] = st.sidebar.number_input("Government Program Payments (Total $)", value=defaults["government_program_payments"], format="%.2f")
 
 
 # --- III. Establishment Costs ---
 with st.sidebar.expander("III. Establishment Costs (One-Time/Infrequent)", expanded=False):
     if params["land_tenure"] == "Owned":
-        params["land_purchase_cost"] = st.number_input("Land Purchase Cost (Total $)", value=0.0, format="%.2f", help="Total cost for 50 acres if purchasing.")
+        params["land_purchase_cost"] = st.number_input("Land Purchase Cost (Total $)", value=defaults["land_purchase_cost"], format="%.2f", help=f"Total cost for {params['farm_size_acres']:,} acres if purchasing.")
         params["first_year_land_rental_cost"] = 0.0
     else: # Rented
         params["land_purchase_cost"] = 0.0
-        params["first_year_land_rental_cost"] = st.number_input("First Year Land Rental Cost (Total $)", value=0.0, format="%.2f", help="If any specific first-year setup rent.")
+        params["first_year_land_rental_cost"] = st.number_input("First Year Land Rental Cost (Total $)", value=defaults["first_year_land_rental_cost"], format="%.2f", help="If any specific first-year setup rent.")
 
-    params["land_clearing_cost"] = st.number_input("Land Clearing Cost (Total $ for 50 acres)", value=0.0, format="%.2f")
-    params["laser_land_leveling_cost_total"] = st.number_input("Laser Land Leveling (Total $)", value=150.0 * params["farm_size_acres"], format="%.2f", help="e.g., $150-$500/acre")
-    params["levee_surveying_construction_cost_total"] = st.number_input("Levee Surveying & Construction (Total $)", value=7.0 * params["farm_size_acres"] + (200 * params["farm_size_acres"]) , format="%.2f", help="Survey ~$6-$7/acre + Construction") # Example construction
-    params["well_drilling_pump_system_cost"] = st.number_input("Well Drilling & Pump System Cost (Total $)", value=0.0, format="%.2f")
-    params["on_farm_irrigation_system_installation_cost_total"] = st.number_input("On-Farm Irrigation System Installation (Total $)", value=210.0 * params["farm_size_acres"], format="%.2f", help="e.g., ~$210/acre for basic furrow/flood")
-    params["major_equipment_purchase_cost"] = st.number_input("Major Equipment Purchase Cost (Total $)", value=0.0, format="%.2f")
+    params["land_clearing_cost"] = st.number_input(f"Land Clearing Cost (Total $ for {params['farm_size_acres']:,} acres)", value=defaults["land_clearing_cost"], format="%.2f")
+    params["laser_land_leveling_cost_total"] = st.number_input("Laser Land Leveling (Total $)", value=DEFAULT_ESTABLISHMENT_COSTS_PER_ACRE["laser_land_leveling_cost_total"] * params["farm_size_acres"], format="%.2f", help="e.g., $150-$500/acre")
+    params["levee_surveying_construction_cost_total"] = st.number_input("Levee Surveying & Construction (Total $)", value=DEFAULT_ESTABLISHMENT_COSTS_PER_ACRE["levee_surveying_construction_cost_total"] * params["farm_size_acres"], format="%.2f", help="Survey ~$6-$7/acre + Construction")
+    params["well_drilling_pump_system_cost"] = st.number_input("Well Drilling & Pump System Cost (Total $)", value=defaults["well_drilling_pump_system_cost"], format="%.2f")
+    params["on_farm_irrigation_system_installation_cost_total"] = st.number_input("On-Farm Irrigation System Installation (Total $)", value=DEFAULT_ESTABLISHMENT_COSTS_PER_ACRE["on_farm_irrigation_system_installation_cost_total"] * params["farm_size_acres"], format="%.2f", help="e.g., ~$210/acre for basic furrow/flood")
+    params["major_equipment_purchase_cost"] = st.number_input("Major Equipment Purchase Cost (Total $)", value=defaults["major_equipment_purchase_cost"], format="%.2f")
 
 # --- IV. Annual Operational Expenditures (Overrides for AgriLife Defaults if needed) ---
-# For simplicity, we'll use AgriLife defaults in calculations.
-# UI could be added here to override specific line items from AGRILIFE_DEFAULTS if desired.
-# Example: params["seed_cost_override"] = st.sidebar.number_input(...)
+with st.sidebar.expander("IV.A-C. Operating Budget Line Items", expanded=False):
+    available_budgets = {budget_id: get_budget(budget_id) for budget_id in list_budgets()}
+    budget_file = st.file_uploader("Load Budgets (JSON/CSV)", type=["json", "csv"], help="Budgets for other regions or years; partial budgets are layered over AgriLife defaults.")
+    if budget_file is not None:
+        try:
+            if budget_file.name.lower().endswith(".json"):
+                available_budgets.update(parse_budget_json(budget_file.getvalue().decode("utf-8")))
+            else:
+                available_budgets.update(parse_budget_csv(budget_file.getvalue().decode("utf-8")))
+        except (ValueError, KeyError) as e:
+            st.error(f"Could not load budget file: {e}")
+    params["budget_id"] = st.selectbox("Base Budget", list(available_budgets), index=0)
+    base_budget = available_budgets[params["budget_id"]]
+
+    edited_budget = {}
+    budget_section_labels = {"main_crop": "Main Crop ($/acre, $/cwt)", "ratoon_crop": "Ratoon Crop ($/acre, $/cwt)", "fixed_costs_per_acre": "Fixed Costs ($/acre)"}
+    for section, section_label in budget_section_labels.items():
+        st.markdown(f"**{section_label}**")
+        edited_budget[section] = {
+            item: st.number_input(item.replace("_", " ").title(), value=float(value), format="%.2f", key=f"budget_{params['budget_id']}_{section}_{item}")
+            for item, value in base_budget[section].items()
+        }
+    budget_line_overrides = budget_overrides(edited_budget, base_budget)
+    active_budget = apply_overrides(base_budget, budget_line_overrides)
+    params["budget_coefficients"] = compile_budget_cached(active_budget)
+    if budget_line_overrides:
+        st.caption(f"{sum(len(items) for items in budget_line_overrides.values())} line item(s) overridden.")
 
 # Specific inputs for fixed costs that depend on tenure or are totals
 with st.sidebar.expander("IV.C. Annual Fixed Costs (Specific Inputs)", expanded=False):
     if params["land_tenure"] == "Owned":
-        params["property_taxes_owned_total"] = st.number_input("Property Taxes (Total Annual $)", value=500.0, format="%.2f", help="Total for 50 acres")
+        params["property_taxes_owned_total"] = st.number_input("Property Taxes (Total Annual $)", value=defaults["property_taxes_owned_total"], format="%.2f", help=f"Total for {params['farm_size_acres']:,} acres")
         params["annual_land_rent_per_acre"] = 0.0
     else: # Rented
         params["property_taxes_owned_total"] = 0.0
-        params["annual_land_rent_per_acre"] = st.number_input("Annual Land Rent ($/acre)", value=75.0, format="%.2f", help="e.g., $55-$130/acre")
+        params["annual_land_rent_per_acre"] = st.number_input("Annual Land Rent ($/acre)", value=DEFAULT_LAND_RENT_PER_ACRE, format="%.2f", help="e.g., $55-$130/acre")
+
+# --- VIII. Monte Carlo Risk Analysis (optional) ---
+with st.sidebar.expander("VIII. Monte Carlo Risk Analysis", expanded=False):
+    params["monte_carlo_enabled"] = st.checkbox("Run Monte Carlo Simulation", value=False)
+    params["monte_carlo_draws"] = st.number_input("Number of Draws", value=100_000, min_value=1_000, step=10_000)
+    params["monte_carlo_seed"] = st.number_input("Random Seed", value=42, min_value=0, step=1)
+    active_yield = params["main_crop_yield_scenarios"][params["active_yield_scenario"]]
+    active_price = params["price_scenarios"][params["active_price_scenario"]]
+    yield_spread = params["main_crop_yield_scenarios"]["High"] - params["main_crop_yield_scenarios"]["Low"]
+    params["monte_carlo_yield_std"] = st.number_input("Main Crop Yield Std Dev (cwt/acre)", value=max(yield_spread, 0.0) / 3.29, format="%.2f", help="Defaults to treating Low/High as the 5th/95th percentiles.")
+    params["monte_carlo_ratoon_yield_std"] = st.number_input("Ratoon Crop Yield Std Dev (cwt/acre)", value=0.25 * params["ratoon_crop_yield"], format="%.2f")
+    params["monte_carlo_price_std"] = st.number_input("Price Std Dev ($/cwt, lognormal)", value=0.10 * active_price, format="%.2f")
+    params["monte_carlo_corr_yield_ratoon"] = st.slider("Correlation: Main Yield vs Ratoon Yield", -0.9, 0.9, 0.5, 0.05)
+    params["monte_carlo_corr_yield_price"] = st.slider("Correlation: Main Yield vs Price", -0.9, 0.9, -0.3, 0.05)
+    params["monte_carlo_corr_ratoon_price"] = st.slider("Correlation: Ratoon Yield vs Price", -0.9, 0.9, -0.2, 0.05)
+    params["monte_carlo_confidence"] = st.slider("VaR / CVaR Confidence Level (%)", 80.0, 99.5, 95.0, 0.5)
+
+# --- VIII.B Historical Bootstrap (optional) ---
+with st.sidebar.expander("VIII.B Historical Price & Yield Paths", expanded=False):
+    history_store_dir = store_from_environment()
+    try:
+        history_datasets = list_datasets(history_store_dir)
+    except ValueError as e:
+        st.error(f"Could not read the history store: {e}")
+        history_datasets = {}
+    params["history_enabled"] = False
+    if not history_datasets:
+        st.caption(f"No historical datasets in '{history_store_dir}'. Add one with `python -m rice_analysis history ingest prices.csv yields.csv --name NAME`.")
+    else:
+        from rice_analysis.history_bootstrap import BOOTSTRAP_MODES
+        params["history_enabled"] = st.checkbox("Run Historical Bootstrap", value=False, help="Multi-year paths built from blocks of consecutive historical years, over the project time horizon.")
+        history_name = st.selectbox("Historical Dataset", sorted(history_datasets))
+        history_entry = history_datasets[history_name]
+        history_years = st.slider("Years to Resample", history_entry["first_year"], history_entry["last_year"], (history_entry["first_year"], history_entry["last_year"]), 1) \
+            if history_entry["last_year"] > history_entry["first_year"] else (history_entry["first_year"], history_entry["last_year"])
+        history_paths = st.number_input("Number of Paths", value=10_000, min_value=100, max_value=1_000_000, step=1_000)
+        history_block_length = st.slider("Block Length (Years)", 1, 10, 3, 1, help="Consecutive historical years kept together, so runs of good and bad years survive resampling.")
+        history_mode = st.radio("Apply History As", BOOTSTRAP_MODES, horizontal=True, help="relative: scale the scenario's price and yields by each year's ratio to the historical mean. absolute: use the historical values.")
+        history_seed = st.number_input("Bootstrap Seed", value=42, min_value=0, step=1)
+
+# --- IX. Sensitivity Settings ---
+with st.sidebar.expander("IX. Sensitivity & Break-Even", expanded=False):
+    sensitivity_swing = st.slider("Tornado Swing (+/- %)", 1.0, 50.0, 10.0, 1.0) / 100
+    sensitivity_top = st.number_input("Inputs Shown in Tornado Chart", value=15, min_value=3, max_value=60, step=1)
+
+# --- X. Scenario Cube Settings ---
+if app_mode == "Scenario Cube":
+    with st.sidebar.expander("X. Scenario Cube Grids", expanded=True):
+        scenario_yields = list(params["main_crop_yield_scenarios"].values())
+        scenario_prices = list(params["price_scenarios"].values())
+        cube_yield_range = st.slider("Main Crop Yield Grid (cwt/acre)", 0.0, 150.0, (min(scenario_yields) - 10.0, max(scenario_yields) + 10.0), 1.0)
+        cube_yield_steps = st.number_input("Yield Grid Points", value=21, min_value=1, max_value=501, step=1)
+        cube_price_range = st.slider("Price Grid ($/cwt)", 0.0, 40.0, (min(scenario_prices) - 3.0, max(scenario_prices) + 3.0), 0.25)
+        cube_price_steps = st.number_input("Price Grid Points", value=21, min_value=1, max_value=501, step=1)
+        st.caption("Both tenures and both ratoon choices are evaluated; these fill in the inputs the sidebar only asks for one of them.")
+        cube_ratoon_yield = st.number_input("Ratoon Crop Yield for Ratoon Cells (cwt/acre)", value=params["ratoon_crop_yield"] or defaults["ratoon_crop_yield"], format="%.2f")
+        cube_land_purchase_cost = st.number_input("Land Purchase Cost for Owned Cells (Total $)", value=params["land_purchase_cost"], format="%.2f")
+        cube_property_taxes = st.number_input("Property Taxes for Owned Cells (Total Annual $)", value=params["property_taxes_owned_total"] or defaults["property_taxes_owned_total"], format="%.2f")
+        cube_land_rent = st.number_input("Annual Land Rent for Rented Cells ($/acre)", value=params["annual_land_rent_per_acre"] or DEFAULT_LAND_RENT_PER_ACRE, format="%.2f")
+
+# --- XI. Portfolio Fields ---
+if app_mode == "Portfolio":
+    from rice_analysis.portfolio import DEFAULT_GROUP_COLUMNS
+    with st.sidebar.expander("XI. Portfolio Fields", expanded=True):
+        portfolio_file = st.file_uploader("Field Table (CSV or Parquet)", type=["csv", "parquet", "pq"], help="One row per field. Columns the table lacks are filled from the sidebar inputs above.")
+        portfolio_group_by = st.multiselect("Aggregate By", DEFAULT_GROUP_COLUMNS, default=list(DEFAULT_GROUP_COLUMNS))
+        portfolio_chunk_rows = st.number_input("Fields per Chunk", value=100_000, min_value=1_000, max_value=1_000_000, step=10_000, help="Fields evaluated per pass; memory use depends on this, not on the table size.")
+
+# --- XIII. Farm Plan Search ---
+if app_mode == "Farm Plan":
+    import pandas as pd
+    from rice_analysis.farm_plan import DEFAULT_INVESTMENT_LEVELS, land_costs_per_acre
+    with st.sidebar.expander("XIII. Farm Plan Search", expanded=True):
+        plan_acreage_range = st.slider("Farm Size Range (Acres)", 10, 10_000, (max(10, int(params["farm_size_acres"]) // 2), max(100, int(params["farm_size_acres"]) * 20)), 10)
+        plan_acreage_steps = st.number_input("Farm Size Grid Points", value=40, min_value=1, max_value=1_000, step=1)
+        plan_share_steps = st.number_input("Ratoon Share Grid Points", value=11, min_value=2, max_value=101, step=1, help="Shares of the acreage in ratoon practice, evenly spaced from 0% to 100%.")
+        default_land_costs = land_costs_per_acre(params)
+        plan_land_costs = {
+            "land_price_per_acre": st.number_input("Land Price if Buying ($/acre)", value=default_land_costs["land_price_per_acre"], format="%.2f"),
+            "property_tax_per_acre": st.number_input("Property Taxes if Buying ($/acre/year)", value=default_land_costs["property_tax_per_acre"], format="%.2f"),
+            "land_rent_per_acre": st.number_input("Land Rent if Renting ($/acre/year)", value=default_land_costs["land_rent_per_acre"], format="%.2f"),
+        }
+        st.caption("Investment levels scale the land improvement costs of section III and the main crop yield. The defaults are illustrative.")
+        plan_levels_df = st.data_editor(
+            pd.DataFrame(DEFAULT_INVESTMENT_LEVELS, columns=["Level", "Improvement Cost Multiplier", "Main Crop Yield Multiplier"]),
+            num_rows="dynamic", hide_index=True, key="plan_investment_levels")
+        plan_objective = st.radio("Maximise Expected", ("npv", "npbt"), format_func={"npv": "NPV", "npbt": "Annual NPBT"}.get, horizontal=True)
+        plan_risk_measure = st.radio("Risk Measure", ("cvar", "probability_of_loss"), format_func={"cvar": "CVaR", "probability_of_loss": "Probability of Loss"}.get, horizontal=True,
+                                     help="CVaR is the average loss in the worst tail at the Monte Carlo confidence level (section VIII).")
+        plan_limit_risk = st.checkbox("Limit Risk", value=False)
+        if plan_risk_measure == "cvar":
+            plan_risk_limit = st.number_input("Largest Acceptable CVaR ($)", value=100_000.0, step=10_000.0, format="%.2f", disabled=not plan_limit_risk)
+        else:
+            plan_risk_limit = st.slider("Largest Acceptable Probability of Loss (%)", 0.0, 100.0, 10.0, 0.5, disabled=not plan_limit_risk) / 100
+        plan_draws = st.number_input("Draws per Plan", value=4_000, min_value=500, max_value=100_000, step=500, help="Every plan is scored on the same draws of the Monte Carlo distributions in section VIII.")
 
 # --- Optional: Income Tax Rate ---
 # params["income_tax_rate"] = st.sidebar.slider("Applicable Income Tax Rate (%)", 0.0, 50.0, 0.0, 0.5) # if NPAT is needed
 
 
+def monte_carlo_risk_config(ratoon_crop_yield, ratoon_crop_yield_std):
+    # Distributions and correlations from section VIII, centred on the sidebar scenario.
+    return {
+        "distributions": {
+            "main_crop_yield_active": {"type": "normal", "mean": active_yield, "std": params["monte_carlo_yield_std"]},
+            "ratoon_crop_yield": {"type": "normal", "mean": ratoon_crop_yield, "std": ratoon_crop_yield_std},
+            "price_active": {"type": "lognormal", "mean": active_price, "std": params["monte_carlo_price_std"]},
+        },
+        "correlation": (
+            (1.0, params["monte_carlo_corr_yield_ratoon"], params["monte_carlo_corr_yield_price"]),
+            (params["monte_carlo_corr_yield_ratoon"], 1.0, params["monte_carlo_corr_ratoon_price"]),
+            (params["monte_carlo_corr_yield_price"], params["monte_carlo_corr_ratoon_price"], 1.0),
+        ),
+    }
+
+
+def sensitivity_label(name):
+    if "." in name:
+        section, item = name.split(".", 1)
+        return f"{section.replace('_', ' ').title()}: {item.replace('_', ' ').title()}"
+    return name.replace("_active", "").replace("_", " ").title()
+
+
+@st.cache_resource
+def shared_result_cache():
+    # One content-addressed cache per server process, shared by every session and user.
+    return cache_from_environment()
+
+
+result_cache = shared_result_cache()
+
+
+@st.cache_resource
+def shared_job_runner():
+    # One worker pool per server process; identical simulations requested by different sessions run once,
+    # and finished ones are kept in the result cache (and its disk store, when configured).
+    return runner_from_environment(shared_result_cache())
+
+
+job_runner = shared_job_runner()
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+session_download_dir = os.path.join(tempfile.gettempdir(), "rice_analysis_downloads", session_id)
+shutil.rmtree(session_download_dir, ignore_errors=True)
+os.makedirs(session_download_dir)
+
+
+def build_session_graph(cache, runner, owner):
+    # The model graph plus the analyses shown below it. Each session keeps its own graph, so
+    # unchanged nodes are skipped outright; recomputed ones still go through the shared cache.
+    # Monte Carlo runs in the background: its node only submits the job.
+    from rice_analysis.batch_calculations import BATCH_INPUT_COLUMNS
+    from rice_analysis.cash_flows import calculate_investment_metrics, sweep_horizons
+    from rice_analysis.monte_carlo import monte_carlo_job
+    from rice_analysis.sensitivity import calculate_sensitivities
+
+    graph = ModelGraph()
+    graph.add_node("batch_columns", BATCH_INPUT_COLUMNS, lambda v: dict(v))
+
+    def investment(v, horizon=None):
+        depreciation = v["operational_expenditures"]["fixed_costs_details"]["machinery_depreciation"] if v["add_back_depreciation"] else 0.0
+        return (v["establishment_costs"]["total_establishment_costs"], v["profitability"]["net_profit_before_tax"],
+                v["discount_rate"] / 100, horizon or v["project_time_horizon"], v["salvage_value"], depreciation)
+
+    investment_nodes = ("establishment_costs", "profitability", "operational_expenditures", "discount_rate", "salvage_value", "add_back_depreciation")
+    graph.add_node("investment", investment_nodes + ("project_time_horizon",), lambda v: cache.get_or_compute(
+        "investment_metrics", investment(v), lambda: calculate_investment_metrics(*investment(v))))
+    graph.add_node("horizon_sweep", investment_nodes, lambda v: cache.get_or_compute(
+        "sweep_horizons", investment(v, 30), lambda: sweep_horizons(*investment(v, 30))))
+
+    def monte_carlo(v):
+        risk_params = dict(v["batch_columns"], budget_coefficients=v["budget_coefficients"])
+        risk_config, n_draws, seed, confidence_level = v["monte_carlo_settings"]
+        return runner.submit("monte_carlo", (risk_params, v["monte_carlo_settings"]), monte_carlo_job(
+            risk_params, risk_config, n_draws=n_draws, seed=seed, confidence_level=confidence_level), owner=owner, persist=True)
+
+    graph.add_node("monte_carlo_job", ("batch_columns", "budget_coefficients", "monte_carlo_settings"), monte_carlo)
+
+    def history_bootstrap(v):
+        store_dir, name, entry, years, n_paths, block_length, seed, mode = v["history_settings"]
+        history_params = dict(v["batch_columns"], budget_coefficients=v["budget_coefficients"], discount_rate=v["discount_rate"],
+                              project_time_horizon=v["project_time_horizon"], salvage_value=v["salvage_value"],
+                              add_back_depreciation=v["add_back_depreciation"])
+
+        def compute():
+            import numpy as np
+            from rice_analysis.history_bootstrap import bootstrap_summary
+            history = open_history(name, store_dir, years)
+            summary = bootstrap_summary(history_params, history, n_paths, block_length=block_length, seed=seed, mode=mode)
+            summary["history"] = {series: np.percentile(history[series], (10, 50, 90)) for series in HISTORY_SERIES if series in history}
+            return summary
+        # The manifest entry changes whenever the dataset is ingested again, which keeps cached summaries honest.
+        return cache.get_or_compute("history_bootstrap", (history_params, v["history_settings"]), compute, persist=True)
+
+    history_nodes = ("batch_columns", "budget_coefficients", "discount_rate", "project_time_horizon", "salvage_value", "add_back_depreciation")
+    graph.add_node("history_bootstrap", history_nodes + ("history_settings",), history_bootstrap)
+    graph.add_node("sensitivities", ("batch_columns", "active_budget"), lambda v: cache.get_or_compute(
+        "sensitivities", (v["batch_columns"], v["active_budget"]), lambda: calculate_sensitivities(v["batch_columns"], v["active_budget"]),
+        persist=True))
+    return graph
+
+
+@st.cache_data(show_spinner="Evaluating scenario cube...", max_entries=16)
+def compute_scenario_cube(base_columns, main_crop_yields, prices, budget):
+    # Keyed by every input that is not a cube axis; moving between cells is then a lookup.
+    from rice_analysis.scenario_cube import build_scenario_cube
+    return build_scenario_cube(base_columns, main_crop_yields, prices, budget=budget)
+
+
+# --- XII. Diagnostics ---
+with st.sidebar.expander("XII. Diagnostics", expanded=False):
+    if instrumentation.is_enabled():
+        st.caption("Stage timings are on for this server process; counters are shared by every session.")
+    else:
+        st.caption("Stage timings are off. Start the server with RICE_MODEL_INSTRUMENTATION=1 to record them.")
+    if st.button("Clear Result Cache"):
+        result_cache.clear(disk=True)
+    # Filled at the end of the script so this rerun's lookups are included.
+    cache_stats_area = st.container()
+
+
+def render_monte_carlo(job, confidence):
+    import pandas as pd
+    from rice_analysis.monte_carlo import histogram_for_display
+
+    if job.status == "failed":
+        st.error(f"Monte Carlo simulation could not run: {job.error}")
+        return
+    risk = job.partial_result()
+    if not job.done():
+        progress_text = "Preparing simulation..." if risk is None else f"Simulated {risk['n_draws']:,} draws; figures below are provisional."
+        st.progress(job.progress, text=progress_text)
+        if st.button("Cancel Simulation"):
+            st.session_state["monte_carlo_cancelled"] = job.key
+            job_runner.release(job, session_id)
+            st.rerun()
+    if risk is None:
+        return
+
+    npbt_risk = risk["net_profit_before_tax"]
+    roi_risk = risk["annual_operational_roi_percent"]
+    col1_mc, col2_mc, col3_mc, col4_mc = st.columns(4)
+    col1_mc.metric("Expected NPBT", f"${npbt_risk['mean']:,.2f}")
+    col2_mc.metric("Probability of Loss", f"{risk['probability_of_loss']:.1%}")
+    col3_mc.metric(f"VaR ({confidence:.1f}%)", f"${risk['value_at_risk']:,.2f}")
+    col4_mc.metric(f"CVaR ({confidence:.1f}%)", f"${risk['conditional_value_at_risk']:,.2f}")
+    st.caption("VaR and CVaR are NPBT losses (positive = loss) at the chosen confidence level.")
+
+    centres, counts = histogram_for_display(npbt_risk)
+    st.write("**Distribution of Net Profit Before Tax:**")
+    st.bar_chart(pd.DataFrame({"NPBT ($)": centres, "Draws": counts}), x="NPBT ($)", y="Draws")
+
+    pct_df = pd.DataFrame({
+        "Percentile": [f"P{p}" for p in npbt_risk["percentiles"]],
+        "NPBT ($)": list(npbt_risk["percentiles"].values()),
+        "Annual Operational ROI (%)": list(roi_risk["percentiles"].values()),
+    })
+    st.dataframe(pct_df.style.format({"NPBT ($)": "${:,.2f}", "Annual Operational ROI (%)": "{:.2f}%"}))
+
+
+@st.fragment(run_every=0.5)
+def monte_carlo_progress(job, confidence):
+    # Polls a running job without rerunning the whole script; one full rerun once it ends stops the polling.
+    if job.done():
+        st.rerun()
+    render_monte_carlo(job, confidence)
+
+
 # --- Main Panel for Results ---
 st.header("Financial Model Results")
+recomputed_before = {}
+
+if app_mode == "Scenario Cube":
+    import altair as alt
+    import pandas as pd
+    from rice_analysis.batch_calculations import params_to_columns
+    from rice_analysis.scenario_cube import CUBE_AXES, LAND_TENURE_OPTIONS, RATOON_OPTIONS, cube_cell, cube_slice, nearest_index, value_grid
+    app_laps.lap("scenario_cube")
+    cube_columns = params_to_columns(params)
+    for axis in CUBE_AXES:
+        cube_columns.pop(axis, None)
+    cube_columns.update({
+        "ratoon_crop_yield": cube_ratoon_yield,
+        "land_purchase_cost": cube_land_purchase_cost,
+        "property_taxes_owned_total": cube_property_taxes,
+        "annual_land_rent_per_acre": cube_land_rent,
+    })
+    cube_yields = value_grid(*cube_yield_range, cube_yield_steps, scenario_yields)
+    cube_prices = value_grid(*cube_price_range, cube_price_steps, scenario_prices)
+    cube = compute_scenario_cube(cube_columns, tuple(cube_yields), tuple(cube_prices), params["budget_coefficients"])
+
+    st.subheader(f"Scenario Cube ({len(cube_yields)} yields x {len(cube_prices)} prices x 2 tenures x 2 ratoon options)")
+    col1_cube, col2_cube = st.columns(2)
+    cube_tenure = col1_cube.selectbox("Land Tenure Slice", LAND_TENURE_OPTIONS, index=LAND_TENURE_OPTIONS.index(params["land_tenure"]))
+    cube_ratoon = col2_cube.selectbox("Ratoon Crop Slice", RATOON_OPTIONS, index=RATOON_OPTIONS.index(params["ratoon_crop_cultivation"]))
+
+    heatmap_metrics = {
+        "net_profit_before_tax": ("Net Profit Before Tax ($)", "$,.0f"),
+        "annual_operational_roi_percent": ("Annual Operational ROI (%)", ".2f"),
+    }
+    heatmap_cols = st.columns(len(heatmap_metrics))
+    for heatmap_col, (metric, (label, number_format)) in zip(heatmap_cols, heatmap_metrics.items()):
+        grid = cube_slice(cube, metric, cube_tenure, cube_ratoon)
+        heatmap_df = pd.DataFrame({
+            "Yield (cwt/acre)": cube_yields.repeat(len(cube_prices)),
+            "Price ($/cwt)": pd.Series(cube_prices).round(2).tolist() * len(cube_yields),
+            label: grid.ravel(),
+        })
+        chart = alt.Chart(heatmap_df).mark_rect().encode(
+            x=alt.X("Price ($/cwt):O", axis=alt.Axis(format=".2f")),
+            y=alt.Y("Yield (cwt/acre):O", sort="descending", axis=alt.Axis(format=".1f")),
+            color=alt.Color(f"{label}:Q", scale=alt.Scale(scheme="redyellowgreen", domainMid=0)),
+            tooltip=["Yield (cwt/acre):Q", "Price ($/cwt):Q", alt.Tooltip(f"{label}:Q", format=number_format)],
+        ).properties(title=label)
+        heatmap_col.altair_chart(chart)
+
+    st.write("**Cell Lookup (all tenure and ratoon combinations):**")
+    col1_cell, col2_cell = st.columns(2)
+    cell_yield = col1_cell.select_slider("Main Crop Yield (cwt/acre)", options=list(cube_yields), value=cube_yields[nearest_index(cube_yields, params["main_crop_yield_scenarios"][params["active_yield_scenario"]])], format_func=lambda v: f"{v:.2f}")
+    cell_price = col2_cell.select_slider("Price ($/cwt)", options=list(cube_prices), value=cube_prices[nearest_index(cube_prices, params["price_scenarios"][params["active_price_scenario"]])], format_func=lambda v: f"${v:.2f}")
+    cell_rows = []
+    for tenure in LAND_TENURE_OPTIONS:
+        for ratoon in RATOON_OPTIONS:
+            cell = cube_cell(cube, cell_yield, cell_price, tenure, ratoon)
+            cell_rows.append({
+                "Land Tenure": tenure,
+                "Ratoon Crop": ratoon,
+                "Total Revenue ($)": cell["total_gross_annual_revenue"],
+                "Total Operational Costs ($)": cell["total_annual_operational_costs"],
+                "NPBT ($)": cell["net_profit_before_tax"],
+                "Annual Operational ROI (%)": cell["annual_operational_roi_percent"],
+                "ROI on Establishment (%)": cell["roi_on_initial_establishment_percent"],
+            })
+    cell_df = pd.DataFrame(cell_rows)
+    st.dataframe(cell_df.style.format({c: "${:,.2f}" for c in cell_df.columns if c.endswith("($)")} | {c: "{:.2f}%" for c in cell_df.columns if c.endswith("(%)")}), hide_index=True)
+
+    with st.expander("NPBT Table for the Selected Slice"):
+        npbt_table = pd.DataFrame(cube_slice(cube, "net_profit_before_tax", cube_tenure, cube_ratoon),
+                                  index=pd.Index(cube_yields.round(2), name="Yield / Price"), columns=cube_prices.round(2))
+        st.dataframe(npbt_table.style.format("${:,.0f}"))
+
+elif app_mode == "Portfolio":
+    import pandas as pd
+    from rice_analysis.batch_calculations import params_to_columns
+    from rice_analysis.portfolio import PORTFOLIO_COLUMN_ALIASES, evaluate_portfolio
+    app_laps.lap("portfolio")
+    if portfolio_file is None:
+        st.info("Upload a field table in section XI of the sidebar. Recognised columns: "
+                + ", ".join(sorted(set(params_to_columns(params)) | set(PORTFOLIO_COLUMN_ALIASES) | {"field_id", "budget_id", *DEFAULT_GROUP_COLUMNS}))
+                + ". Missing columns take the sidebar values.")
+    elif st.sidebar.button("Evaluate Portfolio"):
+        portfolio_format = "parquet" if portfolio_file.name.lower().endswith((".parquet", ".pq")) else "csv"
+        portfolio_status = st.empty()
+        portfolio_preview = []
+
+        def on_portfolio_chunk(fields_done, columns, results):
+            # Only the head of the first chunk is kept for display; the rest is streamed to the download file.
+            if not portfolio_preview:
+                head = min(1000, len(results["net_profit_before_tax"]))
+                echoed = {name: columns[name][:head] for name in ("field_id", "farm", "county", "land_tenure", "farm_size_acres") if name in columns and pd.api.types.is_list_like(columns[name])}
+                portfolio_preview.append(pd.DataFrame({**echoed, **{name: values[:head] for name, values in results.items()}}))
+            portfolio_status.caption(f"Evaluated {fields_done:,} fields...")
+
+        # Field results go to a per-session directory that is emptied on every run, so a file left by
+        # an interrupted evaluation does not outlive the next rerun.
+        portfolio_output = os.path.join(session_download_dir, f"field_results.{portfolio_format}")
+        portfolio_file.seek(0)
+        try:
+            portfolio = evaluate_portfolio(portfolio_file, params_to_columns(params), portfolio_group_by, int(portfolio_chunk_rows),
+                                           portfolio_format, portfolio_output, on_portfolio_chunk)
+            portfolio_download = None
+            if os.path.getsize(portfolio_output) <= PORTFOLIO_DOWNLOAD_LIMIT_MB * 1024 ** 2:
+                with open(portfolio_output, "rb") as f:
+                    portfolio_download = f.read()
+        except ValueError as e:
+            st.error(f"Could not evaluate the field table: {e}")
+            st.stop()
+        finally:
+            if os.path.exists(portfolio_output):
+                os.remove(portfolio_output)
+        portfolio_total = portfolio["total"]
+        portfolio_status.caption(f"Evaluated {portfolio_total['fields']:,} fields.")
+
+        st.subheader("Portfolio Totals")
+        col1_pf, col2_pf, col3_pf, col4_pf = st.columns(4)
+        col1_pf.metric("Fields", f"{portfolio_total['fields']:,}")
+        col2_pf.metric("Total Acres", f"{portfolio_total['farm_size_acres']:,.1f}")
+        col3_pf.metric("Total Revenue", f"${portfolio_total['total_gross_annual_revenue']:,.2f}")
+        col4_pf.metric("Total Operational Costs", f"${portfolio_total['total_annual_operational_costs']:,.2f}")
+        col1_pf, col2_pf, col3_pf, col4_pf = st.columns(4)
+        col1_pf.metric("Net Profit Before Tax", f"${portfolio_total['net_profit_before_tax']:,.2f}")
+        col2_pf.metric("NPBT per Acre", f"${portfolio_total['net_profit_before_tax_per_acre']:,.2f}")
+        col3_pf.metric("Annual Operational ROI", f"{portfolio_total['annual_operational_roi_percent']:.2f}%")
+        col4_pf.metric("ROI on Establishment", f"{portfolio_total['roi_on_initial_establishment_percent']:.2f}%")
+
+        for group_column, group_totals in portfolio["groups"].items():
+            st.subheader(f"By {group_column.replace('_', ' ').title()}")
+            group_df = pd.DataFrame([
+                {
+                    group_column.replace("_", " ").title(): key,
+                    "Fields": total["fields"],
+                    "Acres": total["farm_size_acres"],
+                    "Revenue ($)": total["total_gross_annual_revenue"],
+                    "Operational Costs ($)": total["total_annual_operational_costs"],
+                    "NPBT ($)": total["net_profit_before_tax"],
+                    "NPBT per Acre ($)": total["net_profit_before_tax_per_acre"],
+                    "Annual Operational ROI (%)": total["annual_operational_roi_percent"],
+                    "ROI on Establishment (%)": total["roi_on_initial_establishment_percent"],
+                }
+                for key, total in group_totals.items()
+            ])
+            col1_group, col2_group = st.columns([3, 2])
+            col1_group.dataframe(group_df.style.format({"Acres": "{:,.1f}"} | {c: "${:,.2f}" for c in group_df.columns if c.endswith("($)")} | {c: "{:.2f}%" for c in group_df.columns if c.endswith("(%)")}), hide_index=True)
+            col2_group.bar_chart(group_df, x=group_df.columns[0], y="NPBT ($)")
+
+        if portfolio_preview:
+            with st.expander(f"Field Results (first {len(portfolio_preview[0]):,} fields)"):
+                st.dataframe(portfolio_preview[0], hide_index=True)
+        if portfolio_download is not None:
+            st.download_button("Download Field Results", portfolio_download, file_name=f"field_results.{portfolio_format}")
+        else:
+            st.caption(f"Field results are over {PORTFOLIO_DOWNLOAD_LIMIT_MB} MB and are not offered for download; "
+                       "write them to a file with `python -m rice_analysis run` instead.")
+    else:
+        st.info("Click 'Evaluate Portfolio' to evaluate the uploaded fields.")
+
+elif app_mode == "Farm Plan":
+    import altair as alt
+    import numpy as np
+    from rice_analysis.batch_calculations import params_to_columns
+    from rice_analysis.farm_plan import DEFAULT_RATOON_CROP_YIELD, optimize_farm_plan
+    app_laps.lap("farm_plan")
+    plan_levels = tuple(
+        (str(row["Level"]), float(row["Improvement Cost Multiplier"]), float(row["Main Crop Yield Multiplier"]))
+        for _, row in plan_levels_df.dropna().iterrows()
+    )
+    plan_ratoon_yield = params["ratoon_crop_yield"] or DEFAULT_RATOON_CROP_YIELD
+    plan_ratoon_std = params["monte_carlo_ratoon_yield_std"] if params["ratoon_crop_yield"] else 0.25 * plan_ratoon_yield
+    plan_settings = dict(
+        acreages=np.linspace(*plan_acreage_range, int(plan_acreage_steps)),
+        ratoon_shares=np.linspace(0.0, 1.0, int(plan_share_steps)),
+        investment_levels=plan_levels,
+        land_costs=plan_land_costs,
+        objective=plan_objective,
+        risk_measure=plan_risk_measure,
+        risk_limit=plan_risk_limit if plan_limit_risk else None,
+        confidence_level=params["monte_carlo_confidence"] / 100,
+        risk_config=monte_carlo_risk_config(plan_ratoon_yield, plan_ratoon_std),
+        n_draws=int(plan_draws),
+        seed=int(params["monte_carlo_seed"]),
+    )
+    plan_params = dict(params_to_columns(params), ratoon_crop_yield=plan_ratoon_yield, budget_coefficients=params["budget_coefficients"],
+                       discount_rate=params["discount_rate"], project_time_horizon=params["project_time_horizon"],
+                       salvage_value=params["salvage_value"], add_back_depreciation=params["add_back_depreciation"])
+    if not plan_levels:
+        st.info("Add at least one investment level in section XIII of the sidebar.")
+    else:
+        plans = result_cache.get_or_compute("farm_plan", (plan_params, plan_settings), lambda: optimize_farm_plan(plan_params, **plan_settings),
+                                               persist=True)
+        candidates = plans["candidates"]
+        return_label = "Expected NPV ($)" if plan_objective == "npv" else "Expected Annual NPBT ($)"
+        risk_label = f"CVaR {params['monte_carlo_confidence']:.1f}% ($)" if plan_risk_measure == "cvar" else "Probability of Loss"
+        st.subheader(f"Farm Plan Search ({plans['plans_evaluated']:,} plans, {plans['n_draws']:,} draws each)")
 
-if st.sidebar.button("Calculate Scenario"):
-    results = run_full_model(params)
+        best = plans["best"]
+        if best is None:
+            st.warning("No plan meets the risk limit. The frontier below shows the least risky plans available.")
+        else:
+            col1_plan, col2_plan, col3_plan, col4_plan = st.columns(4)
+            col1_plan.metric("Best Plan", f"{candidates['land_tenure'][best]}, {candidates['investment_level'][best]}")
+            col2_plan.metric("Farm Size", f"{candidates['farm_size_acres'][best]:,.0f} acres",
+                             f"{candidates['ratoon_acres'][best]:,.0f} acres ratoon ({candidates['ratoon_share'][best]:.0%})", delta_color="off")
+            col3_plan.metric(return_label.replace(" ($)", ""), f"${candidates['expected_return'][best]:,.2f}")
+            col4_plan.metric("Risk", f"${candidates['risk'][best]:,.2f} CVaR" if plan_risk_measure == "cvar" else f"{candidates['risk'][best]:.1%} chance of loss")
+
+        plan_columns = {
+            "land_tenure": "Land Tenure", "investment_level": "Investment Level", "farm_size_acres": "Farm Size (Acres)",
+            "ratoon_share": "Ratoon Share", "establishment_costs": "Establishment Costs ($)", "expected_return": return_label,
+            "cvar": f"CVaR {params['monte_carlo_confidence']:.1f}% ($)", "probability_of_loss": "Probability of Loss",
+        }
+        plans_df = pd.DataFrame({label: candidates[name] for name, label in plan_columns.items()})
+        plans_df["Risk"] = candidates["risk"]
+        frontier_df = plans_df.iloc[plans["frontier"]]
+        # Plotting every candidate gets slow past a few thousand points; the frontier is always drawn in full.
+        shown_df = plans_df.sample(min(len(plans_df), 5_000), random_state=0)
+        st.write(f"**Return vs Risk: every plan, and the Pareto frontier ({len(frontier_df)} plans)**")
+        cloud = alt.Chart(shown_df).mark_circle(size=12, opacity=0.35).encode(
+            x=alt.X("Risk:Q", title=risk_label), y=alt.Y(f"{return_label}:Q"), color="Land Tenure:N",
+            tooltip=list(plan_columns.values()))
+        frontier_line = alt.Chart(frontier_df).mark_line(point=True, color="black").encode(
+            x="Risk:Q", y=f"{return_label}:Q", tooltip=list(plan_columns.values()))
+        st.altair_chart(cloud + frontier_line)
+
+        st.write("**Pareto Frontier:**")
+        st.dataframe(frontier_df.drop(columns="Risk").style.format(
+            {label: "${:,.2f}" for label in plan_columns.values() if label.endswith("($)")}
+            | {"Farm Size (Acres)": "{:,.0f}", "Ratoon Share": "{:.0%}", "Probability of Loss": "{:.1%}"}), hide_index=True)
+        st.caption("Each draw is read as the long-run average year. Land improvement costs scale with acres and investment level; "
+                   "well and equipment purchases from section III are counted once per plan.")
+
+elif live_update or st.sidebar.button("Calculate Scenario"):
+    import altair as alt
+    import pandas as pd
+    from rice_analysis.result_table import ResultTable
+    from rice_analysis.sensitivity import tornado
+    app_laps.lap("run_full_model")
+    if "model_graph" not in st.session_state:
+        st.session_state["model_graph"] = build_session_graph(result_cache, job_runner, session_id)
+    model_graph = st.session_state["model_graph"]
+    recomputed_before = dict(model_graph.recomputed)
+    risk_config = monte_carlo_risk_config(params["ratoon_crop_yield"], params["monte_carlo_ratoon_yield_std"])
+    model_graph.set_inputs(dict(
+        params,
+        active_budget=active_budget,
+        monte_carlo_settings=(risk_config, int(params["monte_carlo_draws"]), int(params["monte_carlo_seed"]), params["monte_carlo_confidence"] / 100),
+        history_settings=(history_store_dir, history_name, history_entry, tuple(history_years), int(history_paths), int(history_block_length),
+                          int(history_seed), history_mode) if params["history_enabled"] else None,
+    ))
+    results = model_graph.full_model_results()
+    result_row = ResultTable.from_model_results([results])
+
+    app_laps.lap("render_results")
 
     st.subheader("Selected Scenario Inputs Summary")
     st.json(results["inputs_summary"])
@@ -116,9 +665,7 @@ if st.sidebar.button("Calculate Scenario"):
     # --- III. Establishment Costs (Summary) ---
     st.subheader("III. Establishment Costs (One-Time or Infrequent)")
     est_costs = results["establishment_costs"]
-    # Create a DataFrame for better display of establishment costs
-    est_df_data = {k:v for k,v in est_costs.items() if k != "total_establishment_costs"}
-    est_df = pd.DataFrame(list(est_df_data.items()), columns=['Cost Item', 'Amount ($)'])
+    est_df = pd.DataFrame(result_row.section("establishment_costs")[:-1], columns=['Cost Item', 'Amount ($)'])
     st.dataframe(est_df.style.format({'Amount ($)': '${:,.2f}'}))
     st.metric("Total Establishment Costs", f"${est_costs['total_establishment_costs']:,.2f}")
 
@@ -133,8 +680,7 @@ if st.sidebar.button("Calculate Scenario"):
         col2.metric("Total Ratoon Crop Variable Costs", "$0.00")
     
     st.write("**Fixed Costs Details:**")
-    fixed_df_data = {k:v for k,v in op_exp['fixed_costs_details'].items() if k != "total_annual_fixed_costs"}
-    fixed_df = pd.DataFrame(list(fixed_df_data.items()), columns=['Cost Item', 'Amount ($)'])
+    fixed_df = pd.DataFrame(result_row.section("fixed_costs"), columns=['Cost Item', 'Amount ($)'])
     st.dataframe(fixed_df.style.format({'Amount ($)': '${:,.2f}'}))
     col3.metric("Total Annual Fixed Costs", f"${op_exp['total_annual_fixed_costs']:,.2f}")
     
@@ -160,10 +706,178 @@ if st.sidebar.button("Calculate Scenario"):
     else:
         col2_roi.metric("ROI on Initial Establishment (Simplified Annual)", "N/A (No Est. Costs)")
 
-    st.info("Note: AgriLife budget figures are used as defaults for many per-acre operational costs. Advanced users can modify `model_calculations.py` or extend UI to override these.")
+    # --- VII. Multi-Year Investment Analysis (NPV/IRR) ---
+    app_laps.lap("investment_analysis")
+    st.subheader("VII. Multi-Year Investment Analysis (NPV/IRR)")
+    discount_rate = params["discount_rate"] / 100
+    investment = model_graph.get("investment")
+    col1_inv, col2_inv, col3_inv, col4_inv = st.columns(4)
+    col1_inv.metric("Net Present Value (NPV)", f"${investment['npv'][0]:,.2f}")
+    col2_inv.metric("Internal Rate of Return (IRR)", "N/A" if pd.isna(investment["irr"][0]) else f"{investment['irr'][0]:.2%}")
+    col3_inv.metric("Modified IRR (MIRR)", "N/A" if pd.isna(investment["mirr"][0]) else f"{investment['mirr'][0]:.2%}")
+    col4_inv.metric("Discounted Payback", "Not within horizon" if pd.isna(investment["discounted_payback_years"][0]) else f"{investment['discounted_payback_years'][0]:.1f} years")
+
+    schedule_df = pd.DataFrame({"Cash Flow ($)": investment["cash_flow_schedule"][0]})
+    schedule_df.insert(0, "Year", schedule_df.index)
+    schedule_df["Discounted Cash Flow ($)"] = schedule_df["Cash Flow ($)"] / (1 + discount_rate) ** schedule_df["Year"]
+    schedule_df["Cumulative Discounted ($)"] = schedule_df["Discounted Cash Flow ($)"].cumsum()
+    st.write("**Cash Flow Schedule:**")
+    st.dataframe(schedule_df.style.format({c: "${:,.2f}" for c in schedule_df.columns if c != "Year"}), hide_index=True)
+
+    sweep = model_graph.get("horizon_sweep")
+    st.write("**NPV by Project Time Horizon:**")
+    st.line_chart(pd.DataFrame({"Horizon (Years)": sweep["horizons"], "NPV ($)": sweep["npv"][0]}), x="Horizon (Years)", y="NPV ($)")
+
+    # --- VIII. Monte Carlo Risk Analysis ---
+    if params["monte_carlo_enabled"]:
+        app_laps.lap("monte_carlo")
+        st.subheader("VIII. Monte Carlo Risk Analysis")
+        monte_carlo = model_graph.get("monte_carlo_job")
+        cancelled_key = st.session_state.get("monte_carlo_cancelled")
+        if monte_carlo.status == "cancelled" and monte_carlo.key != cancelled_key:
+            # Cancelled while no session was watching it (e.g. the simulation was switched off); start it again.
+            model_graph.invalidate("monte_carlo_job")
+            monte_carlo = model_graph.get("monte_carlo_job")
+        previous_job = st.session_state.get("monte_carlo_job")
+        if previous_job is not None and previous_job is not monte_carlo:
+            # Inputs changed: stop the old simulation unless another session is still waiting for it.
+            job_runner.release(previous_job, session_id)
+        st.session_state["monte_carlo_job"] = monte_carlo
+
+        if monte_carlo.key == cancelled_key:
+            st.info("Simulation cancelled. Change any Monte Carlo input to run it again.")
+        else:
+            st.session_state.pop("monte_carlo_cancelled", None)
+            if monte_carlo.done():
+                render_monte_carlo(monte_carlo, params["monte_carlo_confidence"])
+            else:
+                monte_carlo_progress(monte_carlo, params["monte_carlo_confidence"])
+    elif "monte_carlo_job" in st.session_state:
+        job_runner.release(st.session_state.pop("monte_carlo_job"), session_id)
+
+    # --- VIII.B Historical Bootstrap ---
+    if params["history_enabled"]:
+        app_laps.lap("history_bootstrap")
+        st.subheader("VIII.B Historical Price & Yield Paths")
+        try:
+            bootstrap = model_graph.get("history_bootstrap")
+        except (KeyError, ValueError, OSError) as e:
+            st.error(f"Historical bootstrap could not run: {e}")
+            bootstrap = None
+        if bootstrap is not None:
+            npv_paths = bootstrap["npv"]
+            col1_hb, col2_hb, col3_hb, col4_hb = st.columns(4)
+            col1_hb.metric("Expected NPV", f"${npv_paths['mean']:,.2f}")
+            col2_hb.metric("Probability NPV < 0", f"{bootstrap['probability_npv_negative']:.1%}")
+            col3_hb.metric("NPV P5 / P95", f"${npv_paths['percentiles'][5]:,.0f} / ${npv_paths['percentiles'][95]:,.0f}")
+            col4_hb.metric("Payback Within Horizon", f"{bootstrap['probability_payback_within_horizon']:.1%}")
+            st.caption(f"{bootstrap['n_paths']:,} paths of {bootstrap['horizon']} years resampled from {history_name} "
+                       f"{history_years[0]}-{history_years[1]} in blocks of {int(history_block_length)} years.")
+
+            bands = bootstrap["cumulative_cash_by_year"]
+            st.write("**Cumulative Cash by Year (percentile bands across paths):**")
+            st.line_chart(pd.DataFrame({f"P{p} ($)": values for p, values in bands["percentiles"].items()}, index=pd.Index(bands["years"], name="Year")))
+
+            scenario_values = {"price": active_price, "main_crop_yield": active_yield, "ratoon_crop_yield": params["ratoon_crop_yield"]}
+            history_df = pd.DataFrame([
+                {"Series": series.replace("_", " ").title(), "Historical P10": values[0], "Historical P50": values[1], "Historical P90": values[2],
+                 "Scenario Input": scenario_values[series]}
+                for series, values in bootstrap["history"].items()
+            ])
+            st.write("**Historical Range vs Scenario Inputs:**")
+            st.dataframe(history_df.style.format({c: "{:,.2f}" for c in history_df.columns if c != "Series"}), hide_index=True)
+
+    # --- IX. Sensitivity & Break-Even Analysis ---
+    app_laps.lap("sensitivity")
+    st.subheader("IX. Sensitivity & Break-Even Analysis")
+    sensitivities = model_graph.get("sensitivities")
+    break_even = {name: values[0] for name, values in sensitivities["break_even"].items()}
+    col1_be, col2_be, col3_be, col4_be = st.columns(4)
+    col1_be.metric("Break-Even Price", f"${break_even['price_active']:,.2f}/cwt")
+    col2_be.metric("Break-Even Main Crop Yield", f"{break_even['main_crop_yield_active']:,.2f} cwt/acre")
+    if params["ratoon_crop_cultivation"] == "Yes":
+        col3_be.metric("Break-Even Ratoon Yield", f"{break_even['ratoon_crop_yield']:,.2f} cwt/acre")
+    if params["land_tenure"] == "Rented":
+        col4_be.metric("Max Affordable Land Rent", f"${break_even['annual_land_rent_per_acre']:,.2f}/acre")
+    else:
+        col4_be.metric("Break-Even Farm Size", "N/A" if not break_even["farm_size_acres"] > 0 else f"{break_even['farm_size_acres']:,.1f} acres")
+
+    bars = tornado(sensitivities, swing=sensitivity_swing, top=int(sensitivity_top))
+    tornado_df = pd.DataFrame(
+        [(sensitivity_label(name), f"-{sensitivity_swing:.0%}", low) for name, low, _ in bars] +
+        [(sensitivity_label(name), f"+{sensitivity_swing:.0%}", high) for name, _, high in bars],
+        columns=["Input", "Input Change", "Change in NPBT ($)"],
+    )
+    st.write(f"**Tornado: NPBT change for a +/-{sensitivity_swing:.0%} move in each input**")
+    tornado_chart = alt.Chart(tornado_df).mark_bar().encode(
+        x=alt.X("Change in NPBT ($):Q"),
+        y=alt.Y("Input:N", sort=[sensitivity_label(name) for name, _, _ in bars]),
+        color=alt.Color("Input Change:N"),
+        tooltip=["Input", "Input Change", alt.Tooltip("Change in NPBT ($):Q", format="$,.2f")],
+    )
+    st.altair_chart(tornado_chart)
+
+    with st.expander("Gradient & Elasticity Table"):
+        gradient_df = pd.DataFrame({
+            "Input": [sensitivity_label(name) for name in sensitivities["inputs"]],
+            "Value": sensitivities["values"][0],
+            "dNPBT / dInput": sensitivities["gradients"]["net_profit_before_tax"][0],
+            "dOperational ROI (%) / dInput": sensitivities["gradients"]["annual_operational_roi_percent"][0],
+            "NPBT Elasticity": sensitivities["elasticities"]["net_profit_before_tax"][0],
+        })
+        st.dataframe(gradient_df.style.format({"Value": "{:,.2f}", "dNPBT / dInput": "{:,.4f}", "dOperational ROI (%) / dInput": "{:,.6f}", "NPBT Elasticity": "{:,.4f}"}), hide_index=True)
+
+    st.info(f"Note: operating costs use the '{params['budget_id']}' budget with any line item overrides from section IV of the sidebar.")
 
 else:
-    st.info("Adjust parameters in the sidebar and click 'Calculate Scenario' to see results.")
+    st.info("Adjust parameters in the sidebar and click 'Calculate Scenario' to see results, or turn on 'Live Update'.")
+
+app_laps.stop()
+
+cache_stats = result_cache.stats()
+cache_stats_area.caption(f"Result cache: {cache_stats['entries']:,} of {cache_stats['max_entries']:,} entries"
+                         + (f", disk store at {result_cache.disk_dir}" if result_cache.disk_dir else ""))
+job_stats = job_runner.stats()
+cache_stats_area.caption(f"Background jobs (pool of {job_stats['max_workers']}): {job_stats['active']} running, {job_stats['done']} done, "
+                         f"{job_stats['deduplicated']} shared, {job_stats['cancelled']} cancelled, {job_stats['failed']} failed")
+if cache_stats["namespaces"]:
+    import pandas as pd
+    cache_stats_area.dataframe(pd.DataFrame([
+        {"Result": namespace, "Hits": counts["hits"] + counts["disk_hits"], "Misses": counts["misses"], "Hit Rate": f"{counts['hit_rate']:.0%}"}
+        for namespace, counts in cache_stats["namespaces"].items()
+    ]), hide_index=True)
+
+if instrumentation.is_enabled():
+    import pandas as pd
+    with st.expander("Diagnostics", expanded=True):
+        diagnostics = instrumentation.snapshot()
+        if diagnostics:
+            diagnostics_df = pd.DataFrame([
+                {
+                    "Section": name,
+                    "Calls": values["calls"],
+                    "Total (ms)": values["seconds_total"] * 1e3,
+                    "Mean (ms)": values["seconds_mean"] * 1e3,
+                    "Max (ms)": values["seconds_max"] * 1e3,
+                    "Net Allocated Blocks (process-wide)": values["allocated_blocks_total"],
+                }
+                for name, values in diagnostics.items()
+            ])
+            st.dataframe(diagnostics_df.style.format({"Total (ms)": "{:,.3f}", "Mean (ms)": "{:,.3f}", "Max (ms)": "{:,.3f}", "Net Allocated Blocks (process-wide)": "{:,}"}), hide_index=True)
+        else:
+            st.caption("No timings recorded yet; they appear from the next rerun.")
+        col1_diag, col2_diag, col3_diag = st.columns(3)
+        col1_diag.download_button("Download Prometheus Metrics", instrumentation.export_prometheus(), file_name="rice_model_metrics.prom")
+        col2_diag.download_button("Download JSON", instrumentation.export_json(), file_name="rice_model_metrics.json")
+        if col3_diag.button("Reset Counters"):
+            instrumentation.reset()
+        if "model_graph" in st.session_state:
+            model_graph = st.session_state["model_graph"]
+            st.write("**Model Graph Recomputes (this session):**")
+            st.dataframe(pd.DataFrame([
+                {"Node": name, "Recomputes": count, "Recomputed This Rerun": count > recomputed_before.get(name, 0)}
+                for name, count in model_graph.recomputed.items()
+            ]), hide_index=True)
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("Built with Streamlit & Python.")
\ No newline at end of file
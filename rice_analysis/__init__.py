@@ -0,0 +1,68 @@
+# __init__.py
+"""
+Rice farming financial model: the scalar model, operating budgets and the
+engines built on them.
+
+    import rice_analysis
+    results = rice_analysis.run_full_model(params)
+    columns = rice_analysis.run_full_model_batch(frame)
+
+Submodules and the names below are imported on first access, so importing the
+package costs nothing and the scalar model never loads NumPy, pandas or Arrow;
+only the batch engines (NumPy) and the table exports (Arrow, pandas) do.
+"""
+
+import importlib
+
+SUBMODULES = (
+    "batch_calculations",
+    "batch_runner",
+    "benchmarks",
+    "budgets",
+    "cash_flows",
+    "cli",
+    "farm_plan",
+    "history_bootstrap",
+    "history_store",
+    "instrumentation",
+    "job_runner",
+    "load_generator",
+    "model_calculations",
+    "model_graph",
+    "monte_carlo",
+    "portfolio",
+    "result_cache",
+    "result_table",
+    "scenario_cube",
+    "scoring_service",
+    "sensitivity",
+    "table_io",
+)
+
+# Public name -> submodule that defines it.
+_LAZY_NAMES = {
+    "run_full_model": "model_calculations",
+    "AGRILIFE_DEFAULTS": "model_calculations",
+    "get_budget": "budgets",
+    "register_budget": "budgets",
+    "ModelGraph": "model_graph",
+    "ResultCache": "result_cache",
+    "run_full_model_batch": "batch_calculations",
+    "params_to_columns": "batch_calculations",
+    "run_monte_carlo": "monte_carlo",
+    "ResultTable": "result_table",
+}
+
+__all__ = list(SUBMODULES) + list(_LAZY_NAMES)
+
+
+def __getattr__(name):
+    if name in SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    if name in _LAZY_NAMES:
+        return getattr(importlib.import_module(f"{__name__}.{_LAZY_NAMES[name]}"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,366 @@
+# batch_calculations.py
+
+import numpy as np
+
+from .model_calculations import DEFAULT_BUDGET_COEFFICIENTS
+
+# --- Columnar inputs (one row per scenario) ---
+# Names match the scalar `params` keys after run_full_model has resolved the
+# active yield and price scenarios.
+BATCH_INPUT_COLUMNS = (
+    "farm_size_acres",
+    "land_tenure",
+    "ratoon_crop_cultivation",
+    "main_crop_yield_active",
+    "ratoon_crop_yield",
+    "price_active",
+    "government_program_payments",
+    "land_purchase_cost",
+    "land_clearing_cost",
+    "laser_land_leveling_cost_total",
+    "levee_surveying_construction_cost_total",
+    "well_drilling_pump_system_cost",
+    "on_farm_irrigation_system_installation_cost_total",
+    "major_equipment_purchase_cost",
+    "property_taxes_owned_total",
+    "annual_land_rent_per_acre",
+)
+
+# Rows evaluated per pass of run_full_model_batch: small enough that a block's
+# intermediates stay in cache between stages, large enough to amortize the calls.
+BLOCK_ROWS = 16_384
+
+ESTABLISHMENT_COST_COLUMNS = (
+    ("land_clearing", "land_clearing_cost"),
+    ("laser_land_leveling", "laser_land_leveling_cost_total"),
+    ("levee_surveying_construction", "levee_surveying_construction_cost_total"),
+    ("well_drilling_pump_system", "well_drilling_pump_system_cost"),
+    ("on_farm_irrigation_system_installation", "on_farm_irrigation_system_installation_cost_total"),
+    ("major_equipment_purchase_cost", "major_equipment_purchase_cost"),
+)
+
+BATCH_OUTPUT_COLUMNS = (
+    # Revenue
+    "main_crop_revenue",
+    "ratoon_crop_revenue",
+    "government_program_payments",
+    "total_gross_annual_revenue",
+    # Establishment costs
+    "land_purchase_cost",
+    "land_clearing",
+    "laser_land_leveling",
+    "levee_surveying_construction",
+    "well_drilling_pump_system",
+    "on_farm_irrigation_system_installation",
+    "major_equipment_purchase_cost",
+    "total_establishment_costs",
+    # Operational expenditures
+    "total_main_crop_variable_costs",
+    "total_ratoon_crop_variable_costs",
+    "property_taxes",
+    "annual_land_rent",
+    "crop_insurance",
+    "g_a_overhead",
+    "pickup_mileage_charge",
+    "machinery_depreciation",
+    "equipment_investment_interest",
+    "management_fee_owner_labor",
+    "total_annual_fixed_costs",
+    "total_annual_operational_costs",
+    # Profitability
+    "gross_profit_revenue_less_vc",
+    "net_profit_before_tax",
+    # ROI
+    "annual_operational_roi_percent",
+    "roi_on_initial_establishment_percent",
+)
+
+
+def row_count(frame):
+    """Number of scenarios in a DataFrame, NumPy struct array or dict of columns."""
+    if hasattr(frame, "dtype") or hasattr(frame, "index"):
+        return len(frame)
+    return max((np.size(value) for value in frame.values()), default=0)
+
+
+def _fit(values, n, scalars):
+    # With `scalars`, a one-value column stays a NumPy scalar instead of being broadcast to n rows.
+    if values.shape != (n,):
+        if scalars and values.size == 1:
+            return values.reshape(())[()]
+        values = np.broadcast_to(values, (n,))
+    return values
+
+
+def float_column(frame, name, n, scalars=False):
+    return _fit(np.asarray(frame[name], dtype=np.float64), n, scalars)
+
+
+def flag_column(frame, name, true_value, n, scalars=False):
+    values = frame[name]
+    if not hasattr(values, "dtype"):
+        values = np.asarray(values)
+    if values.dtype != bool:
+        # Compare before converting so pandas string columns stay on their fast path.
+        values = values == true_value
+    return _fit(np.asarray(values, dtype=bool), n, scalars)
+
+
+def params_to_columns(params):
+    """
+    Maps a scalar `params` dict (as collected by app.py) onto batch input columns.
+    Active yield and price are resolved from the scenario dicts when present.
+    """
+    columns = {name: params[name] for name in BATCH_INPUT_COLUMNS if name in params}
+    if "main_crop_yield_scenarios" in params:
+        columns["main_crop_yield_active"] = params["main_crop_yield_scenarios"][params["active_yield_scenario"]]
+    if "price_scenarios" in params:
+        columns["price_active"] = params["price_scenarios"][params["active_price_scenario"]]
+    return columns
+
+
+def read_batch_inputs(frame, scalars=False):
+    """
+    Reads every input column of `frame` as a float64 or bool array of one length,
+    or with `scalars` leaves columns given as a single value as NumPy scalars.
+    """
+    n = row_count(frame)
+    inputs = {name: float_column(frame, name, n, scalars) for name in BATCH_INPUT_COLUMNS[3:]}
+    inputs["farm_size_acres"] = float_column(frame, "farm_size_acres", n, scalars)
+    inputs["owned"] = flag_column(frame, "land_tenure", "Owned", n, scalars)
+    inputs["ratoon"] = flag_column(frame, "ratoon_crop_cultivation", "Yes", n, scalars)
+    return inputs
+
+
+def _select_mask(flags, out=None):
+    # -1 (all bits set) where `flags` is set and 0 elsewhere, for _select.
+    flags = np.asarray(flags, dtype=bool)
+    if out is None or flags.ndim == 0:
+        mask = flags.astype(np.int64)
+    else:
+        mask = out[:flags.size]
+        np.copyto(mask, flags)
+    return np.negative(mask, out=mask)
+
+
+def _select(mask, values, out):
+    """
+    Writes `values` where the _select_mask `mask` is set and 0.0 elsewhere into
+    `out`. Works on the bits, so NaN in an unselected row is dropped as np.where
+    would, without np.where's per-row branch (about 8x slower on mixed tenures or
+    ratoon choices).
+    """
+    np.bitwise_and(mask, np.asarray(values, dtype=np.float64).view(np.int64), out=out.view(np.int64))
+    return out
+
+
+def calculate_revenue_batch(inputs, out):
+    farm_size = inputs["farm_size_acres"]
+    price = inputs["price_active"]
+
+    main_crop_revenue = np.multiply(inputs["main_crop_yield_active"], price, out=out["main_crop_revenue"])
+    main_crop_revenue *= farm_size
+    ratoon_crop_revenue = np.multiply(inputs["ratoon_crop_yield"], price, out=out["ratoon_crop_revenue"])
+    ratoon_crop_revenue *= farm_size
+    _select(inputs["ratoon_mask"], ratoon_crop_revenue, out=ratoon_crop_revenue)
+    gov_payments = out["government_program_payments"]
+    np.copyto(gov_payments, inputs["government_program_payments"])
+    total_gross_annual_revenue = np.add(main_crop_revenue, ratoon_crop_revenue, out=out["total_gross_annual_revenue"])
+    total_gross_annual_revenue += gov_payments
+
+    return {
+        "main_crop_revenue": main_crop_revenue,
+        "ratoon_crop_revenue": ratoon_crop_revenue,
+        "government_program_payments": gov_payments,
+        "total_gross_annual_revenue": total_gross_annual_revenue,
+    }
+
+
+def _select_either(mask, if_set, if_clear, out):
+    # Like _select, but `if_clear` (a scalar) instead of 0.0 where the mask is clear.
+    if_clear = np.float64(if_clear).view(np.int64)
+    np.bitwise_and(mask, np.float64(if_set).view(np.int64) ^ if_clear, out=out.view(np.int64))
+    np.bitwise_xor(out.view(np.int64), if_clear, out=out.view(np.int64))
+    return out
+
+
+def calculate_establishment_costs_batch(inputs, out):
+    purchase_cost = inputs["land_purchase_cost"]
+    if np.ndim(purchase_cost) == 0:
+        purchased = inputs["owned_mask"] if purchase_cost > 0 else np.int64(0)
+    else:
+        purchased = inputs["owned_mask"] & _select_mask(purchase_cost > 0)
+    land_purchase = _select(purchased, purchase_cost, out=out["land_purchase_cost"])
+
+    costs = {"land_purchase_cost": land_purchase}
+    for output_name, input_name in ESTABLISHMENT_COST_COLUMNS:
+        costs[output_name] = out[output_name]
+        np.copyto(costs[output_name], inputs[input_name])
+    total_establishment_costs = out["total_establishment_costs"]
+    amounts = [inputs[input_name] for _, input_name in ESTABLISHMENT_COST_COLUMNS]
+    if np.ndim(purchase_cost) == 0 and all(np.ndim(amount) == 0 for amount in amounts):
+        # Every row totals one of two scalars, each summed in run_full_model's order.
+        with_purchase, without_purchase = purchase_cost, np.float64(0.0)
+        for amount in amounts:
+            with_purchase, without_purchase = with_purchase + amount, without_purchase + amount
+        _select_either(purchased, with_purchase, without_purchase, out=total_establishment_costs)
+    else:
+        np.copyto(total_establishment_costs, land_purchase)
+        for output_name, _ in ESTABLISHMENT_COST_COLUMNS:
+            total_establishment_costs += costs[output_name]
+
+    costs["total_establishment_costs"] = total_establishment_costs
+    return costs
+
+
+def _variable_costs(crop_yield, per_acre, per_cwt, farm_size, out):
+    # (per acre + yield x per cwt) x acres; one pass over the rows when the yield is a scalar.
+    if np.ndim(crop_yield) == 0:
+        return np.multiply(crop_yield * per_cwt + per_acre, farm_size, out=out)
+    np.multiply(crop_yield, per_cwt, out=out)
+    out += per_acre
+    out *= farm_size
+    return out
+
+
+def calculate_annual_operational_expenditures_batch(inputs, out, budget=DEFAULT_BUDGET_COEFFICIENTS):
+    farm_size = inputs["farm_size_acres"]
+
+    # A. Variable Costs (Main Crop)
+    total_main_crop_variable_costs = _variable_costs(inputs["main_crop_yield_active"], budget.main_crop_per_acre,
+                                                     budget.main_crop_per_cwt, farm_size,
+                                                     out["total_main_crop_variable_costs"])
+
+    # B. Variable Costs (Ratoon Crop)
+    total_ratoon_crop_variable_costs = _variable_costs(inputs["ratoon_crop_yield"], budget.ratoon_crop_per_acre,
+                                                       budget.ratoon_crop_per_cwt, farm_size,
+                                                       out["total_ratoon_crop_variable_costs"])
+    _select(inputs["ratoon_mask"], total_ratoon_crop_variable_costs, out=total_ratoon_crop_variable_costs)
+
+    # C. Annual Fixed Costs. Per row exactly one of property taxes and rent is non-zero.
+    annual_land_rent = np.multiply(inputs["annual_land_rent_per_acre"], farm_size, out=out["annual_land_rent"])
+    fixed_costs_details = {
+        "property_taxes": _select(inputs["owned_mask"], inputs["property_taxes_owned_total"], out=out["property_taxes"]),
+        "annual_land_rent": _select(inputs["rented_mask"], annual_land_rent, out=annual_land_rent),
+    }
+    total_annual_fixed_costs = np.add(fixed_costs_details["property_taxes"], annual_land_rent, out=out["total_annual_fixed_costs"])
+    for cost_item, cost_per_acre in budget.fixed_costs_per_acre:
+        fixed_costs_details[cost_item] = np.multiply(farm_size, cost_per_acre, out=out[cost_item])
+        total_annual_fixed_costs += fixed_costs_details[cost_item]
+
+    management_fee = _select(inputs["ratoon_mask"], budget.management_fee_ratoon_crop, out=out["management_fee_owner_labor"])
+    management_fee += budget.management_fee_main_crop
+    management_fee *= farm_size
+    fixed_costs_details["management_fee_owner_labor"] = management_fee
+    total_annual_fixed_costs += management_fee
+
+    total_annual_operational_costs = np.add(total_main_crop_variable_costs, total_ratoon_crop_variable_costs,
+                                            out=out["total_annual_operational_costs"])
+    total_annual_operational_costs += total_annual_fixed_costs
+
+    return {
+        "total_main_crop_variable_costs": total_main_crop_variable_costs,
+        "total_ratoon_crop_variable_costs": total_ratoon_crop_variable_costs,
+        "fixed_costs_details": fixed_costs_details,
+        "total_annual_fixed_costs": total_annual_fixed_costs,
+        "total_annual_operational_costs": total_annual_operational_costs,
+    }
+
+
+def calculate_profitability_batch(revenue_details, operational_expenditures, out):
+    total_revenue = revenue_details["total_gross_annual_revenue"]
+    gross_profit = np.add(operational_expenditures["total_main_crop_variable_costs"],
+                          operational_expenditures["total_ratoon_crop_variable_costs"],
+                          out=out["gross_profit_revenue_less_vc"])  # total variable costs, for now
+    np.subtract(total_revenue, gross_profit, out=gross_profit)
+    net_profit_before_tax = np.subtract(total_revenue, operational_expenditures["total_annual_operational_costs"],
+                                        out=out["net_profit_before_tax"])
+
+    return {
+        "gross_profit_revenue_less_vc": gross_profit,
+        "net_profit_before_tax": net_profit_before_tax,
+    }
+
+
+def _percent_of(numerator, denominator, out):
+    # (numerator / denominator) * 100 where denominator > 0, else 0 -- as in calculate_roi.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(numerator, denominator, out=out)
+    positive = denominator > 0
+    if not positive.all():
+        _select(_select_mask(positive), out, out=out)
+    out *= 100
+    return out
+
+
+def calculate_roi_batch(profitability_details, operational_expenditures, establishment_costs, out):
+    npbt = profitability_details["net_profit_before_tax"]
+    return {
+        "annual_operational_roi_percent": _percent_of(
+            npbt, operational_expenditures["total_annual_operational_costs"], out["annual_operational_roi_percent"]
+        ),
+        "roi_on_initial_establishment_percent": _percent_of(
+            npbt, establishment_costs["total_establishment_costs"], out["roi_on_initial_establishment_percent"]
+        ),
+    }
+
+
+def _row_blocks(inputs, out, n):
+    # Blocks of inputs, with their _select masks built in reused scratch rows, and of outputs.
+    scratch = np.empty((3, min(n, BLOCK_ROWS)), dtype=np.int64)
+    for start in range(0, max(n, 1), BLOCK_ROWS):
+        rows = slice(start, start + BLOCK_ROWS)
+        block_inputs = {name: values if np.ndim(values) == 0 else values[rows] for name, values in inputs.items()}
+        owned_mask = _select_mask(block_inputs["owned"], out=scratch[0])
+        block_inputs["owned_mask"] = owned_mask
+        block_inputs["rented_mask"] = np.invert(owned_mask, out=scratch[1][:owned_mask.size]) if owned_mask.ndim else ~owned_mask
+        block_inputs["ratoon_mask"] = _select_mask(block_inputs["ratoon"], out=scratch[2])
+        yield block_inputs, {name: values[rows] for name, values in out.items()}
+
+
+def run_full_model_batch(frame, budget=None, out=None):
+    """
+    Vectorized run_full_model over many scenarios at once.
+
+    `frame` is a pandas DataFrame, NumPy struct array or dict of arrays with one
+    row per scenario and the columns in BATCH_INPUT_COLUMNS (scalars broadcast).
+    `land_tenure` / `ratoon_crop_cultivation` may hold the UI strings
+    ("Owned"/"Rented", "Yes"/"No") or booleans. Returns a dict of float64 arrays
+    keyed by BATCH_OUTPUT_COLUMNS, or a DataFrame when given a DataFrame.
+    `budget` is a compiled BudgetCoefficients (see budgets.py); AgriLife defaults if omitted.
+
+    The stages run BLOCK_ROWS rows at a time and write straight into one
+    (outputs x rows) array, so there are no full-length temporaries and each
+    output is written to memory once. Columns holding one value for every row
+    stay scalars. The returned arrays are contiguous rows of that one array, so
+    keeping any of them keeps all of them alive. `out` is an optional C-contiguous
+    float64 array of shape (len(BATCH_OUTPUT_COLUMNS), rows) to write into instead,
+    e.g. a ResultTable block or a buffer reused across chunks.
+
+    Throughput target: 100x the scalar run_full_model per scenario on 1M rows
+    (benchmarks.SPEEDUP_TARGETS). Writing into a reused `out` meets it on a 1-CPU
+    reference machine; allocating a fresh result does not (about 65-70x there), since
+    first-touching 224 MB of new output takes most of the 100x time budget.
+    """
+    if budget is None:
+        budget = DEFAULT_BUDGET_COEFFICIENTS
+    n = row_count(frame)
+    inputs = read_batch_inputs(frame, scalars=True)
+    if out is None:
+        # One allocation instead of one per column: far cheaper to fault in.
+        out = np.empty((len(BATCH_OUTPUT_COLUMNS), n))
+    elif out.dtype != np.float64 or out.shape != (len(BATCH_OUTPUT_COLUMNS), n) or not out.flags.c_contiguous:
+        raise ValueError(f"out must be a C-contiguous float64 array of shape ({len(BATCH_OUTPUT_COLUMNS)}, {n})")
+    out = dict(zip(BATCH_OUTPUT_COLUMNS, out))
+
+    for block_inputs, block_out in _row_blocks(inputs, out, n):
+        revenue = calculate_revenue_batch(block_inputs, block_out)
+        establishment_costs = calculate_establishment_costs_batch(block_inputs, block_out)
+        operational_expenditures = calculate_annual_operational_expenditures_batch(block_inputs, block_out, budget)
+        profitability = calculate_profitability_batch(revenue, operational_expenditures, block_out)
+        calculate_roi_batch(profitability, operational_expenditures, establishment_costs, block_out)
+
+    if hasattr(frame, "index") and hasattr(frame, "columns"):
+        import pandas as pd
+        return pd.DataFrame(out, index=frame.index, copy=False)
+    return out
@@ -0,0 +1,174 @@
+# batch_runner.py
+
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .batch_calculations import row_count
+from .budgets import load_budget_file
+from .portfolio import evaluate_fields, field_output_columns, normalize_field_columns
+from .table_io import DEFAULT_CHUNK_ROWS, TableWriter, concatenate_tables, count_rows, detect_format, iter_table_chunks
+
+PARTS_SUFFIX = ".parts"
+MANIFEST_NAME = "manifest.json"
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+
+def _part_path(parts_dir, index, file_format):
+    return os.path.join(parts_dir, f"part-{index:06d}.{file_format}")
+
+
+def _run_manifest(input_path, chunk_rows, file_format, defaults, budget_files):
+    # Everything that decides partition boundaries or part contents; parts from a run
+    # with a different manifest cannot be reused.
+    stat = os.stat(input_path)
+    return {
+        "input": os.path.abspath(input_path),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "chunk_rows": chunk_rows,
+        "output_format": file_format,
+        "defaults": defaults,
+        "budget_files": [os.path.abspath(path) for path in budget_files],
+    }
+
+
+def _prepare_parts_dir(parts_dir, manifest, resume, log):
+    manifest_path = os.path.join(parts_dir, MANIFEST_NAME)
+    if os.path.isdir(parts_dir):
+        previous = None
+        if resume and os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                previous = json.load(f)
+        if previous == manifest:
+            return
+        if resume:
+            log(f"Discarding partial results in {parts_dir}: they came from different inputs or settings.")
+        shutil.rmtree(parts_dir)
+    os.makedirs(parts_dir)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+_WORKER_STATE = {}
+
+
+def _init_worker(defaults, budget_files):
+    for path in budget_files:
+        load_budget_file(path)
+    _WORKER_STATE.update(defaults=defaults)
+
+
+def _evaluate_partition(task):
+    index, first_row, chunk, part_path, file_format = task
+    columns = normalize_field_columns(chunk, _WORKER_STATE["defaults"], first_row)
+    results = evaluate_fields(columns)
+    # Written under a temporary name and renamed, so a part file on disk is always complete.
+    temporary_path = part_path + ".tmp"
+    with TableWriter(temporary_path, file_format) as writer:
+        writer.write(field_output_columns(columns, results))
+    os.replace(temporary_path, part_path)
+    return index, row_count(columns)
+
+
+class _Progress:
+    def __init__(self, total_rows, stream, enabled):
+        self.total_rows = total_rows
+        self.stream = stream
+        self.enabled = enabled
+        self.rows = 0
+        self.partitions = 0
+        self.resumed = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    def add(self, rows, resumed=False):
+        self.rows += rows
+        self.partitions += 1
+        self.resumed += resumed
+        if time.perf_counter() - self._last_report >= PROGRESS_INTERVAL_SECONDS:
+            self.report()
+
+    def report(self, final=False):
+        if not self.enabled:
+            return
+        self._last_report = time.perf_counter()
+        elapsed = self._last_report - self.started
+        done = f"{self.rows:,}" if self.total_rows is None else f"{self.rows:,}/{self.total_rows:,} ({self.rows / max(self.total_rows, 1):.0%})"
+        line = f"{done} rows, {self.partitions:,} partitions ({self.resumed:,} resumed), {self.rows / max(elapsed, 1e-9):,.0f} rows/s"
+        # Rewrite one line on a terminal; one line per report in log files.
+        interactive = self.stream.isatty()
+        print(line, end="\n" if final or not interactive else "\r", file=self.stream, flush=True)
+
+
+def run_batch_file(input_path, output_path, workers=1, chunk_rows=DEFAULT_CHUNK_ROWS, defaults=None,
+                   budget_files=(), resume=True, keep_parts=False, progress=True, stream=None):
+    """
+    Evaluates every row of a CSV/Parquet/JSONL scenario file and writes per-row results.
+
+    The input is cut into partitions of `chunk_rows` rows that are evaluated across a
+    process pool of `workers` processes (in-process when workers is 1). Each finished
+    partition is written to `<output>.parts/` immediately, so an interrupted run
+    restarted with the same arguments only evaluates the missing partitions. The parts
+    are concatenated into `output_path` (format from its extension) at the end.
+    Progress goes to `stream` (stderr by default). Returns a summary dict.
+    """
+    stream = stream or sys.stderr
+    defaults = defaults or {}
+    budget_files = list(budget_files)
+    output_format = detect_format(output_path)
+    parts_dir = output_path + PARTS_SUFFIX
+    manifest = _run_manifest(input_path, chunk_rows, output_format, defaults, budget_files)
+    _prepare_parts_dir(parts_dir, manifest, resume, lambda message: print(message, file=stream))
+
+    # The main process reads and partitions the input; workers only evaluate and write.
+    # At most two partitions per worker are in flight so memory stays flat.
+    tracker = _Progress(count_rows(input_path), stream, progress)
+    part_paths = []
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(defaults, budget_files)) if workers > 1 else None
+    if executor is None:
+        _init_worker(defaults, budget_files)
+    pending = set()
+    try:
+        for index, chunk in enumerate(iter_table_chunks(input_path, chunk_rows)):
+            part_path = _part_path(parts_dir, index, output_format)
+            part_paths.append(part_path)
+            if os.path.exists(part_path):
+                tracker.add(row_count(chunk), resumed=True)
+                continue
+            task = (index, index * chunk_rows, chunk, part_path, output_format)
+            if executor is None:
+                tracker.add(_evaluate_partition(task)[1])
+                continue
+            pending.add(executor.submit(_evaluate_partition, task))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tracker.add(future.result()[1])
+        for future in pending:
+            tracker.add(future.result()[1])
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    tracker.report(final=True)
+    if not part_paths:
+        raise ValueError(f"No rows in {input_path}")
+
+    temporary_output = output_path + ".tmp"
+    concatenate_tables(part_paths, temporary_output, output_format)
+    os.replace(temporary_output, output_path)
+    if not keep_parts:
+        shutil.rmtree(parts_dir)
+    return {
+        "input": input_path,
+        "output": output_path,
+        "rows": tracker.rows,
+        "partitions": len(part_paths),
+        "resumed_partitions": tracker.resumed,
+        "seconds": time.perf_counter() - tracker.started,
+    }
@@ -0,0 +1,529 @@
+# benchmarks.py
+"""
+Benchmark suite for the model engine and the Streamlit render path.
+
+    python -m rice_analysis bench -o results.json --baseline previous.json
+    python -m rice_analysis.benchmarks --filter stage.
+    python -m rice_analysis.benchmarks --filter import. --filter app.first_run
+
+Each case is timed asv-style: the number of calls per sample is calibrated so a
+sample takes at least `min_time` seconds, then the median of `repeats` samples
+is reported as throughput in the case's own unit (scenarios, draws, reruns).
+Results are JSON so runs can be compared between versions; the comparison fails
+when a case's throughput drops by more than `threshold` against the baseline.
+
+Start-up cases (STARTUP_BUDGETS_MS) time cold imports with `python -X importtime`
+and the app's first run, each in fresh interpreters; the run fails when one
+exceeds its budget or a light module pulls in NumPy, pandas, Arrow or Streamlit.
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from .model_calculations import DEFAULT_SCENARIO_PARAMS
+
+BENCHMARK_MIN_TIME = 0.2
+BENCHMARK_REPEATS = 5
+REGRESSION_THRESHOLD = 0.25
+# app.py sits beside the package in a source checkout; the app cases are skipped without it.
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(SOURCE_DIR, "app.py")
+
+# Cold start-up in milliseconds, median of fresh interpreters; None tracks a case without a budget.
+# An import counts the package and rice_analysis.<module> with everything they pull in beyond
+# interpreter start-up.
+STARTUP_BUDGETS_MS = {
+    "import.model_calculations": 5.0,
+    "import.model_graph": 10.0,
+    "import.budgets": 30.0,
+    "import.result_cache": 30.0,
+    "import.history_store": 30.0,
+    "import.cli": 30.0,
+    "import.batch_calculations": None,
+    "app.first_run": None,
+}
+# Batch case -> (scalar case, least acceptable throughput ratio). Misses are reported and fail the
+# run. Writing into a reused output buffer is expected to meet 100x; allocating a fresh 1M-row
+# result currently misses it (see run_full_model_batch).
+SPEEDUP_TARGETS = {
+    "batch.run_full_model_batch_1m": ("model.run_full_model", 100.0),
+    "batch.run_full_model_batch_1m_into_buffer": ("model.run_full_model", 100.0),
+}
+# Optional dependencies the budgeted imports must leave to the batch and UI features.
+HEAVY_PACKAGES = ("numpy", "pandas", "pyarrow", "streamlit", "altair")
+
+# name -> (setup, unit); setup returns (callable, items per call), or None to skip the case.
+BENCHMARKS = {}
+
+
+def benchmark(name, unit="calls"):
+    def register(setup):
+        BENCHMARKS[name] = (setup, unit)
+        return setup
+    return register
+
+
+def _scenario_params():
+    params = copy.deepcopy(DEFAULT_SCENARIO_PARAMS)
+    params["main_crop_yield_active"] = params["main_crop_yield_scenarios"][params["active_yield_scenario"]]
+    params["price_active"] = params["price_scenarios"][params["active_price_scenario"]]
+    return params
+
+
+def _scenario_columns(n, seed=0):
+    # n scenarios spread around the defaults, both tenures and both ratoon choices.
+    import numpy as np
+    from .batch_calculations import params_to_columns
+
+    rng = np.random.default_rng(seed)
+    columns = params_to_columns(_scenario_params())
+    columns.update({
+        "farm_size_acres": rng.uniform(20, 2000, n),
+        "land_tenure": rng.random(n) < 0.5,
+        "ratoon_crop_cultivation": rng.random(n) < 0.5,
+        "main_crop_yield_active": rng.uniform(50, 95, n),
+        "price_active": rng.uniform(10, 20, n),
+        "annual_land_rent_per_acre": rng.uniform(50, 150, n),
+    })
+    return columns
+
+
+# --- Scalar model and its stages ---
+
+@benchmark("model.run_full_model", unit="scenarios")
+def _bench_run_full_model():
+    from .model_calculations import run_full_model
+    params = copy.deepcopy(DEFAULT_SCENARIO_PARAMS)
+    return (lambda: run_full_model(params)), 1
+
+
+@benchmark("model.graph_fixed_cost_change", unit="scenarios")
+def _bench_model_graph_change():
+    from .model_graph import ModelGraph
+    graph = ModelGraph()
+    scenarios = itertools.cycle([dict(DEFAULT_SCENARIO_PARAMS, property_taxes_owned_total=taxes) for taxes in (500.0, 900.0)])
+
+    def change_input():
+        graph.set_inputs(next(scenarios))
+        return graph.full_model_results()
+    return change_input, 1
+
+
+@benchmark("stage.calculate_revenue", unit="calls")
+def _bench_calculate_revenue():
+    from .model_calculations import calculate_revenue
+    params = _scenario_params()
+    return (lambda: calculate_revenue(params)), 1
+
+
+@benchmark("stage.calculate_establishment_costs", unit="calls")
+def _bench_calculate_establishment_costs():
+    from .model_calculations import calculate_establishment_costs
+    params = _scenario_params()
+    return (lambda: calculate_establishment_costs(params)), 1
+
+
+@benchmark("stage.calculate_annual_operational_expenditures", unit="calls")
+def _bench_calculate_annual_operational_expenditures():
+    from .model_calculations import calculate_annual_operational_expenditures, calculate_revenue
+    params = _scenario_params()
+    revenue = calculate_revenue(params)
+    return (lambda: calculate_annual_operational_expenditures(params, revenue)), 1
+
+
+@benchmark("stage.calculate_profitability", unit="calls")
+def _bench_calculate_profitability():
+    from .model_calculations import calculate_annual_operational_expenditures, calculate_profitability, calculate_revenue
+    params = _scenario_params()
+    revenue = calculate_revenue(params)
+    expenditures = calculate_annual_operational_expenditures(params, revenue)
+    return (lambda: calculate_profitability(revenue, expenditures)), 1
+
+
+@benchmark("stage.calculate_roi", unit="calls")
+def _bench_calculate_roi():
+    from .model_calculations import (
+        calculate_annual_operational_expenditures,
+        calculate_establishment_costs,
+        calculate_profitability,
+        calculate_revenue,
+        calculate_roi,
+    )
+    params = _scenario_params()
+    revenue = calculate_revenue(params)
+    expenditures = calculate_annual_operational_expenditures(params, revenue)
+    establishment = calculate_establishment_costs(params)
+    profitability = calculate_profitability(revenue, expenditures)
+    return (lambda: calculate_roi(profitability, expenditures, establishment)), 1
+
+
+# --- Large batches ---
+
+@benchmark("batch.run_full_model_batch_1m", unit="scenarios")
+def _bench_run_full_model_batch():
+    from .batch_calculations import run_full_model_batch
+    columns = _scenario_columns(1_000_000)
+    return (lambda: run_full_model_batch(columns)), 1_000_000
+
+
+@benchmark("batch.run_full_model_batch_1m_into_buffer", unit="scenarios")
+def _bench_run_full_model_batch_into_buffer():
+    import numpy as np
+    from .batch_calculations import BATCH_OUTPUT_COLUMNS, run_full_model_batch
+    columns = _scenario_columns(1_000_000)
+    out = np.empty((len(BATCH_OUTPUT_COLUMNS), 1_000_000))
+    return (lambda: run_full_model_batch(columns, out=out)), 1_000_000
+
+
+@benchmark("batch.run_full_model_table_1m_to_pandas", unit="scenarios")
+def _bench_run_full_model_table():
+    from .result_table import run_full_model_table
+    columns = _scenario_columns(1_000_000)
+    return (lambda: run_full_model_table(columns).to_pandas()), 1_000_000
+
+
+@benchmark("batch.scenario_cube_201x201", unit="scenarios")
+def _bench_scenario_cube():
+    import numpy as np
+    from .batch_calculations import params_to_columns
+    from .scenario_cube import CUBE_AXES, build_scenario_cube
+
+    base = params_to_columns(_scenario_params())
+    for axis in CUBE_AXES:
+        base.pop(axis)
+    yields, prices = np.linspace(40, 110, 201), np.linspace(8, 24, 201)
+    return (lambda: build_scenario_cube(base, yields, prices)), 201 * 201 * 4
+
+
+@benchmark("batch.calculate_sensitivities_100k", unit="scenarios")
+def _bench_sensitivities():
+    from .sensitivity import calculate_sensitivities
+    columns = _scenario_columns(100_000)
+    return (lambda: calculate_sensitivities(columns)), 100_000
+
+
+@benchmark("batch.monte_carlo_200k", unit="draws")
+def _bench_monte_carlo():
+    from .monte_carlo import run_monte_carlo
+    params = _scenario_params()
+    return (lambda: run_monte_carlo(params, n_draws=200_000, seed=1)), 200_000
+
+
+@benchmark("batch.sweep_horizons_10k", unit="scenarios")
+def _bench_sweep_horizons():
+    import numpy as np
+    from .cash_flows import sweep_horizons
+
+    rng = np.random.default_rng(0)
+    establishment, profit = rng.uniform(1e4, 1e6, 10_000), rng.uniform(-1e4, 2e5, 10_000)
+    return (lambda: sweep_horizons(establishment, profit, 0.07, max_horizon=30)), 10_000
+
+
+@benchmark("batch.farm_plan_search_60k", unit="plans")
+def _bench_farm_plan_search():
+    import numpy as np
+    from .farm_plan import optimize_farm_plan
+
+    params = _scenario_params()
+    acreages, shares = np.linspace(20, 5000, 200), np.linspace(0, 1, 51)
+    # 2 tenures x 3 investment levels x 51 shares x 200 acreages, 4000 draws each.
+    return (lambda: optimize_farm_plan(params, acreages, shares, risk_limit=1e5, seed=1)), 2 * 3 * 51 * 200
+
+
+@benchmark("batch.history_bootstrap_30y_100k", unit="paths")
+def _bench_history_bootstrap():
+    import tempfile
+    import numpy as np
+    from .history_bootstrap import run_bootstrap
+    from .history_store import ingest_history, open_history
+
+    # 50 synthetic years, ingested into a throwaway store so the timed runs read memory-mapped columns.
+    store_dir = tempfile.mkdtemp(prefix="rice-history-bench-")
+    rng = np.random.default_rng(0)
+    source = os.path.join(store_dir, "history.csv")
+    with open(source, "w", encoding="utf-8") as f:
+        f.write("year,price,main_crop_yield\n")
+        for year in range(1975, 2025):
+            f.write(f"{year},{rng.uniform(9, 20):.2f},{rng.uniform(55, 90):.1f}\n")
+    ingest_history([source], "bench", store_dir)
+    history = open_history("bench", store_dir)
+    params = dict(_scenario_params(), project_time_horizon=30)
+    return (lambda: run_bootstrap(params, history, n_paths=100_000, seed=1)), 100_000
+
+
+# --- Streamlit script reruns, headless ---
+
+def _app_test():
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return None
+    if not os.path.exists(APP_PATH):
+        return None
+    app = AppTest.from_file(APP_PATH, default_timeout=120)
+    app.run()
+    return app
+
+
+@benchmark("app.rerun_idle", unit="reruns")
+def _bench_app_rerun():
+    app = _app_test()
+    if app is None:
+        return None
+    return (lambda: app.run()), 1
+
+
+@benchmark("app.rerun_input_change", unit="reruns")
+def _bench_app_input_change():
+    app = _app_test()
+    if app is None:
+        return None
+    taxes = itertools.cycle((500.0, 900.0))
+
+    def change_input():
+        # Live updates recompute only the fixed-cost side of the model graph.
+        next(field for field in app.number_input if field.label == "Property Taxes (Total Annual $)").set_value(next(taxes))
+        app.run()
+        if app.exception:
+            raise RuntimeError(f"app.py raised: {app.exception[0].value}")
+    return change_input, 1
+
+
+# --- Cold start-up, each sample in a fresh interpreter ---
+
+def _import_time(module):
+    # Milliseconds `python -X importtime` attributes to `import rice_analysis.<module>` (the package
+    # and the submodule are separate top-level entries), and the top-level packages it loaded.
+    qualified = f"{__package__}.{module}"
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {qualified}"], capture_output=True,
+                               text=True, cwd=SOURCE_DIR, timeout=120)
+    if completed.returncode:
+        raise RuntimeError(f"import {qualified} failed:\n{completed.stderr[-2000:]}")
+    milliseconds, packages = 0.0, set()
+    for line in completed.stderr.splitlines():
+        fields = line.split("|")
+        if not line.startswith("import time:") or len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].strip()
+        packages.add(name.split(".")[0])
+        if not fields[2].startswith("  ") and name in (__package__, qualified):
+            milliseconds += int(fields[1]) / 1e3
+    return milliseconds, packages
+
+
+def _app_first_run_time():
+    # Milliseconds from importing Streamlit to the end of the app's first (headless) run.
+    script = (
+        "import time\n"
+        "started = time.perf_counter()\n"
+        "from streamlit.testing.v1 import AppTest\n"
+        f"app = AppTest.from_file({APP_PATH!r}, default_timeout=120)\n"
+        "app.run()\n"
+        "print((time.perf_counter() - started) * 1e3, bool(app.exception))\n"
+    )
+    completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                               cwd=SOURCE_DIR, timeout=600)
+    if completed.returncode or completed.stdout.split()[-1] != "False":
+        raise RuntimeError(f"app.py first run failed:\n{completed.stderr[-2000:]}")
+    return float(completed.stdout.split()[-2]), set()
+
+
+def run_startup(names=None, repeats=BENCHMARK_REPEATS, log=None):
+    """Times the named start-up cases (all by default); returns (results, names over budget)."""
+    import importlib.util
+
+    results, failures = {}, []
+    for name in names or STARTUP_BUDGETS_MS:
+        kind, _, module = name.partition(".")
+        budget = STARTUP_BUDGETS_MS[name]
+        if kind == "app" and (importlib.util.find_spec("streamlit") is None or not os.path.exists(APP_PATH)):
+            results[name] = {"unit": "ms", "skipped": True}
+            if log:
+                log(f"{name:<50} skipped")
+            continue
+        measure = _app_first_run_time if kind == "app" else lambda: _import_time(module)
+        samples, packages = [], set()
+        for _ in range(repeats + 1):
+            milliseconds, loaded = measure()
+            samples.append(milliseconds)
+            packages |= loaded
+        samples = samples[1:]  # the first run may still be writing bytecode caches
+        heavy = sorted(package for package in HEAVY_PACKAGES if package in packages)
+        median = statistics.median(samples)
+        over_budget = budget is not None and (median > budget or bool(heavy))
+        results[name] = {
+            "unit": "ms",
+            "milliseconds": {"min": min(samples), "median": median, "max": max(samples)},
+            "budget_ms": budget,
+            "heavy_imports": heavy,
+            "over_budget": over_budget,
+        }
+        if over_budget:
+            failures.append(name)
+        if log:
+            limit = "" if budget is None else f"  (budget {budget:,.0f} ms)"
+            flag = f"  OVER BUDGET{' pulls in ' + ', '.join(heavy) if heavy else ''}" if over_budget else ""
+            log(f"{name:<50} {median:>16,.1f} ms{limit}{flag}")
+    return results, failures
+
+
+# --- Timing, storage and comparison ---
+
+def _sample(function, number):
+    started = time.perf_counter()
+    for _ in range(number):
+        function()
+    return time.perf_counter() - started
+
+
+def time_function(function, min_time=BENCHMARK_MIN_TIME, repeats=BENCHMARK_REPEATS):
+    """Seconds per call as {"min", "median", "max"}, plus the calibrated calls per sample."""
+    function()  # warm-up: imports, caches, first-touch allocation
+    number = 1
+    while True:
+        elapsed = _sample(function, number)
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.2))
+    samples = [elapsed / number] + [_sample(function, number) / number for _ in range(repeats - 1)]
+    return {"min": min(samples), "median": statistics.median(samples), "max": max(samples)}, number
+
+
+def _environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=SOURCE_DIR, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    import numpy
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor() or None,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_benchmarks(names=None, min_time=BENCHMARK_MIN_TIME, repeats=BENCHMARK_REPEATS, log=None):
+    """Runs the named cases (all by default) and returns the JSON-ready results document."""
+    results = {}
+    for name in names or BENCHMARKS:
+        setup, unit = BENCHMARKS[name]
+        case = setup()
+        if case is None:
+            results[name] = {"unit": unit, "skipped": True}
+            if log:
+                log(f"{name:<50} skipped")
+            continue
+        function, items = case
+        seconds, number = time_function(function, min_time, repeats)
+        results[name] = {
+            "unit": unit,
+            "items_per_call": items,
+            "number": number,
+            "repeats": repeats,
+            "seconds_per_call": seconds,
+            "items_per_second": items / seconds["median"],
+        }
+        if log:
+            log(f"{name:<50} {items / seconds['median']:>16,.1f} {unit}/s  (median {seconds['median'] * 1e3:,.3f} ms/call)")
+    return {"environment": _environment(), "results": results}
+
+
+def compare_results(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    [(name, baseline throughput, current throughput, ratio)] for cases present in
+    both runs, and the subset whose throughput fell below (1 - threshold) x baseline.
+    """
+    rows, regressions = [], []
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if result.get("skipped") or not previous or previous.get("skipped"):
+            continue
+        ratio = result["items_per_second"] / previous["items_per_second"]
+        row = (name, previous["items_per_second"], result["items_per_second"], ratio)
+        rows.append(row)
+        if ratio < 1.0 - threshold:
+            regressions.append(row)
+    return rows, regressions
+
+
+def check_speedups(current, targets=SPEEDUP_TARGETS):
+    """
+    [(batch case, scalar case, speed-up, target)] for targets with both cases in
+    `current`, and the subset below their target.
+    """
+    rows, misses = [], []
+    results = current["results"]
+    for name, (scalar_name, target) in targets.items():
+        batch, scalar = results.get(name), results.get(scalar_name)
+        if not batch or not scalar or batch.get("skipped") or scalar.get("skipped"):
+            continue
+        row = (name, scalar_name, batch["items_per_second"] / scalar["items_per_second"], target)
+        rows.append(row)
+        if row[2] < target:
+            misses.append(row)
+    return rows, misses
+
+
+def run_from_args(args):
+    if args.list:
+        for name, (_, unit) in BENCHMARKS.items():
+            print(f"{name}  ({unit})")
+        for name in STARTUP_BUDGETS_MS:
+            print(f"{name}  (ms)")
+        return 0
+    threshold = REGRESSION_THRESHOLD if args.threshold is None else args.threshold
+    min_time = BENCHMARK_MIN_TIME if args.min_time is None else args.min_time
+    repeats = BENCHMARK_REPEATS if args.repeats is None else args.repeats
+    selected = lambda names: [name for name in names if not args.filter or any(text in name for text in args.filter)]
+    log = lambda message: print(message, file=sys.stderr, flush=True)
+    names, startup_names = selected(BENCHMARKS), selected(STARTUP_BUDGETS_MS)
+    current = run_benchmarks(names, min_time, repeats, log) if names else {"environment": _environment(), "results": {}}
+    current["startup"], over_budget = run_startup(startup_names, repeats, log) if startup_names else ({}, [])
+    speedups, below_target = check_speedups(current)
+    current["speedups"] = {name: {"scalar_case": scalar_name, "speedup": speedup, "target": target}
+                           for name, scalar_name, speedup, target in speedups}
+    for name, scalar_name, speedup, target in speedups:
+        flag = "  BELOW TARGET" if speedup < target else ""
+        log(f"{name:<50} {speedup:>16,.1f}x {scalar_name}  (target {target:,.0f}x){flag}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    if over_budget:
+        print(f"{len(over_budget)} start-up case(s) over budget: {', '.join(over_budget)}.", file=sys.stderr)
+    if below_target:
+        print(f"{len(below_target)} batch case(s) below their speed-up target: {', '.join(row[0] for row in below_target)}.", file=sys.stderr)
+    failed = bool(over_budget or below_target)
+    if not args.baseline:
+        return 1 if failed else 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows, regressions = compare_results(current, baseline, threshold)
+    print(f"\nAgainst {args.baseline} (commit {baseline['environment'].get('commit')}):", file=sys.stderr)
+    for name, before, after, ratio in rows:
+        flag = "  REGRESSION" if ratio < 1.0 - threshold else ""
+        print(f"{name:<50} {before:>16,.1f} -> {after:>16,.1f}  ({ratio:.2f}x){flag}", file=sys.stderr)
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than {1.0 - threshold:.0%} of the baseline.", file=sys.stderr)
+        return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    from .cli import add_bench_arguments
+    parser = argparse.ArgumentParser(description="Benchmark the rice farming model.")
+    add_bench_arguments(parser)
+    sys.exit(run_from_args(parser.parse_args()))
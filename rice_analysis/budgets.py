@@ -0,0 +1,161 @@
+# budgets.py
+
+import copy
+import csv
+import hashlib
+import io
+import json
+import os
+from collections import OrderedDict
+
+from .model_calculations import AGRILIFE_DEFAULTS, compile_budget
+
+DEFAULT_BUDGET_ID = "agrilife_default"
+BUDGET_SECTIONS = ("main_crop", "ratoon_crop", "fixed_costs_per_acre")
+COMPILED_BUDGET_CACHE_SIZE = 128
+
+# Base budgets by id. Loaded budgets are complete: partial files are layered over their base.
+_BUDGET_REGISTRY = {DEFAULT_BUDGET_ID: AGRILIFE_DEFAULTS}
+# Compiled coefficients keyed by budget content hash, least recently used first.
+_COMPILED_BUDGETS = OrderedDict()
+
+
+def register_budget(budget_id, budget):
+    _BUDGET_REGISTRY[budget_id] = budget
+
+
+def get_budget(budget_id=DEFAULT_BUDGET_ID):
+    try:
+        return _BUDGET_REGISTRY[budget_id]
+    except KeyError:
+        raise ValueError(f"Unknown budget id: {budget_id!r}") from None
+
+
+def list_budgets():
+    return list(_BUDGET_REGISTRY)
+
+
+def apply_overrides(budget, overrides):
+    """
+    Returns a copy of `budget` with line items replaced, e.g. {"main_crop": {"seed": 52.0}}.
+    Unknown sections or line items raise ValueError so typos do not silently pass.
+    """
+    merged = copy.deepcopy(budget)
+    for section, items in (overrides or {}).items():
+        if section not in BUDGET_SECTIONS:
+            raise ValueError(f"Unknown budget section: {section!r}")
+        for item, value in items.items():
+            if item not in merged[section]:
+                raise ValueError(f"Unknown line item {item!r} in budget section {section!r}")
+            merged[section][item] = float(value)
+    return merged
+
+
+def budget_overrides(budget, base):
+    """Line items where `budget` differs from `base`, in the nested layout apply_overrides takes."""
+    overrides = {}
+    for section in BUDGET_SECTIONS:
+        changed = {item: value for item, value in budget[section].items() if base[section].get(item) != value}
+        if changed:
+            overrides[section] = changed
+    return overrides
+
+
+def budget_hash(budget):
+    # Canonical JSON of the cost sections only, so key order and metadata do not matter.
+    canonical = json.dumps({section: budget[section] for section in BUDGET_SECTIONS}, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def compile_budget_cached(budget):
+    """compile_budget memoized by content hash with LRU eviction."""
+    key = budget_hash(budget)
+    coefficients = _COMPILED_BUDGETS.get(key)
+    if coefficients is None:
+        coefficients = compile_budget(budget)
+        _COMPILED_BUDGETS[key] = coefficients
+        if len(_COMPILED_BUDGETS) > COMPILED_BUDGET_CACHE_SIZE:
+            _COMPILED_BUDGETS.popitem(last=False)
+    else:
+        _COMPILED_BUDGETS.move_to_end(key)
+    return coefficients
+
+
+def get_compiled_budget(budget_id=DEFAULT_BUDGET_ID, overrides=None):
+    """Coefficients for a registered budget with optional per-line-item overrides."""
+    return compile_budget_cached(apply_overrides(get_budget(budget_id), overrides))
+
+
+# --- Loading budgets for other regions and years ---
+
+def _layer_budgets(entries):
+    """
+    Builds {budget_id: budget} from {budget_id: (base_id, overrides)}. A base
+    names another budget in the same file first, wherever it appears, and a
+    registered budget otherwise.
+    """
+    budgets = {}
+
+    def resolve(budget_id, chain):
+        if budget_id in budgets:
+            return budgets[budget_id]
+        if budget_id not in entries:
+            return get_budget(budget_id)
+        if budget_id in chain:
+            raise ValueError(f"Budget {budget_id!r} is its own base: {' -> '.join(chain + (budget_id,))}")
+        base_id, overrides = entries[budget_id]
+        budgets[budget_id] = apply_overrides(resolve(base_id, chain + (budget_id,)), overrides)
+        return budgets[budget_id]
+
+    for budget_id in entries:
+        resolve(budget_id, ())
+    return budgets
+
+
+def parse_budget_json(text):
+    """
+    Parses budgets from JSON. Accepts a single budget or {"budgets": [...]}; each
+    budget has a "budget_id", an optional "base" id (default AgriLife) and any
+    subset of the sections in AGRILIFE_DEFAULTS. Returns {budget_id: budget}.
+    """
+    data = json.loads(text)
+    entries = data["budgets"] if "budgets" in data else [data]
+    return _layer_budgets({
+        entry["budget_id"]: (
+            entry.get("base", DEFAULT_BUDGET_ID),
+            {section: entry[section] for section in BUDGET_SECTIONS if section in entry},
+        )
+        for entry in entries
+    })
+
+
+def parse_budget_csv(text):
+    """
+    Parses budgets from CSV rows of budget_id,section,item,value (an optional
+    base column names the budget to start from). Returns {budget_id: budget}.
+    """
+    rows = {}
+    bases = {}
+    for row in csv.DictReader(io.StringIO(text)):
+        budget_id = row["budget_id"].strip()
+        bases.setdefault(budget_id, (row.get("base") or DEFAULT_BUDGET_ID).strip())
+        section = rows.setdefault(budget_id, {}).setdefault(row["section"].strip(), {})
+        section[row["item"].strip()] = float(row["value"])
+    return _layer_budgets({budget_id: (bases[budget_id], overrides) for budget_id, overrides in rows.items()})
+
+
+def load_budget_file(path, register=True):
+    """Loads a .json or .csv budget file and, by default, registers every budget in it."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        budgets = parse_budget_json(text)
+    elif extension == ".csv":
+        budgets = parse_budget_csv(text)
+    else:
+        raise ValueError(f"Unsupported budget file type: {path}")
+    if register:
+        for budget_id, budget in budgets.items():
+            register_budget(budget_id, budget)
+    return budgets
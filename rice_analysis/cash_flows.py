@@ -0,0 +1,232 @@
+# cash_flows.py
+
+import numpy as np
+
+# IRR search bracket: -99% to +1000% per year. Rows without a sign change in it get NaN.
+IRR_LOWER_BOUND = -0.99
+IRR_UPPER_BOUND = 10.0
+IRR_TOLERANCE = 1e-10
+IRR_MAX_ITERATIONS = 100
+
+
+def _as_rows(values, n):
+    values = np.asarray(values, dtype=np.float64)
+    return np.broadcast_to(values, (n,)) if values.shape != (n,) else values
+
+
+def build_cash_flow_schedule(establishment_costs, net_profit_before_tax, horizon,
+                             salvage_value=0.0, depreciation=0.0):
+    """
+    Year-by-year cash flows, one row per scenario and one column per year (0..max horizon).
+
+    Year 0 is the establishment outlay. Years 1..horizon carry the annual NPBT plus
+    `depreciation`, the non-cash charge added back to turn profit into cash.
+    `salvage_value` is received at the end of the final year. Years past a row's
+    own horizon are zero. All arguments broadcast over scenarios.
+    """
+    horizon = np.atleast_1d(np.asarray(horizon, dtype=np.int64))
+    n = max(np.size(establishment_costs), np.size(net_profit_before_tax), horizon.size,
+            np.size(salvage_value), np.size(depreciation))
+    horizon = _as_rows(horizon, n).astype(np.int64)
+    annual = _as_rows(net_profit_before_tax, n) + _as_rows(depreciation, n)
+
+    years = np.arange(int(horizon.max()) + 1 if n else 1)
+    schedule = np.where((years >= 1) & (years <= horizon[:, None]), annual[:, None], 0.0)
+    schedule[:, 0] = -_as_rows(establishment_costs, n)
+    schedule[np.arange(n), horizon] += _as_rows(salvage_value, n)
+    return schedule
+
+
+def _discount_factors(rate, years):
+    return (1.0 + np.asarray(rate, dtype=np.float64))[..., None] ** -years
+
+
+def npv(cash_flows, rate):
+    """Net present value of each schedule row; `rate` is a fraction, scalar or per row."""
+    cash_flows = np.atleast_2d(cash_flows)
+    rate = _as_rows(rate, cash_flows.shape[0])
+    return (cash_flows * _discount_factors(rate, np.arange(cash_flows.shape[1]))).sum(axis=1)
+
+
+def _rate_guess(outlay, total_inflow, mean_year):
+    # Simple average return on the outlay, spread over the cash-weighted mean year.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (total_inflow - outlay) / (np.abs(outlay) * np.maximum(mean_year, 1.0))
+
+
+def _solve_rates(evaluate, n, scale, guess=0.1):
+    """
+    Vectorized safeguarded Newton solve of evaluate(rate, rows) == 0 for all rows at once.
+
+    `evaluate` returns (value, slope) for the given rows. Each row keeps its own
+    bracket and falls back to bisection when a Newton step leaves it, so every
+    iteration is a handful of array operations over the rows still unsolved.
+    """
+    rows = np.arange(n)
+    lo = np.full(n, IRR_LOWER_BOUND)
+    hi = np.full(n, IRR_UPPER_BOUND)
+    f_lo, _ = evaluate(lo, rows)
+    f_hi, _ = evaluate(hi, rows)
+
+    solution = np.full(n, np.nan)
+    bracketed = np.isfinite(f_lo) & np.isfinite(f_hi) & (np.sign(f_lo) != np.sign(f_hi))
+    solution[bracketed & (f_lo == 0)] = IRR_LOWER_BOUND
+    active = rows[bracketed & (f_lo != 0)]
+    rate = np.clip(np.nan_to_num(np.broadcast_to(guess, (n,)), nan=0.1), lo, hi)
+    tolerance = IRR_TOLERANCE * np.maximum(scale, 1.0)
+
+    for _ in range(IRR_MAX_ITERATIONS):
+        if active.size == 0:
+            break
+        r = rate[active]
+        f, slope = evaluate(r, active)
+        done = (np.abs(f) <= tolerance[active]) | (hi[active] - lo[active] <= IRR_TOLERANCE)
+        solution[active[done]] = r[done]
+
+        keep = ~done
+        active, r, f, slope = active[keep], r[keep], f[keep], slope[keep]
+        below = np.sign(f) == np.sign(f_lo[active])
+        lo[active] = np.where(below, r, lo[active])
+        f_lo[active] = np.where(below, f, f_lo[active])
+        hi[active] = np.where(below, hi[active], r)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = r - f / slope
+        outside = ~np.isfinite(step) | (step <= lo[active]) | (step >= hi[active])
+        rate[active] = np.where(outside, 0.5 * (lo[active] + hi[active]), step)
+
+    solution[active] = rate[active]
+    return solution
+
+
+def irr(cash_flows):
+    """Internal rate of return of every schedule row, solved together. NaN where none is bracketed."""
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=np.float64))
+    years = np.arange(cash_flows.shape[1])
+
+    def evaluate(rate, rows):
+        discounted = cash_flows[rows] * _discount_factors(rate, years)
+        return discounted.sum(axis=1), -(discounted * years).sum(axis=1) / (1.0 + rate)
+
+    inflows = cash_flows[:, 1:].sum(axis=1)
+    mean_year = np.abs(cash_flows[:, 1:]) @ years[1:] / np.maximum(np.abs(cash_flows[:, 1:]).sum(axis=1), 1e-300)
+    guess = _rate_guess(-cash_flows[:, 0], inflows, mean_year)
+    return _solve_rates(evaluate, cash_flows.shape[0], np.abs(cash_flows).sum(axis=1), guess)
+
+
+def mirr(cash_flows, finance_rate, reinvest_rate, horizon=None):
+    """
+    Modified IRR: negative flows discounted at `finance_rate`, positive flows
+    compounded to the final year at `reinvest_rate`. `horizon` defaults to the
+    last schedule column; pass it per row for schedules of mixed length.
+    """
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=np.float64))
+    n, width = cash_flows.shape
+    years = np.arange(width)
+    horizon = _as_rows(width - 1 if horizon is None else horizon, n)
+
+    outflows = np.minimum(cash_flows, 0.0) * _discount_factors(_as_rows(finance_rate, n), years)
+    growth = (1.0 + _as_rows(reinvest_rate, n))[:, None] ** (horizon[:, None] - years)
+    inflows = np.where(years <= horizon[:, None], np.maximum(cash_flows, 0.0) * growth, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = inflows.sum(axis=1) / -outflows.sum(axis=1)
+        result = ratio ** (1.0 / horizon) - 1.0
+    return np.where(np.isfinite(result) & (ratio > 0), result, np.nan)
+
+
+def discounted_payback(cash_flows, rate):
+    """Years until cumulative discounted cash flow turns non-negative, interpolated within the year. NaN if never."""
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=np.float64))
+    n, width = cash_flows.shape
+    discounted = cash_flows * _discount_factors(_as_rows(rate, n), np.arange(width))
+    cumulative = np.cumsum(discounted, axis=1)
+
+    recovered = cumulative >= 0
+    year = np.argmax(recovered, axis=1)
+    previous = np.maximum(year - 1, 0)
+    rows = np.arange(n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = -cumulative[rows, previous] / discounted[rows, year]
+    payback = np.where(year == 0, 0.0, previous + fraction)
+    return np.where(recovered.any(axis=1), payback, np.nan)
+
+
+def calculate_investment_metrics(establishment_costs, net_profit_before_tax, discount_rate, horizon,
+                                 salvage_value=0.0, depreciation=0.0):
+    """
+    NPV, IRR, MIRR and discounted payback for one or many scenarios.
+
+    `discount_rate` is a fraction (0.07 for 7%) and is also used as the MIRR
+    finance and reinvestment rate. Returns a dict of arrays plus the schedule.
+    """
+    schedule = build_cash_flow_schedule(establishment_costs, net_profit_before_tax, horizon,
+                                        salvage_value, depreciation)
+    n = schedule.shape[0]
+    horizon = _as_rows(horizon, n)
+    return {
+        "cash_flow_schedule": schedule,
+        "npv": npv(schedule, discount_rate),
+        "irr": irr(schedule),
+        "mirr": mirr(schedule, discount_rate, discount_rate, horizon),
+        "discounted_payback_years": discounted_payback(schedule, discount_rate),
+    }
+
+
+def _annuity(rate, horizon):
+    # Present value of 1/year for `horizon` years and its derivative in the rate; series limit near 0.
+    near_zero = np.abs(rate) < 1e-7
+    safe_rate = np.where(near_zero, 1.0, rate)
+    v = 1.0 / (1.0 + rate)
+    v_h = v ** horizon
+    value = np.where(near_zero, horizon, (1.0 - v_h) / safe_rate)
+    weighted = np.where(
+        near_zero,
+        horizon * (horizon + 1) / 2.0,
+        v * (1.0 - (horizon + 1) * v_h + horizon * v_h * v) / np.where(near_zero, 1.0, 1.0 - v) ** 2,
+    )
+    return value, -v * weighted, v_h
+
+
+def _annuity_rate_guess(outlay, annual, horizon, iterations=3):
+    # A few fixed-point steps of r = (C / E) * (1 - (1 + r)^-h), started from the perpetuity yield C / E.
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        perpetuity = annual / outlay
+        guess = perpetuity
+        for _ in range(iterations):
+            guess = perpetuity * (1.0 - (1.0 + np.maximum(guess, IRR_LOWER_BOUND)) ** -horizon)
+    return guess
+
+
+def sweep_horizons(establishment_costs, net_profit_before_tax, discount_rate, max_horizon=30,
+                   salvage_value=0.0, depreciation=0.0):
+    """
+    NPV and IRR for every horizon 1..max_horizon at once, shape (scenarios, max_horizon).
+
+    Uses the closed-form annuity value of the flat schedule built by
+    build_cash_flow_schedule, so the cost is O(scenarios x horizons) per
+    iteration instead of re-discounting a full schedule for every horizon.
+    """
+    n = max(np.size(establishment_costs), np.size(net_profit_before_tax),
+            np.size(salvage_value), np.size(depreciation), np.size(discount_rate))
+    horizons = np.arange(1, max_horizon + 1, dtype=np.float64)
+    outlay = np.repeat(_as_rows(establishment_costs, n), max_horizon)
+    annual = np.repeat(_as_rows(net_profit_before_tax, n) + _as_rows(depreciation, n), max_horizon)
+    salvage = np.repeat(_as_rows(salvage_value, n), max_horizon)
+    h = np.tile(horizons, n)
+
+    def evaluate(rate, rows):
+        value, slope, v_h = _annuity(rate, h[rows])
+        f = -outlay[rows] + annual[rows] * value + salvage[rows] * v_h
+        df = annual[rows] * slope - h[rows] * salvage[rows] * v_h / (1.0 + rate)
+        return f, df
+
+    rate = np.repeat(_as_rows(discount_rate, n), max_horizon)
+    npv_values, _ = evaluate(rate, np.arange(n * max_horizon))
+    scale = np.abs(outlay) + np.abs(annual) * h + np.abs(salvage)
+    irr_values = _solve_rates(evaluate, n * max_horizon, scale, _annuity_rate_guess(outlay, annual, h))
+    return {
+        "horizons": horizons.astype(np.int64),
+        "npv": npv_values.reshape(n, max_horizon),
+        "irr": irr_values.reshape(n, max_horizon),
+    }
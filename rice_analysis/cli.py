@@ -0,0 +1,205 @@
+# cli.py
+"""
+Command-line entry point for headless runs, e.g.
+
+    python -m rice_analysis run scenarios.parquet -o results.parquet --workers 8
+    python -m rice_analysis bench -o results.json --baseline previous.json
+    python -m rice_analysis serve --port 8765
+    python -m rice_analysis loadgen --url http://127.0.0.1:8765 --connections 64
+    python -m rice_analysis history ingest prices.csv yields.csv --name us_long_grain
+    python -m rice_analysis history simulate --name us_long_grain --paths 100000 --horizon 30
+
+Subcommands import their engines lazily so `--help` and worker start-up stay cheap;
+nothing here imports Streamlit or pandas. `pip install .[batch]` (or `.[arrow]` for
+Parquet files) also installs this as the `rice-analysis` command.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+
+def _run(args):
+    from .batch_runner import run_batch_file
+
+    defaults = {}
+    if args.defaults:
+        with open(args.defaults, encoding="utf-8") as f:
+            defaults = json.load(f)
+    summary = run_batch_file(
+        args.input,
+        args.output,
+        workers=args.workers,
+        chunk_rows=args.chunk_rows,
+        defaults=defaults,
+        budget_files=args.budget_file,
+        resume=not args.no_resume,
+        keep_parts=args.keep_parts,
+        progress=not args.quiet,
+    )
+    if not args.quiet:
+        print(f"Wrote {summary['rows']:,} rows to {summary['output']} in {summary['seconds']:.2f}s", file=sys.stderr)
+    return 0
+
+
+def _bench(args):
+    from .benchmarks import run_from_args
+    return run_from_args(args)
+
+
+def add_bench_arguments(parser):
+    # Declared here so building the parser never imports benchmarks; None means the suite's default.
+    parser.add_argument("-o", "--output", help="Write results to this JSON file.")
+    parser.add_argument("--baseline", help="Results JSON from an earlier run to compare against.")
+    parser.add_argument("--threshold", type=float, help="Fail when a case's throughput drops by more than this fraction of the baseline.")
+    parser.add_argument("--filter", action="append", default=[], help="Only run cases whose name contains this text; repeatable.")
+    parser.add_argument("--min-time", type=float, help="Minimum seconds per sample.")
+    parser.add_argument("--repeats", type=int, help="Samples per case.")
+    parser.add_argument("--list", action="store_true", help="List case names and exit.")
+
+
+def _serve(args):
+    from .scoring_service import serve
+
+    defaults = {}
+    if args.defaults:
+        with open(args.defaults, encoding="utf-8") as f:
+            defaults = json.load(f)
+    serve(args.host, args.port, defaults, args.budget_file, args.max_batch_size, args.max_wait_ms, args.verbose)
+    return 0
+
+
+def _loadgen(args):
+    from .load_generator import format_summary, run_load
+
+    summary = run_load(args.url, args.connections, args.processes, args.duration, args.warmup, args.scenarios_per_request)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    print(format_summary(summary), file=sys.stderr)
+    return 1 if summary["errors"] or not summary["requests"] else 0
+
+
+def _history(args):
+    from . import history_store
+
+    store_dir = args.store or history_store.store_from_environment()
+    if args.action == "ingest":
+        entry = history_store.ingest_history(args.csv, args.name, store_dir)
+        print(f"Stored {args.name!r}: {entry['rows']} years ({entry['first_year']}-{entry['last_year']}), "
+              f"series {', '.join(column for column in entry['columns'] if column != 'year')}", file=sys.stderr)
+        return 0
+    if args.action == "list":
+        for name, entry in sorted(history_store.list_datasets(store_dir).items()):
+            series = ", ".join(column for column in entry["columns"] if column != "year")
+            print(f"{name}\t{entry['first_year']}-{entry['last_year']}\t{entry['rows']} years\t{series}")
+        return 0
+
+    import time
+    from .history_bootstrap import bootstrap_summary
+
+    params = {}
+    if args.defaults:
+        with open(args.defaults, encoding="utf-8") as f:
+            params = json.load(f)
+    if not params:
+        from .model_calculations import DEFAULT_SCENARIO_PARAMS
+        params = DEFAULT_SCENARIO_PARAMS
+    years = None
+    if args.first_year is not None or args.last_year is not None:
+        years = (-sys.maxsize if args.first_year is None else args.first_year, sys.maxsize if args.last_year is None else args.last_year)
+    history = history_store.open_history(args.name, store_dir, years=years)
+    started = time.perf_counter()
+    summary = bootstrap_summary(params, history, n_paths=args.paths, horizon=args.horizon, block_length=args.block_length,
+                                seed=args.seed, mode=args.mode)
+    seconds = time.perf_counter() - started
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, default=lambda value: value.tolist())
+    npv = summary["npv"]
+    print(f"{args.paths:,} paths of {summary['horizon']} years in {seconds:.3f}s: NPV mean ${npv['mean']:,.0f}, "
+          f"P5 ${npv['percentiles'][5]:,.0f}, P95 ${npv['percentiles'][95]:,.0f}, "
+          f"P(NPV < 0) {summary['probability_npv_negative']:.1%}", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="rice_analysis", description="Rice farming financial model, headless.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    run = subcommands.add_parser("run", help="Evaluate every row of a scenario file.",
+                                 description="Evaluate every row of a CSV, Parquet or JSONL scenario file and write one result row per input row.")
+    run.add_argument("input", help="Scenario file (.csv, .parquet, .jsonl). Columns use the batch input names or the portfolio aliases.")
+    run.add_argument("-o", "--output", required=True, help="Results file; the format follows the extension (.parquet, .csv, .jsonl).")
+    run.add_argument("--workers", type=int, default=1, help="Worker processes (default 1, 0 for one per CPU).")
+    run.add_argument("--chunk-rows", type=int, default=100_000, help="Rows per partition (default 100000).")
+    run.add_argument("--defaults", help="JSON object of column values for inputs the scenario file does not have.")
+    run.add_argument("--budget-file", action="append", default=[], help="Budget .json/.csv to register before evaluating; repeatable.")
+    run.add_argument("--no-resume", action="store_true", help="Ignore partial results from an interrupted run.")
+    run.add_argument("--keep-parts", action="store_true", help="Keep the per-partition files next to the output.")
+    run.add_argument("-q", "--quiet", action="store_true", help="No progress output.")
+    run.set_defaults(handler=_run)
+
+    bench = subcommands.add_parser("bench", help="Run the benchmark suite.",
+                                   description="Time the scalar model, its stages, large batches and app.py reruns; compare against a baseline.")
+    add_bench_arguments(bench)
+    bench.set_defaults(handler=_bench)
+
+    serve = subcommands.add_parser("serve", help="Serve the model over HTTP/JSON.",
+                                   description="Local scoring service: POST scenarios to /score, read latency and throughput from /stats.")
+    serve.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default 127.0.0.1).")
+    serve.add_argument("--port", type=int, default=8765, help="Port (default 8765).")
+    serve.add_argument("--max-batch-size", type=int, default=256, help="Most scenarios evaluated together (default 256).")
+    serve.add_argument("--max-wait-ms", type=float, default=2.0, help="Longest a request waits for its batch to fill (default 2).")
+    serve.add_argument("--defaults", help="JSON object of input values for scenarios that omit them.")
+    serve.add_argument("--budget-file", action="append", default=[], help="Budget .json/.csv to register at start-up; repeatable.")
+    serve.add_argument("-v", "--verbose", action="store_true", help="Log every request.")
+    serve.set_defaults(handler=_serve)
+
+    loadgen = subcommands.add_parser("loadgen", help="Load-test a running scoring service.",
+                                     description="Closed-loop load against /score; reports throughput and p50/p99 latency.")
+    loadgen.add_argument("--url", default="http://127.0.0.1:8765", help="Service base URL (default http://127.0.0.1:8765).")
+    loadgen.add_argument("--connections", type=int, default=32, help="Concurrent keep-alive connections (default 32).")
+    loadgen.add_argument("--processes", type=int, default=1, help="Client processes sharing the connections (default 1).")
+    loadgen.add_argument("--duration", type=float, default=10.0, help="Measured seconds (default 10).")
+    loadgen.add_argument("--warmup", type=float, default=1.0, help="Unmeasured seconds before that (default 1).")
+    loadgen.add_argument("--scenarios-per-request", type=int, default=1, help="Send lists of this many scenarios (default 1).")
+    loadgen.add_argument("-o", "--output", help="Also write the summary to this JSON file.")
+    loadgen.set_defaults(handler=_loadgen)
+
+    history = subcommands.add_parser("history", help="Historical price/yield store and bootstrap paths.",
+                                     description="Ingest historical series into the memory-mapped store and simulate multi-year paths from them.")
+    history.add_argument("--store", help="Store directory (default $RICE_HISTORY_DIR or ./history).")
+    actions = history.add_subparsers(dest="action", required=True)
+    ingest = actions.add_parser("ingest", help="Store CSV series as a dataset.",
+                                description="Each CSV has a year column and any of price, main_crop_yield, ratoon_crop_yield.")
+    ingest.add_argument("csv", nargs="+", help="Source CSV files, joined on year.")
+    ingest.add_argument("--name", required=True, help="Dataset name; an existing dataset of that name is replaced.")
+    actions.add_parser("list", help="List stored datasets.")
+    simulate = actions.add_parser("simulate", help="Block-bootstrap cash paths from a dataset.",
+                                  description="Cumulative cash and NPV distributions over paths resampled from history.")
+    simulate.add_argument("--name", required=True, help="Dataset to resample.")
+    simulate.add_argument("--defaults", help="JSON params for the scenario (default: the default scenario the app opens on).")
+    simulate.add_argument("--paths", type=int, default=10_000, help="Number of paths (default 10000).")
+    simulate.add_argument("--horizon", type=int, help="Years per path (default the params' project_time_horizon, else 10).")
+    simulate.add_argument("--block-length", type=int, default=3, help="Consecutive historical years per block (default 3).")
+    simulate.add_argument("--seed", type=int, default=0, help="Random seed (default 0).")
+    simulate.add_argument("--mode", choices=("relative", "absolute"), default="relative",
+                          help="Scale the scenario by each year's ratio to the series mean, or use historical values as-is.")
+    simulate.add_argument("--first-year", type=int, help="Only resample years from this one on.")
+    simulate.add_argument("--last-year", type=int, help="Only resample years up to this one.")
+    simulate.add_argument("-o", "--output", help="Write the summary to this JSON file.")
+    history.set_defaults(handler=_history)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "workers", 1) == 0:
+        args.workers = os.cpu_count() or 1
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
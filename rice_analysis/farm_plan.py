@@ -0,0 +1,227 @@
+# farm_plan.py
+"""
+Search over farm plans: rent or buy, how many acres, what share of them in
+ratoon practice and which establishment investment level, scored by expected
+NPBT or NPV against a downside-risk measure (CVaR or probability of loss).
+
+For a given tenure, practice and investment level every revenue and cost line
+is per acre, so one acre is simulated per Monte Carlo draw with
+run_full_model_batch and every plan is an exact linear combination of those
+"unit" outcomes: acres x (share x ratoon acre + (1 - share) x non-ratoon acre)
+plus the plan-level amounts (government payments, well and equipment
+purchases, salvage). Only tenures x levels x 2 practices are ever simulated;
+the acreage and share grids cost one sort per mix and a scaling per acreage.
+All plans see the same draws, so differences between them are not sampling noise.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .batch_calculations import params_to_columns, run_full_model_batch
+from .model_calculations import DEFAULT_LAND_RENT_PER_ACRE, DEFAULT_SCENARIO_PARAMS
+from .monte_carlo import default_risk_config, draw_inputs
+
+PLAN_TENURES = ("Owned", "Rented")
+RETURN_METRICS = ("npbt", "npv")
+RISK_MEASURES = ("cvar", "probability_of_loss")
+
+# (name, multiplier on land improvement costs, multiplier on main crop yield). Illustrative
+# defaults only: replace them with local quotes and trial data before trusting the choice.
+DEFAULT_INVESTMENT_LEVELS = (
+    ("Basic", 0.6, 0.95),
+    ("Standard", 1.0, 1.0),
+    ("Precision", 1.6, 1.05),
+)
+# Establishment costs that scale with acres and investment level; well and equipment are bought once per plan.
+LAND_IMPROVEMENT_COLUMNS = (
+    "land_clearing_cost",
+    "laser_land_leveling_cost_total",
+    "levee_surveying_construction_cost_total",
+    "on_farm_irrigation_system_installation_cost_total",
+)
+PLAN_FIXED_INVESTMENT_COLUMNS = ("well_drilling_pump_system_cost", "major_equipment_purchase_cost")
+
+# Used when params carry zero for the tenure they did not choose (app.py zeroes the other side).
+DEFAULT_LAND_PRICE_PER_ACRE = 3000.0
+DEFAULT_PROPERTY_TAX_PER_ACRE = DEFAULT_SCENARIO_PARAMS["property_taxes_owned_total"] / DEFAULT_SCENARIO_PARAMS["farm_size_acres"]
+DEFAULT_RATOON_CROP_YIELD = DEFAULT_SCENARIO_PARAMS["ratoon_crop_yield"]
+DEFAULT_RATOON_SHARES = tuple(np.linspace(0.0, 1.0, 11))
+DEFAULT_DRAWS = 4000
+
+
+def land_costs_per_acre(params):
+    """Land price, property tax and rent per acre implied by `params`, with defaults for the side not entered."""
+    acres = params["farm_size_acres"]
+    land_price = params.get("land_purchase_cost", 0.0) / acres
+    property_tax = params.get("property_taxes_owned_total", 0.0) / acres
+    rent = params.get("annual_land_rent_per_acre", 0.0)
+    return {
+        "land_price_per_acre": land_price if land_price > 0 else DEFAULT_LAND_PRICE_PER_ACRE,
+        "property_tax_per_acre": property_tax if property_tax > 0 else DEFAULT_PROPERTY_TAX_PER_ACRE,
+        "land_rent_per_acre": rent if rent > 0 else DEFAULT_LAND_RENT_PER_ACRE,
+    }
+
+
+def simulate_units(params, draws, investment_levels=DEFAULT_INVESTMENT_LEVELS, land_costs=None):
+    """
+    One acre of every tenure x investment level x practice (ratoon Yes, No) under
+    every draw. Returns per-acre "npbt" with shape (tenures, levels, 2, draws) and
+    per-acre "establishment" and "depreciation" with shape (tenures, levels, 2).
+    """
+    land_costs = land_costs or land_costs_per_acre(params)
+    acres = params["farm_size_acres"]
+    n_draws = draws["price_active"].size
+    shape = (len(PLAN_TENURES), len(investment_levels), 2, n_draws)
+    owned, level, ratoon, _ = np.meshgrid(
+        np.array([tenure == "Owned" for tenure in PLAN_TENURES]),
+        np.arange(len(investment_levels)),
+        np.array([True, False]),
+        np.arange(n_draws),
+        indexing="ij",
+    )
+    cost_scale = np.array([cost for _, cost, _ in investment_levels])[level]
+    yield_scale = np.array([yield_factor for _, _, yield_factor in investment_levels])[level]
+
+    columns = params_to_columns(params)
+    columns.update({
+        "farm_size_acres": 1.0,
+        "land_tenure": owned.ravel(),
+        "ratoon_crop_cultivation": ratoon.ravel(),
+        "main_crop_yield_active": (yield_scale * np.broadcast_to(draws["main_crop_yield_active"], shape)).ravel(),
+        "ratoon_crop_yield": np.broadcast_to(draws["ratoon_crop_yield"], shape).ravel(),
+        "price_active": np.broadcast_to(draws["price_active"], shape).ravel(),
+        "government_program_payments": 0.0,
+        "land_purchase_cost": np.where(owned, land_costs["land_price_per_acre"], 0.0).ravel(),
+        "property_taxes_owned_total": np.where(owned, land_costs["property_tax_per_acre"], 0.0).ravel(),
+        "annual_land_rent_per_acre": np.where(owned, 0.0, land_costs["land_rent_per_acre"]).ravel(),
+    })
+    for name in LAND_IMPROVEMENT_COLUMNS:
+        columns[name] = (cost_scale * (params.get(name, 0.0) / acres)).ravel()
+    for name in PLAN_FIXED_INVESTMENT_COLUMNS:
+        columns[name] = 0.0
+    results = run_full_model_batch(columns, params.get("budget_coefficients"))
+
+    depreciation = results["machinery_depreciation"] if "machinery_depreciation" in results else np.zeros(owned.size)
+    return {
+        "npbt": results["net_profit_before_tax"].reshape(shape),
+        "establishment": results["total_establishment_costs"].reshape(shape)[..., 0],
+        "depreciation": np.broadcast_to(depreciation, owned.size).reshape(shape)[..., 0],
+    }
+
+
+def _mix_metrics(values, acreages, constant, tail_count):
+    # values: (mixes, draws) per-acre outcomes. A plan is acres * value + constant, and scaling by
+    # acres > 0 keeps the order of draws, so one sort per mix serves every acreage.
+    ordered = np.sort(values, axis=1)
+    mean = ordered.mean(axis=1)
+    tail_mean = ordered[:, :tail_count].mean(axis=1)
+    with np.errstate(divide="ignore"):
+        thresholds = -constant / acreages
+    losses = np.array([np.searchsorted(row, thresholds, side="left") for row in ordered])
+    return {
+        "expected_return": mean[:, None] * acreages + constant,
+        "cvar": -(tail_mean[:, None] * acreages + constant),
+        "probability_of_loss": losses / values.shape[1],
+    }
+
+
+def _evaluate_mixes(task):
+    return _mix_metrics(*task)
+
+
+def pareto_frontier(expected_return, risk):
+    """Indices of the plans no other plan beats on both return (higher) and risk (lower), by rising risk."""
+    order = np.lexsort((-expected_return, risk))
+    best_before = np.maximum.accumulate(np.concatenate([[-np.inf], expected_return[order][:-1]]))
+    return order[expected_return[order] > best_before]
+
+
+def optimize_farm_plan(params, acreages, ratoon_shares=DEFAULT_RATOON_SHARES, investment_levels=DEFAULT_INVESTMENT_LEVELS,
+                       land_costs=None, objective="npv", risk_measure="cvar", risk_limit=None, confidence_level=0.95,
+                       risk_config=None, n_draws=DEFAULT_DRAWS, seed=0, workers=1):
+    """
+    Scores every plan in PLAN_TENURES x `investment_levels` x `ratoon_shares` x
+    `acreages` and returns {"candidates": {column: array}, "frontier": indices,
+    "best": index or None, ...}.
+
+    `objective` is expected annual NPBT or NPV over params["project_time_horizon"]
+    at params["discount_rate"] percent, reading each draw as the long-run average
+    year. CVaR is the mean loss (positive = loss) in the worst 1 - confidence_level
+    share of draws. "best" maximises the objective among plans whose
+    `risk_measure` is at most `risk_limit` (all plans when None), and is None if
+    none qualifies. `workers` > 1 scores the mixes in a process pool.
+    """
+    if objective not in RETURN_METRICS:
+        raise ValueError(f"objective must be one of {', '.join(RETURN_METRICS)}")
+    if risk_measure not in RISK_MEASURES:
+        raise ValueError(f"risk_measure must be one of {', '.join(RISK_MEASURES)}")
+    acreages = np.asarray(acreages, dtype=np.float64)
+    shares = np.asarray(ratoon_shares, dtype=np.float64)
+    if acreages.size == 0 or (acreages <= 0).any() or shares.size == 0 or ((shares < 0) | (shares > 1)).any():
+        raise ValueError("acreages must be positive and ratoon shares between 0 and 1")
+
+    plan_params = dict(params)
+    if not plan_params.get("ratoon_crop_yield"):
+        plan_params["ratoon_crop_yield"] = DEFAULT_RATOON_CROP_YIELD
+    if risk_config is None:
+        risk_config = default_risk_config(plan_params)
+    draws = draw_inputs(risk_config, n_draws, np.random.default_rng(seed))
+    units = simulate_units(plan_params, draws, investment_levels, land_costs)
+
+    # Mix the practices: (tenures, levels, shares, draws) per acre.
+    share = shares[:, None]
+    npbt = share * units["npbt"][:, :, :1] + (1.0 - share) * units["npbt"][:, :, 1:]
+    establishment = shares * units["establishment"][:, :, :1] + (1.0 - shares) * units["establishment"][:, :, 1:]
+    depreciation = shares * units["depreciation"][:, :, :1] + (1.0 - shares) * units["depreciation"][:, :, 1:]
+
+    government_payments = params.get("government_program_payments", 0.0)
+    fixed_investment = sum(params.get(name, 0.0) for name in PLAN_FIXED_INVESTMENT_COLUMNS)
+    if objective == "npbt":
+        values, constant = npbt, government_payments
+    else:
+        horizon = int(params.get("project_time_horizon", DEFAULT_SCENARIO_PARAMS["project_time_horizon"]))
+        discount = (1.0 + params.get("discount_rate", DEFAULT_SCENARIO_PARAMS["discount_rate"]) / 100) ** -np.arange(1, horizon + 1, dtype=np.float64)
+        cash = npbt + (depreciation[..., None] if params.get("add_back_depreciation", DEFAULT_SCENARIO_PARAMS["add_back_depreciation"]) else 0.0)
+        values = discount.sum() * cash - establishment[..., None]
+        constant = discount.sum() * government_payments - fixed_investment + params.get("salvage_value", 0.0) * discount[-1]
+
+    mixes_shape = values.shape[:3]
+    values = values.reshape(-1, n_draws)
+    tail_count = max(1, round((1.0 - confidence_level) * n_draws))
+    if workers and workers > 1:
+        tasks = [(rows, acreages, constant, tail_count) for rows in np.array_split(values, workers) if rows.size]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(_evaluate_mixes, tasks))
+        metrics = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    else:
+        metrics = _mix_metrics(values, acreages, constant, tail_count)
+
+    tenure, level, share_index, acre_index = (index.ravel() for index in np.indices(mixes_shape + (acreages.size,)))
+    candidates = {
+        "land_tenure": np.array(PLAN_TENURES, dtype=object)[tenure],
+        "investment_level": np.array([name for name, _, _ in investment_levels], dtype=object)[level],
+        "ratoon_share": shares[share_index],
+        "farm_size_acres": acreages[acre_index],
+        "ratoon_acres": shares[share_index] * acreages[acre_index],
+        "establishment_costs": establishment[tenure, level, share_index] * acreages[acre_index] + fixed_investment,
+    }
+    candidates.update({name: values.ravel() for name, values in metrics.items()})
+    candidates["risk"] = candidates[risk_measure]
+
+    feasible = np.ones(tenure.size, dtype=bool) if risk_limit is None else candidates["risk"] <= risk_limit
+    best = None
+    if feasible.any():
+        best = int(np.flatnonzero(feasible)[np.argmax(candidates["expected_return"][feasible])])
+    return {
+        "candidates": candidates,
+        "frontier": pareto_frontier(candidates["expected_return"], candidates["risk"]),
+        "best": best,
+        "objective": objective,
+        "risk_measure": risk_measure,
+        "risk_limit": risk_limit,
+        "confidence_level": confidence_level,
+        "n_draws": n_draws,
+        "plans_evaluated": int(tenure.size),
+        "unit_scenarios_simulated": int(units["npbt"].size),
+    }
@@ -0,0 +1,235 @@
+# history_bootstrap.py
+"""
+Multi-year cash paths resampled from history (see history_store.py).
+
+Each path strings together `horizon` historical years drawn as circular moving
+blocks of `block_length` consecutive years, so runs of bad years and the way
+price and yield moved together in a year are kept. Price and yield only vary
+by year, so the model is evaluated once per historical year with
+run_full_model_batch and a path is a gather from those annual cash flows: the
+cost per path is independent of the model and of how many paths came before.
+
+With mode="relative" (default) a historical year moves the scenario's own
+price and yields by that year's ratio to the series mean, so the sidebar
+scenarios stay the centre of the distribution; mode="absolute" uses the
+historical values as they are. Series the history lacks keep the scenario value.
+"""
+
+import math
+
+import numpy as np
+
+from .batch_calculations import params_to_columns, run_full_model_batch
+from .history_store import HISTORY_SERIES
+from .model_calculations import DEFAULT_SCENARIO_PARAMS
+
+DEFAULT_BLOCK_LENGTH = 3
+DEFAULT_PATHS = 10_000
+DEFAULT_CHUNK_PATHS = 65_536
+DEFAULT_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+# Histogram bins per year for bootstrap_summary's cumulative cash bands.
+DEFAULT_BAND_BINS = 4096
+BOOTSTRAP_MODES = ("relative", "absolute")
+
+# Financial parameters a params dict may leave out; they default to the default scenario's.
+FINANCIAL_INPUTS = ("discount_rate", "project_time_horizon", "salvage_value", "add_back_depreciation")
+
+
+def annual_outcomes(params, history, mode="relative"):
+    """
+    The scenario in `params` replayed in every historical year: returns
+    (establishment costs, annual cash flow per historical year). Annual cash is
+    NPBT plus machinery depreciation when params["add_back_depreciation"] is set.
+    """
+    if mode not in BOOTSTRAP_MODES:
+        raise ValueError(f"mode must be one of {', '.join(BOOTSTRAP_MODES)}")
+    columns = params_to_columns(params)
+    for series, column in HISTORY_SERIES.items():
+        if series not in history:
+            continue
+        values = np.asarray(history[series], dtype=np.float64)
+        if mode == "relative":
+            mean = values.mean()
+            columns[column] = columns[column] * (values / mean if mean > 0 else np.ones_like(values))
+        else:
+            columns[column] = values
+    results = run_full_model_batch(columns, params.get("budget_coefficients"))
+
+    annual_cash = np.broadcast_to(results["net_profit_before_tax"], history["year"].shape).astype(np.float64)
+    if params.get("add_back_depreciation", DEFAULT_SCENARIO_PARAMS["add_back_depreciation"]) and "machinery_depreciation" in results:
+        annual_cash = annual_cash + results["machinery_depreciation"]
+    return float(np.ravel(results["total_establishment_costs"])[0]), annual_cash
+
+
+def block_bootstrap_indices(n_years, horizon, n_paths, block_length, rng):
+    """(n_paths, horizon) indices into an array of n_years + block_length - 1 values (history wrapped circularly)."""
+    n_blocks = math.ceil(horizon / block_length)
+    starts = rng.integers(0, n_years, size=(n_paths, n_blocks))
+    indices = starts[:, :, None] + np.arange(block_length)
+    return indices.reshape(n_paths, n_blocks * block_length)[:, :horizon]
+
+
+def _prepare(params, history, n_paths, horizon, block_length, mode):
+    # (horizon, discount rate, salvage, establishment costs, annual cash per historical year)
+    settings = {name: params.get(name, DEFAULT_SCENARIO_PARAMS[name]) for name in FINANCIAL_INPUTS}
+    horizon = int(horizon or settings["project_time_horizon"])
+    if horizon < 1 or block_length < 1 or n_paths < 1:
+        raise ValueError("horizon, block_length and n_paths must be at least 1")
+    establishment, annual_cash = annual_outcomes(dict(params, **settings), history, mode)
+    return horizon, settings["discount_rate"] / 100, float(settings["salvage_value"]), establishment, annual_cash
+
+
+def _iter_paths(annual_cash, establishment, salvage, rate, horizon, n_paths, block_length, seed, chunk_paths):
+    """Yields (cumulative cash (size, horizon + 1), NPV (size,)) for consecutive chunks of paths."""
+    n_years = annual_cash.size
+    # Wrapping the history once up front turns the circular index into a plain gather.
+    wrapped_cash = np.resize(annual_cash, n_years + block_length - 1)
+    discount = (1.0 + rate) ** -np.arange(1, horizon + 1, dtype=np.float64)
+    sizes = [min(chunk_paths, n_paths - start) for start in range(0, n_paths, chunk_paths)]
+    for size, chunk_seed in zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))):
+        rng = np.random.default_rng(chunk_seed)
+        cash = wrapped_cash[block_bootstrap_indices(n_years, horizon, size, block_length, rng)]
+        cumulative_cash = np.empty((size, horizon + 1))
+        cumulative_cash[:, 0] = -establishment
+        np.cumsum(cash, axis=1, out=cumulative_cash[:, 1:])
+        cumulative_cash[:, 1:] -= establishment
+        cumulative_cash[:, -1] += salvage
+        yield cumulative_cash, cash @ discount - establishment + salvage * discount[-1]
+
+
+def run_bootstrap(params, history, n_paths=DEFAULT_PATHS, horizon=None, block_length=DEFAULT_BLOCK_LENGTH,
+                  seed=0, mode="relative", chunk_paths=DEFAULT_CHUNK_PATHS):
+    """
+    Block-bootstrap `n_paths` cash paths of `horizon` years (default
+    params["project_time_horizon"]) from `history`, e.g. open_history(...).
+
+    Year 0 is the establishment outlay and the salvage value arrives at the end
+    of the final year, as in cash_flows.build_cash_flow_schedule. Returns
+    per-path "cumulative_cash" (n_paths, horizon + 1) and "npv" (n_paths,) at
+    params["discount_rate"] percent. Paths are drawn in chunks of `chunk_paths`
+    seeded by SeedSequence(seed).spawn, so results do not depend on memory limits.
+    Use bootstrap_summary when only the distributions are needed: it does not
+    hold the (n_paths, horizon + 1) matrix.
+    """
+    horizon, rate, salvage, establishment, annual_cash = _prepare(params, history, n_paths, horizon, block_length, mode)
+    cumulative_cash = np.empty((n_paths, horizon + 1))
+    npv = np.empty(n_paths)
+    start = 0
+    for block, block_npv in _iter_paths(annual_cash, establishment, salvage, rate, horizon, n_paths, block_length,
+                                        seed, chunk_paths):
+        cumulative_cash[start:start + block_npv.size] = block
+        npv[start:start + block_npv.size] = block_npv
+        start += block_npv.size
+
+    return {
+        "n_paths": n_paths,
+        "horizon": horizon,
+        "block_length": block_length,
+        "seed": seed,
+        "mode": mode,
+        "discount_rate": rate,
+        "history_years": np.array(history["year"]),
+        "annual_cash_by_history_year": annual_cash,
+        "establishment_costs": establishment,
+        "cumulative_cash": cumulative_cash,
+        "npv": npv,
+    }
+
+
+def _describe(values, percentiles):
+    return {
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "percentiles": dict(zip(percentiles, np.percentile(values, percentiles).tolist())),
+    }
+
+
+def summarize_bootstrap(results, percentiles=DEFAULT_PERCENTILES):
+    """NPV and final cumulative cash distributions plus cumulative cash percentile bands by year."""
+    final_cash = results["cumulative_cash"][:, -1]
+    recovered = results["cumulative_cash"][:, 1:] >= 0
+    return {
+        "n_paths": results["n_paths"],
+        "horizon": results["horizon"],
+        "npv": _describe(results["npv"], percentiles),
+        "probability_npv_negative": float(np.mean(results["npv"] < 0)),
+        "final_cumulative_cash": _describe(final_cash, percentiles),
+        "probability_cash_negative_at_horizon": float(np.mean(final_cash < 0)),
+        "probability_payback_within_horizon": float(np.mean(recovered.any(axis=1))),
+        "cumulative_cash_by_year": {
+            "years": np.arange(results["horizon"] + 1),
+            "percentiles": dict(zip(percentiles, np.percentile(results["cumulative_cash"], percentiles, axis=0))),
+        },
+    }
+
+
+def _band_quantile(counts, low, width, observed_min, observed_max, q):
+    # Linear interpolation inside the histogram bin holding rank q * count, as in monte_carlo.
+    target = q * counts.sum()
+    cumulative = np.cumsum(counts)
+    i = min(int(np.searchsorted(cumulative, target, side="left")), counts.size - 1)
+    before = cumulative[i] - counts[i]
+    fraction = (target - before) / counts[i] if counts[i] else 0.0
+    return min(max(low + (i + fraction) * width, observed_min), observed_max)
+
+
+def bootstrap_summary(params, history, n_paths=DEFAULT_PATHS, horizon=None, block_length=DEFAULT_BLOCK_LENGTH,
+                      seed=0, mode="relative", chunk_paths=DEFAULT_CHUNK_PATHS, percentiles=DEFAULT_PERCENTILES,
+                      bins=DEFAULT_BAND_BINS):
+    """
+    summarize_bootstrap(run_bootstrap(...)) for the same paths, accumulated one
+    chunk at a time instead of holding every path's cumulative cash.
+
+    NPV and final cash are kept per path (16 bytes a path), so their statistics
+    are exact. The cumulative cash bands by year come from one histogram per
+    year over the cash that year can reach (`bins` bins between establishing
+    in the worst and in the best historical year every year), so each band is
+    within 1 / bins of that range of the exact percentile.
+    """
+    horizon, rate, salvage, establishment, annual_cash = _prepare(params, history, n_paths, horizon, block_length, mode)
+    years = np.arange(horizon + 1)
+    low = -establishment + years * annual_cash.min()
+    high = -establishment + years * annual_cash.max()
+    low[-1] += salvage
+    high[-1] += salvage
+    width = (high - low) / bins
+    scale = np.divide(1.0, width, out=np.zeros_like(width), where=width > 0)
+
+    npv = np.empty(n_paths)
+    final_cash = np.empty(n_paths)
+    counts = np.zeros((horizon + 1) * bins, dtype=np.int64)
+    observed_min = np.full(horizon + 1, np.inf)
+    observed_max = np.full(horizon + 1, -np.inf)
+    paid_back = 0
+    start = 0
+    for block, block_npv in _iter_paths(annual_cash, establishment, salvage, rate, horizon, n_paths, block_length,
+                                        seed, chunk_paths):
+        size = block_npv.size
+        npv[start:start + size] = block_npv
+        final_cash[start:start + size] = block[:, -1]
+        paid_back += int(np.count_nonzero((block[:, 1:] >= 0).any(axis=1)))
+        np.minimum(observed_min, block.min(axis=0), out=observed_min)
+        np.maximum(observed_max, block.max(axis=0), out=observed_max)
+        # Rounding in the running sums can land a hair outside a year's range; clip into its end bins.
+        index = np.clip(((block - low) * scale).astype(np.int64), 0, bins - 1) + years * bins
+        counts += np.bincount(index.ravel(), minlength=counts.size)
+        start += size
+
+    counts = counts.reshape(horizon + 1, bins)
+    bands = {
+        p: np.array([_band_quantile(counts[t], low[t], width[t], observed_min[t], observed_max[t], p / 100)
+                     for t in years])
+        for p in percentiles
+    }
+    return {
+        "n_paths": n_paths,
+        "horizon": horizon,
+        "npv": _describe(npv, percentiles),
+        "probability_npv_negative": float(np.mean(npv < 0)),
+        "final_cumulative_cash": _describe(final_cash, percentiles),
+        "probability_cash_negative_at_horizon": float(np.mean(final_cash < 0)),
+        "probability_payback_within_horizon": paid_back / n_paths,
+        "cumulative_cash_by_year": {"years": years, "percentiles": bands},
+    }
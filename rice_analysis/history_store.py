@@ -0,0 +1,188 @@
+# history_store.py
+"""
+On-disk store of historical price and yield series, e.g. for history_bootstrap.py.
+
+    python -m rice_analysis history ingest prices.csv yields.csv --name us_long_grain
+
+Each source CSV has a `year` column and one or more of the HISTORY_SERIES
+columns (other columns are ignored). Files are joined on year; only years
+present in every file are kept. A dataset is stored as one .npy file per
+column under <store>/<name>/, described by <store>/manifest.json, so
+open_history() maps the columns read-only instead of reading them and slicing a
+year window is a view, not a copy. NumPy is only imported to ingest or open a
+dataset, so listing the store (as the app sidebar does) stays cheap.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+# Series a history file may carry, and the batch input column each one drives.
+HISTORY_SERIES = {
+    "price": "price_active",
+    "main_crop_yield": "main_crop_yield_active",
+    "ratoon_crop_yield": "ratoon_crop_yield",
+}
+STORE_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+DEFAULT_STORE_DIR = "history"
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_history_csv(path):
+    """{"year": int64 array, series: float64 array, ...} from one CSV, sorted by year."""
+    import numpy as np
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        if "year" not in header:
+            raise ValueError(f"{path}: no 'year' column")
+        series = [name for name in header if name in HISTORY_SERIES]
+        if not series:
+            raise ValueError(f"{path}: none of the columns {', '.join(HISTORY_SERIES)}")
+        positions = {name: header.index(name) for name in ["year"] + series}
+        rows = []
+        for line_number, row in enumerate(reader, start=2):
+            if not any(cell.strip() for cell in row):
+                continue
+            try:
+                rows.append([float(row[positions[name]]) for name in positions])
+            except (ValueError, IndexError):
+                raise ValueError(f"{path}, line {line_number}: every column in {', '.join(positions)} must be a number") from None
+
+    values = np.array(rows, dtype=np.float64).reshape(-1, len(positions))
+    years = values[:, 0]
+    if not np.array_equal(years, np.round(years)):
+        raise ValueError(f"{path}: years must be whole numbers")
+    order = np.argsort(years, kind="stable")
+    years = years[order].astype(np.int64)
+    duplicated = years[1:][years[1:] == years[:-1]]
+    if duplicated.size:
+        raise ValueError(f"{path}: year {duplicated[0]} appears more than once")
+    table = {"year": years}
+    for i, name in enumerate(series, start=1):
+        table[name] = values[order, i]
+    return table
+
+
+def merge_history(tables):
+    """Joins per-file tables on year, keeping the years every table has."""
+    import numpy as np
+    years = tables[0]["year"]
+    for table in tables[1:]:
+        years = np.intersect1d(years, table["year"])
+    merged = {"year": years}
+    for table in tables:
+        keep = np.isin(table["year"], years)
+        for name, values in table.items():
+            if name == "year":
+                continue
+            if name in merged:
+                raise ValueError(f"Series {name!r} is given by more than one file")
+            merged[name] = values[keep]
+    return merged
+
+
+def load_manifest(store_dir=DEFAULT_STORE_DIR):
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"format_version": STORE_FORMAT_VERSION, "datasets": {}}
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != STORE_FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported history store format {manifest.get('format_version')!r}")
+    return manifest
+
+
+def list_datasets(store_dir=DEFAULT_STORE_DIR):
+    """Manifest entries by dataset name."""
+    return load_manifest(store_dir)["datasets"]
+
+
+def _write_atomic(path, write):
+    # Readers never see a half-written file: write beside the target, then rename over it.
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as f:
+            write(f)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def ingest_history(csv_paths, name, store_dir=DEFAULT_STORE_DIR):
+    """Reads and joins `csv_paths`, stores them as dataset `name` (replacing it) and returns its manifest entry."""
+    import numpy as np
+    if not name or os.sep in name or name.startswith("."):
+        raise ValueError(f"Invalid dataset name: {name!r}")
+    history = merge_history([read_history_csv(path) for path in csv_paths])
+    if history["year"].size < 2:
+        raise ValueError("History needs at least two years that every file covers")
+    for series in HISTORY_SERIES:
+        if series in history and not (np.isfinite(history[series]).all() and (history[series] >= 0).all()):
+            raise ValueError(f"Series {series!r} must be finite and non-negative")
+
+    dataset_dir = os.path.join(store_dir, name)
+    os.makedirs(dataset_dir, exist_ok=True)
+    columns = {}
+    for column, values in history.items():
+        values = np.ascontiguousarray(values)
+        _write_atomic(os.path.join(dataset_dir, f"{column}.npy"), lambda f, values=values: np.save(f, values))
+        columns[column] = {"file": f"{name}/{column}.npy", "dtype": values.dtype.str}
+        if column != "year":
+            columns[column].update(mean=float(values.mean()), min=float(values.min()), max=float(values.max()))
+
+    entry = {
+        "rows": int(history["year"].size),
+        "first_year": int(history["year"][0]),
+        "last_year": int(history["year"][-1]),
+        "columns": columns,
+        "sources": [{"path": os.path.abspath(path), "sha256": _file_sha256(path)} for path in csv_paths],
+        "ingested_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    manifest = load_manifest(store_dir)
+    manifest["datasets"][name] = entry
+    _write_atomic(os.path.join(store_dir, MANIFEST_NAME),
+                  lambda f: f.write(json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8")))
+    return entry
+
+
+def open_history(name, store_dir=DEFAULT_STORE_DIR, years=None):
+    """
+    Dataset `name` as {column: read-only memory-mapped array}. `years` is an
+    optional inclusive (first, last) window, returned as views of the mapped files.
+    """
+    import numpy as np
+    datasets = list_datasets(store_dir)
+    if name not in datasets:
+        raise KeyError(f"No history dataset {name!r} in {store_dir}")
+    entry = datasets[name]
+    history = {}
+    for column, spec in entry["columns"].items():
+        values = np.load(os.path.join(store_dir, spec["file"]), mmap_mode="r")
+        if values.shape != (entry["rows"],) or values.dtype.str != spec["dtype"]:
+            raise ValueError(f"{spec['file']} does not match the manifest; ingest {name!r} again")
+        history[column] = values
+    if years is not None:
+        first = np.searchsorted(history["year"], years[0], side="left")
+        last = np.searchsorted(history["year"], years[1], side="right")
+        if last <= first:
+            raise ValueError(f"No {name!r} history between {years[0]} and {years[1]}")
+        history = {column: values[first:last] for column, values in history.items()}
+    return history
+
+
+def store_from_environment():
+    """History store directory from RICE_HISTORY_DIR (default ./history)."""
+    return os.environ.get("RICE_HISTORY_DIR") or DEFAULT_STORE_DIR
@@ -0,0 +1,192 @@
+# instrumentation.py
+"""
+Optional wall-time / call-count / allocation counters for the model stages and app sections.
+
+Disabled by default and free when disabled: enable() swaps the stage functions in
+model_calculations for timed wrappers (run_full_model looks them up at call time)
+and disable() puts the originals back, so the normal call path is untouched.
+Patching is process-wide, so this is a process-level switch: set
+RICE_MODEL_INSTRUMENTATION=1 to enable at import (the Streamlit app reads
+nothing else), or call enable() once at start-up.
+
+Counters are process-wide and cumulative, like Prometheus counters. Allocations
+are the process-wide net change in live interpreter memory blocks
+(sys.getallocatedblocks()) across a call, so blocks allocated or freed by other
+threads meanwhile count too: cheap enough to leave on, but neither per-call nor
+a tracemalloc byte count.
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+from . import model_calculations
+
+MODEL_STAGES = (
+    "calculate_revenue",
+    "calculate_establishment_costs",
+    "calculate_variable_costs",
+    "calculate_fixed_costs",
+    "calculate_annual_operational_expenditures",
+    "calculate_profitability",
+    "calculate_roi",
+    "run_full_model",
+)
+PROMETHEUS_PREFIX = "rice_model"
+
+_STATS = {}
+_LOCK = threading.Lock()
+_ORIGINALS = {}
+
+
+def is_enabled():
+    return bool(_ORIGINALS)
+
+
+def _record(name, seconds, blocks):
+    with _LOCK:
+        stats = _STATS.get(name)
+        if stats is None:
+            stats = _STATS[name] = {"calls": 0, "seconds_total": 0.0, "seconds_max": 0.0, "allocated_blocks_total": 0}
+        stats["calls"] += 1
+        stats["seconds_total"] += seconds
+        stats["seconds_max"] = max(stats["seconds_max"], seconds)
+        stats["allocated_blocks_total"] += blocks
+
+
+def _timed(name, function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        blocks = sys.getallocatedblocks()
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _record(name, time.perf_counter() - started, sys.getallocatedblocks() - blocks)
+    return wrapper
+
+
+def enable():
+    with _LOCK:
+        if _ORIGINALS:
+            return
+        for name in MODEL_STAGES:
+            function = getattr(model_calculations, name)
+            _ORIGINALS[name] = function
+            setattr(model_calculations, name, _timed(f"model.{name}", function))
+
+
+def disable():
+    with _LOCK:
+        for name, function in _ORIGINALS.items():
+            setattr(model_calculations, name, function)
+        _ORIGINALS.clear()
+
+
+def set_enabled(enabled):
+    enable() if enabled else disable()
+
+
+def reset():
+    with _LOCK:
+        _STATS.clear()
+
+
+class _Section:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._blocks = sys.getallocatedblocks()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _record(self.name, time.perf_counter() - self._started, sys.getallocatedblocks() - self._blocks)
+
+
+class _NullSection:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_SECTION = _NullSection()
+
+
+def section(name):
+    """Context manager timing a block under `name`; a shared no-op when disabled."""
+    return _Section(name) if _ORIGINALS else _NULL_SECTION
+
+
+class Laps:
+    """
+    Times consecutive sections of a long script without re-indenting it:
+    lap("b") closes the running section and opens "b"; stop() closes the last one.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._current = None
+
+    def lap(self, name):
+        self.stop()
+        self._current = _Section(f"{self.prefix}.{name}").__enter__()
+
+    def stop(self):
+        if self._current is not None:
+            self._current.__exit__(None, None, None)
+            self._current = None
+
+
+class _NullLaps:
+    def lap(self, name):
+        pass
+
+    def stop(self):
+        pass
+
+
+def laps(prefix):
+    return Laps(prefix) if _ORIGINALS else _NullLaps()
+
+
+def snapshot():
+    """{name: {"calls", "seconds_total", "seconds_max", "seconds_mean", "allocated_blocks_total"}}"""
+    with _LOCK:
+        stats = {name: dict(values) for name, values in sorted(_STATS.items())}
+    for values in stats.values():
+        values["seconds_mean"] = values["seconds_total"] / values["calls"]
+    return stats
+
+
+def export_json(indent=2):
+    return json.dumps({"enabled": is_enabled(), "sections": snapshot()}, indent=indent)
+
+
+def export_prometheus(prefix=PROMETHEUS_PREFIX):
+    """Counters in the Prometheus text exposition format, one series per section."""
+    stats = snapshot()
+    metrics = (
+        ("section_calls_total", "counter", "Calls of an instrumented model stage or app section.", "calls"),
+        ("section_seconds_total", "counter", "Wall time spent in an instrumented section.", "seconds_total"),
+        ("section_seconds_max", "gauge", "Slowest single call of an instrumented section.", "seconds_max"),
+        ("section_allocated_blocks_total", "counter", "Process-wide net interpreter memory blocks allocated while a section ran.", "allocated_blocks_total"),
+    )
+    lines = []
+    for metric, kind, description, key in metrics:
+        lines.append(f"# HELP {prefix}_{metric} {description}")
+        lines.append(f"# TYPE {prefix}_{metric} {kind}")
+        for name, values in stats.items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'{prefix}_{metric}{{section="{label}"}} {values[key]}')
+    return "\n".join(lines) + "\n"
+
+
+if os.environ.get("RICE_MODEL_INSTRUMENTATION", "").lower() in ("1", "true", "yes"):
+    enable()
@@ -0,0 +1,268 @@
+# job_runner.py
+"""
+Background execution of long model runs, so app.py's script thread never blocks on them.
+
+A job is split into independent tasks that run in one shared process pool. A
+driver thread per job feeds the pool, merges parts in task order (so results do
+not depend on scheduling) and publishes progress and a partial state the page
+can render while the job runs. Jobs are keyed by content_hash of their inputs:
+submitting a job that is already running or recently finished returns the
+existing one, so sessions asking for the same run share it. Each session that
+submits a job becomes an owner; a job is cancelled once every owner has
+released it, e.g. because its inputs changed. Jobs submitted with persist=True
+also go through the runner's ResultCache, so finished results survive restarts
+when the cache has a disk store.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from .result_cache import content_hash
+
+# prepare() -> (state, [task args, ...]), run on the job's driver thread, so keep it cheap.
+# task(*args) -> part, run in a pool worker, so it must be a module-level function.
+# merge(state, part) -> state, called in task order.
+# finish(state, tasks_done) -> result, also used for partial results.
+# more(state) -> (state, [task args, ...]), optional: called once every task so far is merged, for
+# rounds that depend on earlier parts (e.g. a pilot task); the job ends when it returns no tasks.
+JobSpec = namedtuple("JobSpec", ("prepare", "task", "merge", "finish", "more"), defaults=(None,))
+
+DEFAULT_KEEP_FINISHED = 64
+CANCEL_POLL_SECONDS = 0.1
+_NOT_CACHED = object()
+
+
+class Job:
+    """Handle on a submitted job; status is queued, running, done, cancelled or failed."""
+
+    def __init__(self, key, namespace, spec, inputs=None, persist=False):
+        self.key = key
+        self.namespace = namespace
+        self.inputs = inputs
+        self.persist = persist
+        self.status = "queued"
+        self.tasks_done = 0
+        self.tasks_total = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self._spec = spec
+        self._state = None
+        self._result = None
+        self._owners = set()
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+
+    @property
+    def progress(self):
+        """Fraction of tasks merged; 0.0 until the job has been prepared."""
+        if self.status == "done":
+            return 1.0
+        if not self.tasks_total:
+            return 0.0
+        return self.tasks_done / self.tasks_total
+
+    def done(self):
+        return self._finished.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def partial_result(self):
+        """The finished result, or finish() over the parts merged so far (None before prepare())."""
+        if self.status == "done":
+            return self._result
+        with self._lock:
+            state, tasks_done = self._state, self.tasks_done
+        return None if state is None else self._spec.finish(state, tasks_done)
+
+    def result(self, timeout=None):
+        if not self._finished.wait(timeout):
+            raise TimeoutError(f"Job {self.key[:12]} is still {self.status}")
+        if self.status == "failed":
+            raise self.error
+        if self.status == "cancelled":
+            raise CancelledError(f"Job {self.key[:12]} was cancelled")
+        return self._result
+
+
+class JobRunner:
+    """
+    Runs jobs on a process pool of `max_workers` (one per CPU by default), created on
+    first use. The last `keep_finished` finished jobs stay available for reuse;
+    `result_cache` keeps the results of jobs submitted with persist=True beyond that.
+    """
+
+    def __init__(self, max_workers=None, keep_finished=DEFAULT_KEEP_FINISHED, result_cache=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.keep_finished = keep_finished
+        self.result_cache = result_cache
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"submitted": 0, "deduplicated": 0, "done": 0, "cancelled": 0, "failed": 0}
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _evict(self):
+        finished = [key for key, job in self._jobs.items() if job.done()]
+        for key in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[key]
+
+    def submit(self, namespace, inputs, spec, owner=None, persist=False):
+        """
+        The job for these inputs, started if no live or finished copy exists. `owner`
+        (e.g. a session id) keeps the job from being cancelled until it is released.
+        persist=True finishes the job from the result cache (and its disk store) when
+        it holds these inputs, and stores the result there otherwise.
+        """
+        key = content_hash(namespace, inputs)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status not in ("cancelled", "failed"):
+                job._owners.add(owner)
+                self._jobs.move_to_end(key)
+                self._counts["deduplicated"] += 1
+                return job
+            job = Job(key, namespace, spec, inputs, persist)
+            job._owners.add(owner)
+            self._jobs[key] = job
+            self._counts["submitted"] += 1
+            self._evict()
+        threading.Thread(target=self._drive, args=(job,), name=f"job-{namespace}-{key[:8]}", daemon=True).start()
+        return job
+
+    def release(self, job, owner=None):
+        """Drops `owner`'s interest in `job`; cancels it when no owner is left."""
+        with self._lock:
+            job._owners.discard(owner)
+            orphaned = not job._owners
+        if orphaned and not job.done():
+            job.cancel()
+
+    def _drive(self, job):
+        spec = job._spec
+        pending = {}
+        cache = self.result_cache if job.persist else None
+        try:
+            cached = _NOT_CACHED if cache is None else cache.get(job.namespace, job.inputs, _NOT_CACHED, persist=True)
+            if cached is not _NOT_CACHED:
+                job._result = cached
+                job.tasks_total = 0
+                job.status = "done"
+                return
+            state, tasks = spec.prepare()
+            tasks = list(tasks)
+            if not tasks:
+                state, tasks = self._next_round(spec, state, tasks)
+            with job._lock:
+                job._state = state
+                job.tasks_total = len(tasks)
+                job.status = "running"
+            parts = {}
+            next_task = next_merge = 0
+            in_flight = 2 * self.max_workers
+            while next_merge < len(tasks):
+                if job._cancelled.is_set():
+                    break
+                while next_task < len(tasks) and len(pending) + len(parts) < in_flight:
+                    pending[next_task] = self._pool().submit(spec.task, *tasks[next_task])
+                    next_task += 1
+                wait(pending.values(), timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                for index in [index for index, future in pending.items() if future.done()]:
+                    parts[index] = pending.pop(index).result()
+                while next_merge in parts:
+                    state = spec.merge(state, parts.pop(next_merge))
+                    next_merge += 1
+                    if next_merge == len(tasks):
+                        state, tasks = self._next_round(spec, state, tasks)
+                    with job._lock:
+                        job._state = state
+                        job.tasks_done = next_merge
+                        job.tasks_total = len(tasks)
+            if job._cancelled.is_set() and next_merge < len(tasks):
+                for future in pending.values():
+                    future.cancel()
+                job.status = "cancelled"
+            else:
+                job._result = spec.finish(state, len(tasks))
+                if cache is not None:
+                    cache.put(job.namespace, job.inputs, job._result, persist=True)
+                job.status = "done"
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                with self._lock:
+                    self._executor = None
+            for future in pending.values():
+                future.cancel()
+            job.error = e
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._counts[job.status] += 1
+                self._evict()
+            job._finished.set()
+
+    @staticmethod
+    def _next_round(spec, state, tasks):
+        if spec.more is None:
+            return state, tasks
+        state, more_tasks = spec.more(state)
+        return state, tasks + list(more_tasks)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self):
+        """Lifetime counters plus the number of jobs queued or running now."""
+        with self._lock:
+            stats = dict(self._counts)
+            stats["active"] = sum(not job.done() for job in self._jobs.values())
+        stats["max_workers"] = self.max_workers
+        return stats
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_spec(spec, executor=None):
+    """
+    Runs a JobSpec to completion on the calling thread, mapping each round's tasks
+    over `executor` (e.g. a ProcessPoolExecutor) when given. Same result as a JobRunner job.
+    """
+    state, tasks = spec.prepare()
+    tasks_done = 0
+    while tasks:
+        if executor is None:
+            parts = (spec.task(*task) for task in tasks)
+        else:
+            parts = executor.map(spec.task, *zip(*tasks))
+        for part in parts:
+            state = spec.merge(state, part)
+            tasks_done += 1
+        if spec.more is None:
+            break
+        state, tasks = spec.more(state)
+    return spec.finish(state, tasks_done)
+
+
+def runner_from_environment(result_cache=None):
+    """JobRunner sized by RICE_JOB_WORKERS (default one worker per CPU)."""
+    workers = os.environ.get("RICE_JOB_WORKERS")
+    return JobRunner(max_workers=int(workers) if workers else None, result_cache=result_cache)
@@ -0,0 +1,173 @@
+# load_generator.py
+"""
+Closed-loop load generator for scoring_service.py, e.g.
+
+    python -m rice_analysis serve &
+    python -m rice_analysis loadgen --connections 64 --processes 4 --duration 10
+
+Each of `processes` worker processes drives its share of `connections`
+keep-alive HTTP connections, one thread per connection, each sending its next
+request as soon as the previous response arrives. Request bodies are
+pre-encoded scenarios jittered around the app defaults, so the client spends
+its time on the wire rather than in json.dumps. Reports client-side throughput
+and latency percentiles next to the server's own /stats.
+"""
+
+import http.client
+import json
+import multiprocessing
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from .batch_calculations import params_to_columns
+from .model_calculations import DEFAULT_SCENARIO_PARAMS
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+DEFAULT_CONNECTIONS = 32
+DEFAULT_DURATION_SECONDS = 10.0
+DEFAULT_WARMUP_SECONDS = 1.0
+PAYLOAD_VARIANTS = 1024
+
+
+def scenario_payloads(n, scenarios_per_request=1, seed=0):
+    """`n` encoded request bodies around the default scenario."""
+    base = params_to_columns(DEFAULT_SCENARIO_PARAMS)
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for _ in range(n):
+        scenarios = [
+            dict(base,
+                 farm_size_acres=float(rng.uniform(20, 2000)),
+                 land_tenure="Owned" if rng.random() < 0.5 else "Rented",
+                 ratoon_crop_cultivation="Yes" if rng.random() < 0.5 else "No",
+                 main_crop_yield_active=float(rng.uniform(50, 95)),
+                 price_active=float(rng.uniform(10, 20)),
+                 annual_land_rent_per_acre=float(rng.uniform(50, 150)))
+            for _ in range(scenarios_per_request)
+        ]
+        payloads.append(json.dumps(scenarios[0] if scenarios_per_request == 1 else scenarios).encode("utf-8"))
+    return payloads
+
+
+def _connect(host, port):
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    connection.connect()
+    connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return connection
+
+
+def _connection_loop(host, port, payloads, offset, warmup_until, stop_at, latencies, errors):
+    connection = _connect(host, port)
+    headers = {"Content-Type": "application/json"}
+    i = offset
+    while True:
+        body = payloads[i % len(payloads)]
+        i += 1
+        started = time.perf_counter()
+        if started >= stop_at:
+            break
+        try:
+            connection.request("POST", "/score", body, headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            ok = False
+            connection.close()
+            connection = _connect(host, port)
+        finished = time.perf_counter()
+        if started >= warmup_until:
+            if ok:
+                latencies.append(finished - started)
+            else:
+                errors[0] += 1
+    connection.close()
+
+
+def _worker(task):
+    host, port, connections, payloads, start_at, warmup_seconds, duration_seconds, worker_index = task
+    # Workers start together so the warm-up and measured windows line up across processes.
+    time.sleep(max(0.0, start_at - time.time()))
+    warmup_until = time.perf_counter() + warmup_seconds
+    stop_at = warmup_until + duration_seconds
+    per_thread = [([], [0]) for _ in range(connections)]
+    threads = [
+        threading.Thread(target=_connection_loop, args=(host, port, payloads, (worker_index * connections + j) * 7,
+                                                        warmup_until, stop_at, latencies, errors), daemon=True)
+        for j, (latencies, errors) in enumerate(per_thread)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies = np.concatenate([np.array(latencies) for latencies, _ in per_thread]) if per_thread else np.array([])
+    return latencies, sum(errors[0] for _, errors in per_thread)
+
+
+def fetch_server_stats(url):
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    try:
+        connection.request("GET", "/stats")
+        return json.loads(connection.getresponse().read())
+    except (OSError, http.client.HTTPException, ValueError):
+        return None
+    finally:
+        connection.close()
+
+
+def run_load(url=DEFAULT_URL, connections=DEFAULT_CONNECTIONS, processes=1, duration_seconds=DEFAULT_DURATION_SECONDS,
+             warmup_seconds=DEFAULT_WARMUP_SECONDS, scenarios_per_request=1):
+    """Drives the service for `duration_seconds` after a warm-up; returns a summary dict."""
+    parts = urlsplit(url)
+    processes = max(1, min(processes, connections))
+    payloads = scenario_payloads(PAYLOAD_VARIANTS, scenarios_per_request)
+    start_at = time.time() + 0.5
+    tasks = [
+        (parts.hostname, parts.port or 80, connections // processes + (i < connections % processes), payloads,
+         start_at, warmup_seconds, duration_seconds, i)
+        for i in range(processes)
+    ]
+    if processes == 1:
+        parts_out = [_worker(tasks[0])]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            parts_out = pool.map(_worker, tasks)
+
+    latencies = np.concatenate([latencies for latencies, _ in parts_out])
+    errors = sum(errors for _, errors in parts_out)
+    summary = {
+        "url": url,
+        "connections": connections,
+        "processes": processes,
+        "scenarios_per_request": scenarios_per_request,
+        "duration_seconds": duration_seconds,
+        "requests": int(latencies.size),
+        "errors": int(errors),
+        "requests_per_second": latencies.size / duration_seconds,
+        "scenarios_per_second": latencies.size * scenarios_per_request / duration_seconds,
+        "latency_ms": {},
+    }
+    if latencies.size:
+        for label, q in (("p50", 50), ("p90", 90), ("p99", 99), ("p999", 99.9)):
+            summary["latency_ms"][label] = float(np.percentile(latencies, q)) * 1e3
+        summary["latency_ms"]["max"] = float(latencies.max()) * 1e3
+    summary["server"] = fetch_server_stats(url)
+    return summary
+
+
+def format_summary(summary):
+    latency = summary["latency_ms"]
+    lines = [f"{summary['requests']:,} requests in {summary['duration_seconds']:g}s over {summary['connections']} connections: "
+             f"{summary['requests_per_second']:,.0f} req/s, {summary['errors']:,} errors"]
+    if latency:
+        lines.append("client latency ms: " + "  ".join(f"{label} {value:.2f}" for label, value in latency.items()))
+    server = summary["server"]
+    if server and server.get("latency_ms"):
+        lines.append("server latency ms: " + "  ".join(f"{label} {value:.2f}" for label, value in server["latency_ms"].items())
+                     + f"  (mean batch {server['mean_batch_size']:.1f} scenarios)")
+    return "\n".join(lines)
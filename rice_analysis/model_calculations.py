@@ -1,5 +1,7 @@
 # model_calculations.py
 
+from collections import namedtuple
+
 # --- Constants (can be overridden by UI) ---
 FARM_SIZE_ACRES = 50
 
@@ -54,6 +56,100 @@ AGRILIFE_DEFAULTS = {
     }
 }
 
+# One-time establishment costs that scale with acreage, $/acre.
+DEFAULT_ESTABLISHMENT_COSTS_PER_ACRE = {
+    "laser_land_leveling_cost_total": 150.0,
+    "levee_surveying_construction_cost_total": 7.0 + 200.0, # survey + construction
+    "on_farm_irrigation_system_installation_cost_total": 210.0, # basic furrow/flood
+}
+DEFAULT_LAND_RENT_PER_ACRE = 75.0 # annual, when the land is rented
+
+# The default scenario: the app's sidebar opens on it and the CLI, benchmarks and
+# engines fall back to it. Owned land, ratoon crop, average yield, baseline price.
+DEFAULT_SCENARIO_PARAMS = {
+    "farm_size_acres": FARM_SIZE_ACRES,
+    "land_tenure": "Owned",
+    "ratoon_crop_cultivation": "Yes",
+    "main_crop_yield_scenarios": {"Low": 65.0, "Average": 75.0, "High": 85.0},
+    "active_yield_scenario": "Average",
+    "ratoon_crop_yield": 16.0,
+    "price_scenarios": {"Baseline ($16.00)": 16.00, "Alternative 1 ($14.20)": 14.20, "Alternative 2 (User-defined)": 15.00},
+    "active_price_scenario": "Baseline ($16.00)",
+    "government_program_payments": 0.0,
+    "land_purchase_cost": 0.0,
+    "first_year_land_rental_cost": 0.0,
+    "land_clearing_cost": 0.0,
+    **{name: cost * FARM_SIZE_ACRES for name, cost in DEFAULT_ESTABLISHMENT_COSTS_PER_ACRE.items()},
+    "well_drilling_pump_system_cost": 0.0,
+    "major_equipment_purchase_cost": 0.0,
+    "property_taxes_owned_total": 500.0,
+    "annual_land_rent_per_acre": 0.0,
+    # Financial parameters for NPV/IRR
+    "discount_rate": 7.0, # percent
+    "project_time_horizon": 10,
+    "salvage_value": 0.0,
+    "add_back_depreciation": True,
+}
+
+# Budget line items, in the order their per-acre and per-cwt sums are accumulated.
+MAIN_CROP_PER_ACRE_ITEMS = (
+    "seed", "fertilizer_materials", "custom_fertilizer_application", "herbicides_materials",
+    "insecticides_materials", "fungicides_materials", "other_chemicals_surfactants",
+    "custom_aerial_application", "water_cost_volume_based", "base_water_charge_fixed",
+    "irrigation_labor", "machinery_labor_pre_harvest", "diesel_fuel_pre_harvest",
+    "repairs_maintenance_machinery_pre_harvest", "other_field_supplies",
+    "interest_on_operating_capital",
+)
+RATOON_CROP_PER_ACRE_ITEMS = (
+    "fertilizer", "custom_top_dress", "insecticide_stinkbug", "water_cost_irrigation_labor",
+    "machinery_labor_fuel_rm", "interest_on_operating_capital",
+)
+PER_CWT_ITEMS = (
+    "hauling_per_cwt", "drying_per_cwt", "storage_per_cwt", "commission_per_cwt", "check_off_per_cwt",
+)
+FIXED_COST_PER_ACRE_ITEMS = (
+    "crop_insurance", "g_a_overhead", "pickup_mileage_charge",
+    "machinery_depreciation", "equipment_investment_interest",
+)
+
+# A budget reduced to the handful of coefficients the model multiplies by yield and acreage.
+BudgetCoefficients = namedtuple("BudgetCoefficients", (
+    "main_crop_per_acre",
+    "main_crop_per_cwt",
+    "ratoon_crop_per_acre",
+    "ratoon_crop_per_cwt",
+    "fixed_costs_per_acre",  # ((line item, $/acre), ...) in FIXED_COST_PER_ACRE_ITEMS order
+    "management_fee_main_crop",
+    "management_fee_ratoon_crop",
+))
+
+
+def _sum_items(section, names):
+    total = 0
+    for name in names:
+        total = total + section[name]
+    return total
+
+
+def compile_budget(budget):
+    """
+    Compiles a budget laid out like AGRILIFE_DEFAULTS into BudgetCoefficients.
+    """
+    main_crop = budget["main_crop"]
+    ratoon_crop = budget["ratoon_crop"]
+    fixed_costs = budget["fixed_costs_per_acre"]
+    return BudgetCoefficients(
+        main_crop_per_acre=_sum_items(main_crop, MAIN_CROP_PER_ACRE_ITEMS),
+        main_crop_per_cwt=_sum_items(main_crop, PER_CWT_ITEMS),
+        ratoon_crop_per_acre=_sum_items(ratoon_crop, RATOON_CROP_PER_ACRE_ITEMS),
+        ratoon_crop_per_cwt=_sum_items(ratoon_crop, PER_CWT_ITEMS),
+        fixed_costs_per_acre=tuple((name, fixed_costs[name]) for name in FIXED_COST_PER_ACRE_ITEMS),
+        management_fee_main_crop=fixed_costs["management_fee_main_crop"],
+        management_fee_ratoon_crop=fixed_costs["management_fee_ratoon_crop"],
+    )
+
+DEFAULT_BUDGET_COEFFICIENTS = compile_budget(AGRILIFE_DEFAULTS)
+
 def calculate_revenue(params):
     farm_size = params["farm_size_acres"]
     main_crop_yield = params["main_crop_yield_active"]
@@ -109,71 +205,42 @@ def calculate_establishment_costs(params):
     costs["total_establishment_costs"] = total_establishment_costs
     return costs
 
-def calculate_annual_operational_expenditures(params, revenue_details):
+def calculate_variable_costs(params):
     farm_size = params["farm_size_acres"]
     main_crop_yield = params["main_crop_yield_active"]
     ratoon_cultivation = params["ratoon_crop_cultivation"]
     ratoon_yield = params["ratoon_crop_yield"] if ratoon_cultivation == "Yes" else 0
 
+    # Compiled once per budget (see budgets.py); defaults to the AgriLife budget.
+    budget = params.get("budget_coefficients") or DEFAULT_BUDGET_COEFFICIENTS
+
     # A. Variable Costs (Main Crop)
-    vc_main = AGRILIFE_DEFAULTS["main_crop"]
-    total_vc_main_per_acre = (
-        vc_main["seed"] +
-        vc_main["fertilizer_materials"] +
-        vc_main["custom_fertilizer_application"] +
-        vc_main["herbicides_materials"] +
-        vc_main["insecticides_materials"] +
-        vc_main["fungicides_materials"] +
-        vc_main["other_chemicals_surfactants"] +
-        vc_main["custom_aerial_application"] +
-        vc_main["water_cost_volume_based"] +
-        vc_main["base_water_charge_fixed"] +
-        vc_main["irrigation_labor"] +
-        vc_main["machinery_labor_pre_harvest"] +
-        vc_main["diesel_fuel_pre_harvest"] +
-        vc_main["repairs_maintenance_machinery_pre_harvest"] +
-        vc_main["other_field_supplies"] +
-        vc_main["interest_on_operating_capital"]
-    )
-    # Yield-dependent costs for main crop
-    total_vc_main_per_acre += main_crop_yield * (
-        vc_main["hauling_per_cwt"] +
-        vc_main["drying_per_cwt"] +
-        vc_main["storage_per_cwt"] +
-        vc_main["commission_per_cwt"] +
-        vc_main["check_off_per_cwt"]
-    )
+    # Per-acre items plus yield-dependent (per cwt) costs
+    total_vc_main_per_acre = budget.main_crop_per_acre + main_crop_yield * budget.main_crop_per_cwt
     total_main_crop_variable_costs = total_vc_main_per_acre * farm_size
 
     # B. Variable Costs (Ratoon Crop)
     total_ratoon_crop_variable_costs = 0
     if ratoon_cultivation == "Yes":
-        vc_ratoon = AGRILIFE_DEFAULTS["ratoon_crop"]
-        total_vc_ratoon_per_acre = (
-            vc_ratoon["fertilizer"] +
-            vc_ratoon["custom_top_dress"] +
-            vc_ratoon["insecticide_stinkbug"] +
-            vc_ratoon["water_cost_irrigation_labor"] +
-            vc_ratoon["machinery_labor_fuel_rm"] +
-            vc_ratoon["interest_on_operating_capital"]
-        )
-        # Yield-dependent costs for ratoon crop
-        total_vc_ratoon_per_acre += ratoon_yield * (
-            vc_ratoon["hauling_per_cwt"] +
-            vc_ratoon["drying_per_cwt"] +
-            vc_ratoon["storage_per_cwt"] +
-            vc_ratoon["commission_per_cwt"] +
-            vc_ratoon["check_off_per_cwt"]
-        )
+        total_vc_ratoon_per_acre = budget.ratoon_crop_per_acre + ratoon_yield * budget.ratoon_crop_per_cwt
         total_ratoon_crop_variable_costs = total_vc_ratoon_per_acre * farm_size
 
+    return {
+        "total_main_crop_variable_costs": total_main_crop_variable_costs,
+        "total_ratoon_crop_variable_costs": total_ratoon_crop_variable_costs,
+    }
+
+def calculate_fixed_costs(params):
+    farm_size = params["farm_size_acres"]
+    ratoon_cultivation = params["ratoon_crop_cultivation"]
+    budget = params.get("budget_coefficients") or DEFAULT_BUDGET_COEFFICIENTS
+
     # C. Annual Fixed Costs
-    fc = AGRILIFE_DEFAULTS["fixed_costs_per_acre"]
     total_annual_fixed_costs = 0
     fixed_costs_details = {}
 
     if params["land_tenure"] == "Owned":
-        # Simplified: User inputs total property tax for the 50 acres
+        # Simplified: User inputs total property tax for the whole farm
         property_taxes = params["property_taxes_owned_total"]
         fixed_costs_details["property_taxes"] = property_taxes
         total_annual_fixed_costs += property_taxes
@@ -182,52 +249,44 @@ def calculate_annual_operational_expenditures(params, revenue_details):
         fixed_costs_details["annual_land_rent"] = annual_land_rent
         total_annual_fixed_costs += annual_land_rent
 
-    crop_insurance_total = fc["crop_insurance"] * farm_size
-    fixed_costs_details["crop_insurance"] = crop_insurance_total
-    total_annual_fixed_costs += crop_insurance_total
-
-    ga_overhead_total = fc["g_a_overhead"] * farm_size
-    fixed_costs_details["g_a_overhead"] = ga_overhead_total
-    total_annual_fixed_costs += ga_overhead_total
-    
-    pickup_mileage_total = fc["pickup_mileage_charge"] * farm_size
-    fixed_costs_details["pickup_mileage_charge"] = pickup_mileage_total
-    total_annual_fixed_costs += pickup_mileage_total
-
+    # Crop insurance, G&A overhead, pickup mileage, machinery depreciation and equipment interest.
     # Assuming major equipment purchase is establishment, then depreciation/interest applies if owned
     # If not purchasing major equip (custom hire), these might be lower or zero.
     # The model outline implies these are separate from establishment if *not* custom hiring all.
-    machinery_depreciation_total = fc["machinery_depreciation"] * farm_size
-    fixed_costs_details["machinery_depreciation"] = machinery_depreciation_total
-    total_annual_fixed_costs += machinery_depreciation_total
-    
-    equipment_investment_interest_total = fc["equipment_investment_interest"] * farm_size
-    fixed_costs_details["equipment_investment_interest"] = equipment_investment_interest_total
-    total_annual_fixed_costs += equipment_investment_interest_total
+    for cost_item, cost_per_acre in budget.fixed_costs_per_acre:
+        fixed_costs_details[cost_item] = cost_per_acre * farm_size
+        total_annual_fixed_costs += fixed_costs_details[cost_item]
 
-    management_fee = fc["management_fee_main_crop"]
+    management_fee = budget.management_fee_main_crop
     if ratoon_cultivation == "Yes":
-        management_fee += fc["management_fee_ratoon_crop"]
+        management_fee += budget.management_fee_ratoon_crop
     management_fee_total = management_fee * farm_size
     fixed_costs_details["management_fee_owner_labor"] = management_fee_total
     total_annual_fixed_costs += management_fee_total
     
     fixed_costs_details["total_annual_fixed_costs"] = total_annual_fixed_costs
+    return fixed_costs_details
 
+def combine_operational_expenditures(variable_costs, fixed_costs_details):
+    total_annual_fixed_costs = fixed_costs_details["total_annual_fixed_costs"]
     total_annual_operational_costs = (
-        total_main_crop_variable_costs +
-        total_ratoon_crop_variable_costs +
+        variable_costs["total_main_crop_variable_costs"] +
+        variable_costs["total_ratoon_crop_variable_costs"] +
         total_annual_fixed_costs
     )
 
     return {
-        "total_main_crop_variable_costs": total_main_crop_variable_costs,
-        "total_ratoon_crop_variable_costs": total_ratoon_crop_variable_costs,
+        "total_main_crop_variable_costs": variable_costs["total_main_crop_variable_costs"],
+        "total_ratoon_crop_variable_costs": variable_costs["total_ratoon_crop_variable_costs"],
         "fixed_costs_details": fixed_costs_details,
         "total_annual_fixed_costs": total_annual_fixed_costs,
         "total_annual_operational_costs": total_annual_operational_costs
     }
 
+def calculate_annual_operational_expenditures(params, revenue_details):
+    # Variable and fixed costs depend on different inputs; model_graph recomputes them separately.
+    return combine_operational_expenditures(calculate_variable_costs(params), calculate_fixed_costs(params))
+
 def calculate_profitability(revenue_details, operational_expenditures):
     total_revenue = revenue_details["total_gross_annual_revenue"]
     total_vc = (operational_expenditures["total_main_crop_variable_costs"] +
@@ -260,13 +319,27 @@ def calculate_roi(profitability_details, operational_expenditures, establishment
         "roi_on_initial_establishment_percent": roi_on_initial_establishment
     }
 
+def summarize_inputs(params):
+    return {
+        "Farm Size (Acres)": params["farm_size_acres"],
+        "Land Tenure": params["land_tenure"],
+        "Ratoon Crop": params["ratoon_crop_cultivation"],
+        "Active Main Crop Yield (cwt/acre)": params["main_crop_yield_active"],
+        "Active Ratoon Crop Yield (cwt/acre)": params["ratoon_crop_yield"] if params["ratoon_crop_cultivation"] == "Yes" else "N/A",
+        "Active Rice Price ($/cwt)": params["price_active"],
+    }
+
 def run_full_model(params):
     """
     Runs all calculations based on the input parameters.
+    The caller's params are not modified, so equal inputs always give equal results.
     """
-    # Resolve active yield and price from scenarios
-    params["main_crop_yield_active"] = params["main_crop_yield_scenarios"][params["active_yield_scenario"]]
-    params["price_active"] = params["price_scenarios"][params["active_price_scenario"]]
+    # Resolve active yield and price from scenarios on a copy of params
+    params = dict(
+        params,
+        main_crop_yield_active=params["main_crop_yield_scenarios"][params["active_yield_scenario"]],
+        price_active=params["price_scenarios"][params["active_price_scenario"]],
+    )
 
     revenue = calculate_revenue(params)
     establishment_costs = calculate_establishment_costs(params)
@@ -275,14 +348,7 @@ def run_full_model(params):
     roi = calculate_roi(profitability, operational_expenditures, establishment_costs)
 
     results = {
-        "inputs_summary": {
-            "Farm Size (Acres)": params["farm_size_acres"],
-            "Land Tenure": params["land_tenure"],
-            "Ratoon Crop": params["ratoon_crop_cultivation"],
-            "Active Main Crop Yield (cwt/acre)": params["main_crop_yield_active"],
-            "Active Ratoon Crop Yield (cwt/acre)": params["ratoon_crop_yield"] if params["ratoon_crop_cultivation"] == "Yes" else "N/A",
-            "Active Rice Price ($/cwt)": params["price_active"],
-        },
+        "inputs_summary": summarize_inputs(params),
         "revenue": revenue,
         "establishment_costs": establishment_costs,
         "operational_expenditures": operational_expenditures,
@@ -0,0 +1,137 @@
+# model_graph.py
+"""
+The scenario model as an explicit dependency graph with dirty tracking.
+
+Each node names its inputs: params keys or other nodes. set_inputs() marks the
+nodes downstream of any changed input dirty, and get() recomputes only dirty
+nodes on the path to what was asked for. A stage receives a dict holding just
+its declared inputs, so a stage that reads an undeclared key fails loudly
+instead of silently going stale.
+
+For example, property_taxes_owned_total only dirties fixed_costs,
+operational_expenditures, profitability and roi; the establishment inputs only
+dirty establishment_costs and roi. Expensive nodes (NPV, Monte Carlo) can be
+attached with add_node() and are skipped whenever their inputs are unchanged.
+"""
+
+from . import model_calculations
+
+# Inputs that may be left unset; the model substitutes its own default for None.
+OPTIONAL_INPUTS = {"budget_coefficients": None}
+
+
+def _stage(name):
+    # Looked up at call time so instrumentation.enable() also times graph recomputes.
+    return lambda values: getattr(model_calculations, name)(values)
+
+
+# (node, inputs, function of {input: value}) in dependency order.
+MODEL_NODES = (
+    ("main_crop_yield_active", ("main_crop_yield_scenarios", "active_yield_scenario"),
+     lambda v: v["main_crop_yield_scenarios"][v["active_yield_scenario"]]),
+    ("price_active", ("price_scenarios", "active_price_scenario"),
+     lambda v: v["price_scenarios"][v["active_price_scenario"]]),
+    ("revenue", ("farm_size_acres", "main_crop_yield_active", "price_active", "ratoon_crop_cultivation",
+                 "ratoon_crop_yield", "government_program_payments"),
+     _stage("calculate_revenue")),
+    ("establishment_costs", ("land_tenure", "land_purchase_cost", "first_year_land_rental_cost", "land_clearing_cost",
+                             "laser_land_leveling_cost_total", "levee_surveying_construction_cost_total",
+                             "well_drilling_pump_system_cost", "on_farm_irrigation_system_installation_cost_total",
+                             "major_equipment_purchase_cost"),
+     _stage("calculate_establishment_costs")),
+    ("variable_costs", ("farm_size_acres", "main_crop_yield_active", "ratoon_crop_cultivation", "ratoon_crop_yield",
+                        "budget_coefficients"),
+     _stage("calculate_variable_costs")),
+    ("fixed_costs", ("farm_size_acres", "land_tenure", "ratoon_crop_cultivation", "property_taxes_owned_total",
+                     "annual_land_rent_per_acre", "budget_coefficients"),
+     _stage("calculate_fixed_costs")),
+    ("operational_expenditures", ("variable_costs", "fixed_costs"),
+     lambda v: model_calculations.combine_operational_expenditures(v["variable_costs"], v["fixed_costs"])),
+    ("profitability", ("revenue", "operational_expenditures"),
+     lambda v: model_calculations.calculate_profitability(v["revenue"], v["operational_expenditures"])),
+    ("roi", ("profitability", "operational_expenditures", "establishment_costs"),
+     lambda v: model_calculations.calculate_roi(v["profitability"], v["operational_expenditures"], v["establishment_costs"])),
+    ("inputs_summary", ("farm_size_acres", "land_tenure", "ratoon_crop_cultivation", "main_crop_yield_active",
+                        "ratoon_crop_yield", "price_active"),
+     _stage("summarize_inputs")),
+)
+# The nodes that make up run_full_model's result dict.
+FULL_MODEL_NODES = ("inputs_summary", "revenue", "establishment_costs", "operational_expenditures", "profitability", "roi")
+
+_MISSING = object()
+
+
+def _same(old, new):
+    try:
+        return bool(old == new) and type(old) is type(new)
+    except (TypeError, ValueError):  # e.g. NumPy arrays, whose == is elementwise
+        return False
+
+
+class ModelGraph:
+    """Dirty-tracking evaluator over MODEL_NODES plus any nodes attached with add_node()."""
+
+    def __init__(self, nodes=MODEL_NODES, optional_inputs=OPTIONAL_INPUTS):
+        self._inputs = dict(optional_inputs)
+        self._nodes = {}       # name -> (inputs, function)
+        self._dependents = {}  # input or node -> nodes that read it directly
+        self._values = {}
+        self._dirty = set()
+        self.recomputed = {}   # node -> recompute count, for diagnostics
+        for name, inputs, function in nodes:
+            self.add_node(name, inputs, function)
+
+    def add_node(self, name, inputs, function):
+        """Adds (or replaces) a node; its inputs must be params keys or earlier nodes."""
+        if name in self._nodes:
+            for source in self._nodes[name][0]:
+                self._dependents[source].discard(name)
+        self._nodes[name] = (tuple(inputs), function)
+        for source in inputs:
+            self._dependents.setdefault(source, set()).add(name)
+        self._mark_dirty([name])
+
+    def _mark_dirty(self, names):
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name in self._nodes and name not in self._dirty:
+                self._dirty.add(name)
+                self._values.pop(name, None)
+            stack.extend(self._dependents.get(name, ()))
+
+    def set_inputs(self, values):
+        """Updates params; returns the set of nodes that became dirty."""
+        changed = [name for name, value in values.items()
+                   if name not in self._nodes and not _same(self._inputs.get(name, _MISSING), value)]
+        for name in changed:
+            self._inputs[name] = values[name]
+        before = set(self._dirty)
+        self._mark_dirty(changed)
+        return self._dirty - before
+
+    def invalidate(self, name):
+        """Forces `name` and everything downstream of it to recompute on the next get()."""
+        self._mark_dirty([name])
+
+    def is_dirty(self, name):
+        return name in self._dirty
+
+    def get(self, name):
+        """Value of a node (recomputing dirty dependencies first) or of an input."""
+        if name not in self._nodes:
+            value = self._inputs.get(name, _MISSING)
+            if value is _MISSING:
+                raise KeyError(f"Model input {name!r} has not been set")
+            return value
+        if name in self._dirty:
+            inputs, function = self._nodes[name]
+            arguments = {source: self.get(source) for source in inputs}
+            self._values[name] = function(arguments)
+            self._dirty.discard(name)
+            self.recomputed[name] = self.recomputed.get(name, 0) + 1
+        return self._values[name]
+
+    def full_model_results(self):
+        """Same structure as run_full_model's result dict."""
+        return {name: self.get(name) for name in FULL_MODEL_NODES}
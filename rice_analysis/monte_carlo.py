@@ -0,0 +1,346 @@
+# monte_carlo.py
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .batch_calculations import params_to_columns, run_full_model_batch
+from .job_runner import JobSpec, run_spec
+
+# --- Uncertain inputs (batch column names) and the outputs we summarise ---
+RISK_VARIABLES = ("main_crop_yield_active", "ratoon_crop_yield", "price_active")
+RISK_METRICS = ("net_profit_before_tax", "annual_operational_roi_percent")
+
+# Small enough that the app's default 100,000 draws run as several tasks, with progress between them.
+DEFAULT_CHUNK_SIZE = 20_000
+DEFAULT_HISTOGRAM_BINS = 1000
+DEFAULT_PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+# Share of draws outside the pilot's histogram range above which the run is repeated on the
+# observed range, so percentiles, VaR and CVaR are not read from the open-ended edge bins.
+OUT_OF_RANGE_TOLERANCE = 0.001
+
+# Yield and price move together: good yields across a region depress price.
+DEFAULT_CORRELATION = (
+    (1.0, 0.5, -0.3),
+    (0.5, 1.0, -0.2),
+    (-0.3, -0.2, 1.0),
+)
+
+
+def default_risk_config(params):
+    """
+    Builds a risk config centred on the scenario in `params`.
+    The Low/High yield scenarios are read as the 5th/95th percentiles of main crop yield.
+    """
+    yields = params["main_crop_yield_scenarios"]
+    main_yield = yields[params["active_yield_scenario"]]
+    price = params["price_scenarios"][params["active_price_scenario"]]
+    ratoon_yield = params["ratoon_crop_yield"]
+    return {
+        "distributions": {
+            "main_crop_yield_active": {"type": "normal", "mean": main_yield, "std": max(yields["High"] - yields["Low"], 0.0) / 3.29},
+            "ratoon_crop_yield": {"type": "normal", "mean": ratoon_yield, "std": 0.25 * ratoon_yield},
+            "price_active": {"type": "lognormal", "mean": price, "std": 0.10 * price},
+        },
+        "correlation": DEFAULT_CORRELATION,
+    }
+
+
+def _standard_normal_cdf(z):
+    # Abramowitz & Stegun 7.1.26 erf approximation (|error| < 1.5e-7); NumPy has no vectorized erf.
+    x = np.abs(z) / math.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-x * x)
+    return 0.5 * (1.0 + np.where(z < 0, -erf, erf))
+
+
+def _transform_marginal(z, spec):
+    kind = spec["type"]
+    if kind == "normal":
+        values = spec["mean"] + spec["std"] * z
+    elif kind == "lognormal":
+        # Parameterised by the mean and std of the variable itself, not of its log.
+        mean, std = spec["mean"], spec["std"]
+        sigma = math.sqrt(math.log1p((std / mean) ** 2)) if mean > 0 else 0.0
+        mu = math.log(mean) - 0.5 * sigma ** 2 if mean > 0 else -math.inf
+        values = np.exp(mu + sigma * z)
+    elif kind == "uniform":
+        u = _standard_normal_cdf(z)
+        values = spec["low"] + (spec["high"] - spec["low"]) * u
+    elif kind == "triangular":
+        u = _standard_normal_cdf(z)
+        low, mode, high = spec["low"], spec["mode"], spec["high"]
+        width = high - low
+        split = (mode - low) / width if width > 0 else 0.0
+        left = low + np.sqrt(u * width * (mode - low))
+        right = high - np.sqrt((1.0 - u) * width * (high - mode))
+        values = np.where(u < split, left, right)
+    elif kind == "fixed":
+        values = np.full(z.shape, spec["value"], dtype=np.float64)
+    else:
+        raise ValueError(f"Unknown distribution type: {kind!r}")
+    # Negative yields and prices are meaningless; floor at zero unless told otherwise.
+    return np.maximum(values, spec.get("min", 0.0))
+
+
+def correlation_factor(correlation):
+    """Cholesky factor of the yield/price correlation matrix (Gaussian copula)."""
+    matrix = np.asarray(correlation, dtype=np.float64)
+    if matrix.shape != (len(RISK_VARIABLES), len(RISK_VARIABLES)) or not np.allclose(matrix, matrix.T):
+        raise ValueError("correlation must be a symmetric 3x3 matrix ordered as RISK_VARIABLES")
+    try:
+        return np.linalg.cholesky(matrix)
+    except np.linalg.LinAlgError:
+        raise ValueError("correlation matrix is not positive definite") from None
+
+
+def draw_inputs(config, size, rng, factor=None):
+    """Draws correlated main crop yield, ratoon yield and price columns."""
+    if factor is None:
+        factor = correlation_factor(config["correlation"])
+    z = rng.standard_normal((size, len(RISK_VARIABLES))) @ factor.T
+    return {
+        name: _transform_marginal(z[:, i], config["distributions"][name])
+        for i, name in enumerate(RISK_VARIABLES)
+    }
+
+
+def _histogram_edges(values, bins):
+    # Pad the pilot chunk's range so later chunks rarely land in the overflow bins.
+    low, high = float(values.min()), float(values.max())
+    pad = max(high - low, abs(high), 1.0) * 0.5
+    return np.linspace(low - pad, high + pad, bins + 1)
+
+
+def _observed_range_edges(summary, bins):
+    # Spans every value seen, so re-running the same draws leaves nothing out of range.
+    low, high = summary["min"], summary["max"]
+    return np.linspace(low, np.nextafter(high, np.inf) if high > low else low + 1.0, bins + 1)
+
+
+def _out_of_range_share(summary):
+    return (summary["counts"][0] + summary["counts"][-1]) / summary["count"]
+
+
+def _summarize(values, edges):
+    # Bin 0 is underflow, bin len(edges) is overflow; sums let us recover tail means (CVaR).
+    index = np.searchsorted(edges, values, side="right")
+    return {
+        "count": values.size,
+        "sum": float(values.sum()),
+        "sum_sq": float(np.dot(values, values)),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "below_zero": int(np.count_nonzero(values < 0)),
+        "counts": np.bincount(index, minlength=edges.size + 1),
+        "sums": np.bincount(index, weights=values, minlength=edges.size + 1),
+    }
+
+
+def _merge(total, part):
+    return {
+        "count": total["count"] + part["count"],
+        "sum": total["sum"] + part["sum"],
+        "sum_sq": total["sum_sq"] + part["sum_sq"],
+        "min": min(total["min"], part["min"]),
+        "max": max(total["max"], part["max"]),
+        "below_zero": total["below_zero"] + part["below_zero"],
+        "counts": total["counts"] + part["counts"],
+        "sums": total["sums"] + part["sums"],
+    }
+
+
+def _evaluate_chunk(columns, config, budget, seed, size):
+    rng = np.random.default_rng(seed)
+    chunk_columns = dict(columns)
+    chunk_columns.update(draw_inputs(config, size, rng))
+    results = run_full_model_batch(chunk_columns, budget)
+    return {name: results[name] for name in RISK_METRICS}
+
+
+def _simulate(columns, config, budget, edges, seed, size, bins):
+    # One chunk as (edges, {metric: summary}). The pilot chunk gets edges=None and fixes the
+    # histogram range for every later chunk from its own draws.
+    metrics = _evaluate_chunk(columns, config, budget, seed, size)
+    if edges is None:
+        edges = {name: _histogram_edges(metrics[name], bins) for name in RISK_METRICS}
+    return edges, {name: _summarize(metrics[name], edges[name]) for name in RISK_METRICS}
+
+
+def _merge_totals(totals, part):
+    return {name: _merge(totals[name], part[name]) for name in RISK_METRICS}
+
+
+def _bin_bounds(summary, edges, i):
+    lower = summary["min"] if i == 0 else edges[i - 1]
+    upper = summary["max"] if i == edges.size else edges[i]
+    return lower, upper
+
+
+def _quantile(summary, edges, q):
+    # Linear interpolation inside the histogram bin holding rank q * count.
+    counts = summary["counts"]
+    target = q * summary["count"]
+    cumulative = np.cumsum(counts)
+    i = min(int(np.searchsorted(cumulative, target, side="left")), counts.size - 1)
+    before = cumulative[i] - counts[i]
+    lower, upper = _bin_bounds(summary, edges, i)
+    fraction = (target - before) / counts[i] if counts[i] else 0.0
+    return float(min(max(lower + fraction * (upper - lower), summary["min"]), summary["max"]))
+
+
+def _lower_tail_mean(summary, edges, q):
+    # Mean of the worst q share of outcomes; the boundary bin contributes pro rata.
+    counts, sums = summary["counts"], summary["sums"]
+    target = q * summary["count"]
+    cumulative = np.cumsum(counts)
+    i = min(int(np.searchsorted(cumulative, target, side="left")), counts.size - 1)
+    before = cumulative[i] - counts[i]
+    tail_sum = sums[:i].sum()
+    if counts[i]:
+        tail_sum += (target - before) * sums[i] / counts[i]
+    return float(tail_sum / target) if target > 0 else summary["min"]
+
+
+def _describe(summary, edges, percentiles):
+    count = summary["count"]
+    mean = summary["sum"] / count
+    variance = max(summary["sum_sq"] / count - mean * mean, 0.0)
+    return {
+        "mean": mean,
+        "std": math.sqrt(variance),
+        "min": summary["min"],
+        "max": summary["max"],
+        "percentiles": {p: _quantile(summary, edges, p / 100) for p in percentiles},
+        "histogram": {"edges": edges, "counts": summary["counts"][1:-1],
+                      "underflow": int(summary["counts"][0]), "overflow": int(summary["counts"][-1])},
+    }
+
+
+def run_monte_carlo(params, config=None, n_draws=100_000, seed=0, confidence_level=0.95,
+                    chunk_size=DEFAULT_CHUNK_SIZE, workers=1, bins=DEFAULT_HISTOGRAM_BINS,
+                    percentiles=DEFAULT_PERCENTILES):
+    """
+    Monte Carlo risk analysis of NPBT and annual operational ROI.
+
+    Draws are generated and evaluated in chunks of `chunk_size`; each chunk only
+    contributes fixed-size histogram sums, so memory stays bounded for any `n_draws`.
+    Chunk i always uses the i-th child of SeedSequence(seed), which makes results
+    identical for any number of `workers`. Percentiles, VaR and CVaR are read from
+    the merged histogram. VaR/CVaR are reported as positive loss amounts of NPBT at
+    `confidence_level`.
+    """
+    spec = monte_carlo_job(params, config, n_draws, seed, confidence_level, chunk_size, bins, percentiles)
+    if not workers or workers <= 1:
+        return run_spec(spec)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return run_spec(spec, executor)
+
+
+def _check_sizes(n_draws, chunk_size):
+    if n_draws < 1 or chunk_size < 1:
+        raise ValueError("n_draws and chunk_size must be at least 1")
+
+
+def _results(totals, edges, n_draws, seed, confidence_level, percentiles):
+    npbt = totals["net_profit_before_tax"]
+    npbt_edges = edges["net_profit_before_tax"]
+    tail = 1.0 - confidence_level
+
+    results = {
+        "n_draws": n_draws,
+        "seed": seed,
+        "confidence_level": confidence_level,
+        "probability_of_loss": npbt["below_zero"] / npbt["count"],
+        "value_at_risk": -_quantile(npbt, npbt_edges, tail),
+        "conditional_value_at_risk": -_lower_tail_mean(npbt, npbt_edges, tail),
+    }
+    for name in RISK_METRICS:
+        results[name] = _describe(totals[name], edges[name], percentiles)
+    return results
+
+
+def monte_carlo_job(params, config=None, n_draws=100_000, seed=0, confidence_level=0.95,
+                    chunk_size=DEFAULT_CHUNK_SIZE, bins=DEFAULT_HISTOGRAM_BINS, percentiles=DEFAULT_PERCENTILES):
+    """
+    The simulation as a job_runner.JobSpec: the first chunk is a pilot task that
+    fixes the histogram range, then every other chunk is one task. If more than
+    OUT_OF_RANGE_TOLERANCE of the draws of a metric fall outside that range, every
+    chunk runs again on the observed range (same seeds, so the same draws). Partial
+    results describe the draws merged so far (n_draws counts only those) and are
+    None until the pilot is in. run_monte_carlo runs this same spec.
+    """
+    _check_sizes(n_draws, chunk_size)
+
+    def prepare():
+        risk_config = default_risk_config(params) if config is None else config
+        correlation_factor(risk_config["correlation"])  # Fail fast on a bad matrix before using the pool.
+        columns = params_to_columns(params)
+        budget = params.get("budget_coefficients")
+        sizes = [min(chunk_size, n_draws - start) for start in range(0, n_draws, chunk_size)]
+        chunks = [(columns, risk_config, budget, chunk_seed, size, bins)
+                  for chunk_seed, size in zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes)]
+        pilot = chunks[0]
+        return {"chunks": chunks, "edges": None, "totals": None, "round": "pilot"}, [pilot[:3] + (None,) + pilot[3:]]
+
+    def merge(state, part):
+        edges, summaries = part
+        totals = summaries if state["totals"] is None else _merge_totals(state["totals"], summaries)
+        return dict(state, edges=edges, totals=totals)
+
+    def tasks_for(chunks, edges):
+        return [chunk[:3] + (edges,) + chunk[3:] for chunk in chunks]
+
+    def more(state):
+        if state["round"] == "pilot":
+            return dict(state, round="chunks"), tasks_for(state["chunks"][1:], state["edges"])
+        if state["round"] == "chunks":
+            totals = state["totals"]
+            wide = [name for name in RISK_METRICS if _out_of_range_share(totals[name]) > OUT_OF_RANGE_TOLERANCE]
+            if wide:
+                edges = dict(state["edges"], **{name: _observed_range_edges(totals[name], bins) for name in wide})
+                # Partial results keep describing the first pass until the re-run has parts of its own.
+                first_pass = (state["edges"], totals)
+                return (dict(state, round="widened", edges=edges, totals=None, first_pass=first_pass),
+                        tasks_for(state["chunks"], edges))
+        return state, []
+
+    def finish(state, tasks_done):
+        edges, totals = state["edges"], state["totals"]
+        if totals is None:
+            if "first_pass" not in state:
+                return None
+            edges, totals = state["first_pass"]
+        draws = totals["net_profit_before_tax"]["count"]
+        return _results(totals, edges, draws, seed, confidence_level, percentiles)
+
+    return JobSpec(prepare, _simulate, merge, finish, more)
+
+
+def histogram_for_display(metric_summary, bins=50):
+    """
+    Re-bins the fine simulation histogram into at most `bins` bars as (bin centres,
+    counts). Draws outside the histogram's range appear as one bar at each end, so
+    the bars always add up to every draw.
+    """
+    edges = metric_summary["histogram"]["edges"]
+    counts = metric_summary["histogram"]["counts"]
+    underflow = metric_summary["histogram"].get("underflow", 0)
+    overflow = metric_summary["histogram"].get("overflow", 0)
+    nonzero = np.flatnonzero(counts)
+    centres, totals = [], []
+    if nonzero.size:
+        counts = counts[nonzero[0]:nonzero[-1] + 1]
+        edges = edges[nonzero[0]:nonzero[-1] + 2]
+        groups = np.array_split(np.arange(counts.size), max(1, min(bins - bool(underflow) - bool(overflow), counts.size)))
+        centres = [(edges[g[0]] + edges[g[-1] + 1]) / 2 for g in groups]
+        totals = [counts[g].sum() for g in groups]
+    if underflow:
+        centres.insert(0, (metric_summary["min"] + metric_summary["histogram"]["edges"][0]) / 2)
+        totals.insert(0, underflow)
+    if overflow:
+        centres.append((metric_summary["histogram"]["edges"][-1] + metric_summary["max"]) / 2)
+        totals.append(overflow)
+    return np.array(centres), np.array(totals)
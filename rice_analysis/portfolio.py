@@ -0,0 +1,162 @@
+# portfolio.py
+
+import numpy as np
+
+from .batch_calculations import BATCH_INPUT_COLUMNS, BATCH_OUTPUT_COLUMNS, row_count, run_full_model_batch
+from .budgets import DEFAULT_BUDGET_ID, get_compiled_budget
+from .table_io import DEFAULT_CHUNK_ROWS, TableWriter, iter_table_chunks
+
+# Short column names accepted in field tables, mapped onto batch input columns.
+PORTFOLIO_COLUMN_ALIASES = {
+    "acres": "farm_size_acres",
+    "tenure": "land_tenure",
+    "ratoon": "ratoon_crop_cultivation",
+    "main_crop_yield": "main_crop_yield_active",
+    "price": "price_active",
+    "property_taxes": "property_taxes_owned_total",
+    "land_rent_per_acre": "annual_land_rent_per_acre",
+}
+# Labels accepted in the flag columns; anything else is rejected rather than read as Rented / no ratoon.
+FLAG_LABELS = {"land_tenure": ("Owned", "Rented"), "ratoon_crop_cultivation": ("Yes", "No")}
+DEFAULT_GROUP_COLUMNS = ("farm", "county", "land_tenure")
+# Additive per-field outputs kept as running sums for every group.
+AGGREGATE_COLUMNS = (
+    "farm_size_acres",
+    "total_gross_annual_revenue",
+    "total_annual_operational_costs",
+    "net_profit_before_tax",
+    "total_establishment_costs",
+)
+# Input columns echoed next to each field's results in the per-field output.
+PASSTHROUGH_COLUMNS = ("field_id", "farm", "county", "budget_id", "land_tenure", "ratoon_crop_cultivation", "farm_size_acres")
+
+
+def check_flag_labels(columns, first_row=0):
+    """
+    Raises ValueError naming the column and row of the first label outside
+    FLAG_LABELS. Rows count from 1 for the first data row of the table, so
+    `first_row` is the number of rows in earlier chunks.
+    """
+    for name, labels in FLAG_LABELS.items():
+        values = np.asarray(columns[name])
+        if values.dtype == bool:
+            continue
+        unknown = np.flatnonzero(~np.isin(values, labels))
+        if unknown.size:
+            row = int(unknown[0])
+            where = f"row {first_row + row + 1}" if values.ndim else "the default"
+            raise ValueError(f"Unknown {name} label {values.ravel()[row:row + 1].tolist()[0]!r} in {where}; "
+                             f"expected one of {', '.join(labels)}")
+
+
+def normalize_field_columns(chunk, defaults=None, first_row=0):
+    """
+    Renames aliases, fills batch inputs missing from the field table from
+    `defaults` and checks the tenure and ratoon labels (see check_flag_labels).
+    """
+    columns = {PORTFOLIO_COLUMN_ALIASES.get(name, name): values for name, values in chunk.items()}
+    for name in BATCH_INPUT_COLUMNS:
+        if name not in columns:
+            if defaults is None or name not in defaults:
+                raise ValueError(f"Field table has no {name!r} column and no default was given")
+            columns[name] = defaults[name]
+    check_flag_labels(columns, first_row)
+    return columns
+
+
+def evaluate_fields(columns):
+    """
+    run_full_model_batch over one chunk of fields, grouping rows by their budget_id
+    column (AgriLife defaults when absent) so each budget is compiled once.
+    """
+    if "budget_id" not in columns:
+        return run_full_model_batch(columns, get_compiled_budget(DEFAULT_BUDGET_ID))
+    n = row_count(columns)
+    budget_ids = np.asarray(columns["budget_id"], dtype=object)
+    results = {name: np.empty(n) for name in BATCH_OUTPUT_COLUMNS}
+    for budget_id in np.unique(budget_ids):
+        rows = np.flatnonzero(budget_ids == budget_id)
+        subset = {name: (values[rows] if np.ndim(values) else values) for name, values in columns.items()}
+        subset_results = run_full_model_batch(subset, get_compiled_budget(budget_id or DEFAULT_BUDGET_ID))
+        for name in BATCH_OUTPUT_COLUMNS:
+            results[name][rows] = subset_results[name]
+    return results
+
+
+def field_output_columns(columns, results):
+    """Per-field output table: identifying input columns followed by every model output."""
+    n = row_count(columns)
+    echoed = {name: np.broadcast_to(columns[name], (n,)) for name in PASSTHROUGH_COLUMNS if name in columns}
+    return {**echoed, **results}
+
+
+def _accumulate(groups, keys, results):
+    # Running per-group sums: unique keys in this chunk, then one bincount per aggregated column.
+    unique_keys, inverse = np.unique(np.asarray(keys).astype(str), return_inverse=True)
+    counts = np.bincount(inverse, minlength=unique_keys.size)
+    sums = np.vstack([np.bincount(inverse, weights=results[name], minlength=unique_keys.size)
+                      for name in AGGREGATE_COLUMNS])
+    for i, key in enumerate(unique_keys.tolist()):
+        total = groups.setdefault(key, {"fields": 0, **{name: 0.0 for name in AGGREGATE_COLUMNS}})
+        total["fields"] += int(counts[i])
+        for j, name in enumerate(AGGREGATE_COLUMNS):
+            total[name] += float(sums[j, i])
+
+
+def _finish(total):
+    # Ratios are derived from the sums at the end so they stay exact across chunks.
+    op_costs = total["total_annual_operational_costs"]
+    est_costs = total["total_establishment_costs"]
+    acres = total["farm_size_acres"]
+    total["annual_operational_roi_percent"] = total["net_profit_before_tax"] / op_costs * 100 if op_costs > 0 else 0
+    total["roi_on_initial_establishment_percent"] = total["net_profit_before_tax"] / est_costs * 100 if est_costs > 0 else 0
+    total["net_profit_before_tax_per_acre"] = total["net_profit_before_tax"] / acres if acres > 0 else 0
+    return total
+
+
+def iter_portfolio_results(source, defaults=None, chunk_rows=DEFAULT_CHUNK_ROWS, file_format=None):
+    """Yields (field inputs, field results) for each chunk of a CSV/Parquet field table."""
+    first_row = 0
+    for chunk in iter_table_chunks(source, chunk_rows, file_format):
+        columns = normalize_field_columns(chunk, defaults, first_row)
+        first_row += row_count(columns)
+        yield columns, evaluate_fields(columns)
+
+
+def evaluate_portfolio(source, defaults=None, group_by=DEFAULT_GROUP_COLUMNS, chunk_rows=DEFAULT_CHUNK_ROWS,
+                       file_format=None, output_path=None, on_chunk=None):
+    """
+    Evaluates every field in a CSV/Parquet table in fixed-size chunks.
+
+    Memory stays flat in the number of fields: only the current chunk and the
+    running per-group sums are held. Per-field results are streamed to
+    `output_path` (CSV or Parquet) when given, and `on_chunk(fields_done,
+    columns, results)` is called after each chunk. `group_by` columns that the
+    table lacks are skipped. Returns {"total": {...}, "groups": {column: {value: {...}}}}.
+    """
+    total = {}
+    groups = {name: {} for name in group_by}
+    fields_done = 0
+    writer = TableWriter(output_path) if output_path else None
+    try:
+        for columns, results in iter_portfolio_results(source, defaults, chunk_rows, file_format):
+            n = row_count(columns)
+            fields_done += n
+            additive = {"farm_size_acres": np.broadcast_to(columns["farm_size_acres"], (n,)), **results}
+            _accumulate(total, np.zeros(n, dtype=np.int8), additive)
+            for name in group_by:
+                if name in columns:
+                    _accumulate(groups[name], np.broadcast_to(columns[name], (n,)), additive)
+            if writer is not None:
+                writer.write(field_output_columns(columns, results))
+            if on_chunk is not None:
+                on_chunk(fields_done, columns, results)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return {
+        "total": _finish(total.get("0", {"fields": 0, **{name: 0.0 for name in AGGREGATE_COLUMNS}})),
+        "groups": {name: {key: _finish(value) for key, value in values.items()}
+                   for name, values in groups.items() if values},
+    }
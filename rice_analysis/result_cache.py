@@ -0,0 +1,257 @@
+# result_cache.py
+"""
+Content-addressed cache for the expensive model results: investment metrics,
+horizon sweeps, sensitivities, bootstraps, farm plans. A scalar run_full_model
+call is several times cheaper than hashing its inputs, so it is never cached.
+
+Keys are SHA-256 hashes of a namespace plus the canonical JSON of the inputs, so
+equal inputs hit regardless of dict order, tuple-vs-list or NumPy-vs-Python
+numbers. Entries live in an in-memory LRU with an optional TTL and, for calls
+made with persist=True, an optional on-disk store that survives restarts and is
+shared by every process pointed at the same directory. Disk entries are JSON with
+tagged NumPy arrays, tuples and non-string dict keys, so results read back equal
+to what was stored.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 1024
+_MISSING = object()
+_TAGS = frozenset(("__ndarray__", "__tuple__", "__items__"))
+
+
+def canonicalize(value):
+    """Reduces inputs to plain JSON types with a single spelling for equal values."""
+    value_type = type(value)
+    if value_type is float or value_type is str or value is None:
+        return value
+    if isinstance(value, dict):
+        return {str(key): canonicalize(item) for key, item in value.items()}
+    if hasattr(value, "_asdict"):  # namedtuples such as BudgetCoefficients
+        return canonicalize(value._asdict())
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(item) for item in value]
+    if hasattr(value, "tolist"):  # NumPy arrays and scalars
+        return canonicalize(value.tolist())
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        # 50 and 50.0 reach the model as the same number
+        return float(value)
+    raise TypeError(f"Cannot hash a {type(value).__name__} as a cache input")
+
+
+def _copy_result(value):
+    # Results are trees of dicts/lists with immutable leaves or NumPy arrays; much cheaper than deepcopy.
+    if isinstance(value, dict):
+        return {key: _copy_result(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_result(item) for item in value]
+    if hasattr(value, "copy") and hasattr(value, "dtype"):
+        return value.copy()
+    return value
+
+
+def encode_result(value):
+    """Reduces a result tree to JSON types, tagging what JSON cannot spell (see decode_result)."""
+    if isinstance(value, dict):
+        if all(type(key) is str for key in value) and not (value.keys() & _TAGS):
+            return {key: encode_result(item) for key, item in value.items()}
+        return {"__items__": [[encode_result(key), encode_result(item)] for key, item in value.items()]}
+    if isinstance(value, list):
+        return [encode_result(item) for item in value]
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode_result(item) for item in value]}
+    if hasattr(value, "dtype"):
+        if not getattr(value, "shape", ()):  # NumPy scalars
+            return value.item()
+        data = value.tolist() if value.dtype != object else [encode_result(item) for item in value.ravel().tolist()]
+        return {"__ndarray__": data, "dtype": value.dtype.str, "shape": list(value.shape)}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f"Cannot store a {type(value).__name__} in the disk cache")
+
+
+def decode_result(value):
+    if isinstance(value, list):
+        return [decode_result(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "__ndarray__" in value:
+        import numpy as np
+        data = value["__ndarray__"]
+        if value["dtype"] == "|O":
+            data = [decode_result(item) for item in data]
+        return np.array(data, dtype=value["dtype"]).reshape(value["shape"])
+    if "__tuple__" in value:
+        return tuple(decode_result(item) for item in value["__tuple__"])
+    if "__items__" in value:
+        return {decode_result(key): decode_result(item) for key, item in value["__items__"]}
+    return {key: decode_result(item) for key, item in value.items()}
+
+
+def content_hash(namespace, inputs):
+    canonical = json.dumps(canonicalize(inputs), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{namespace}\0{canonical}".encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    LRU + TTL cache of computed results keyed by content_hash.
+
+    `ttl_seconds=None` keeps entries until evicted. `disk_dir` enables the on-disk
+    store for calls made with persist=True. Returned dicts, lists and arrays are
+    copies, so callers may modify them freely.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=None, disk_dir=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _count(self, namespace, event):
+        stats = self._stats.setdefault(namespace, {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0})
+        stats[event] += 1
+
+    def _expired(self, stored_at):
+        return self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds
+
+    def _get_memory(self, namespace, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            stored_at, value = entry
+            if self._expired(stored_at):
+                del self._entries[key]
+                self._count(namespace, "expirations")
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def _put_memory(self, namespace, key, value, stored_at):
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._count(namespace, "evictions")
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, namespace, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return _MISSING, None
+        if self._expired(entry["stored_at"]):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._count(namespace, "expirations")
+            return _MISSING, None
+        return decode_result(entry["value"]), entry["stored_at"]
+
+    def _write_disk(self, namespace, key, value, stored_at):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump({"namespace": namespace, "stored_at": stored_at, "value": encode_result(value)}, f)
+        os.replace(temporary_path, path)
+
+    def _lookup(self, namespace, key, persist):
+        value = self._get_memory(namespace, key)
+        if value is not _MISSING:
+            with self._lock:
+                self._count(namespace, "hits")
+            return value
+        if persist and self.disk_dir:
+            value, stored_at = self._read_disk(namespace, key)
+            if value is not _MISSING:
+                self._put_memory(namespace, key, value, stored_at)
+                with self._lock:
+                    self._count(namespace, "disk_hits")
+        return value
+
+    def _store(self, namespace, key, value, persist):
+        stored_at = time.time()
+        self._put_memory(namespace, key, value, stored_at)
+        if persist and self.disk_dir:
+            self._write_disk(namespace, key, value, stored_at)
+
+    def get(self, namespace, inputs, default=None, persist=False):
+        """The cached result for these inputs, or `default` (counted as a miss)."""
+        value = self._lookup(namespace, content_hash(namespace, inputs), persist)
+        if value is _MISSING:
+            with self._lock:
+                self._count(namespace, "misses")
+            return default
+        return _copy_result(value)
+
+    def put(self, namespace, inputs, value, persist=False):
+        """Stores a copy of a result computed elsewhere, e.g. by a background job."""
+        self._store(namespace, content_hash(namespace, inputs), _copy_result(value), persist)
+
+    def get_or_compute(self, namespace, inputs, compute, persist=False):
+        """
+        Cached `compute()` for these inputs. persist=True also reads and writes the
+        disk store (when configured); results may hold NumPy arrays (see encode_result).
+        """
+        key = content_hash(namespace, inputs)
+        value = self._lookup(namespace, key, persist)
+        if value is not _MISSING:
+            return _copy_result(value)
+
+        # Computed outside the lock: concurrent misses on one key may both compute, which is harmless.
+        value = compute()
+        with self._lock:
+            self._count(namespace, "misses")
+        self._store(namespace, key, value, persist)
+        return _copy_result(value)
+
+    def stats(self):
+        """Per-namespace counters plus hit rates; disk hits count as hits."""
+        with self._lock:
+            stats = {namespace: dict(counts) for namespace, counts in self._stats.items()}
+            entries = len(self._entries)
+        for counts in stats.values():
+            lookups = counts["hits"] + counts["disk_hits"] + counts["misses"]
+            counts["hit_rate"] = (counts["hits"] + counts["disk_hits"]) / lookups if lookups else 0.0
+        return {"entries": entries, "max_entries": self.max_entries, "namespaces": stats}
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+        if disk and self.disk_dir and os.path.isdir(self.disk_dir):
+            for root, _, files in os.walk(self.disk_dir):
+                for name in files:
+                    if name.endswith(".json"):
+                        os.remove(os.path.join(root, name))
+
+
+def cache_from_environment():
+    """
+    ResultCache configured by RICE_RESULT_CACHE_SIZE (entries), RICE_RESULT_CACHE_TTL
+    (seconds) and RICE_RESULT_CACHE_DIR (enables the disk store).
+    """
+    ttl = os.environ.get("RICE_RESULT_CACHE_TTL")
+    return ResultCache(
+        max_entries=int(os.environ.get("RICE_RESULT_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+        ttl_seconds=float(ttl) if ttl else None,
+        disk_dir=os.environ.get("RICE_RESULT_CACHE_DIR") or None,
+    )
+
@@ -0,0 +1,168 @@
+# result_table.py
+"""
+Flat, typed result schema for many model runs.
+
+A ResultTable holds every output in RESULT_SCHEMA for n scenarios as one
+(columns, n) float64 block, so each column is a contiguous row of it. That is
+8 bytes per value instead of a Python float inside nested dicts, and it hands
+its memory to Arrow (one buffer per column) and pandas (one 2-D block)
+without copying, so results load into analytics tools with no per-row conversion.
+
+    table = run_full_model_table(columns)
+    table.to_parquet("results.parquet")
+    frame = table.to_pandas()
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .batch_calculations import BATCH_OUTPUT_COLUMNS, row_count, run_full_model_batch
+
+ResultField = namedtuple("ResultField", ("name", "section", "unit", "dtype"))
+
+# Where each section lives in run_full_model's nested result dict.
+RESULT_SECTIONS = {
+    "revenue": ("revenue",),
+    "establishment_costs": ("establishment_costs",),
+    "operational_expenditures": ("operational_expenditures",),
+    "fixed_costs": ("operational_expenditures", "fixed_costs_details"),
+    "profitability": ("profitability",),
+    "roi": ("roi",),
+}
+_SECTION_COLUMNS = {
+    "revenue": ("main_crop_revenue", "ratoon_crop_revenue", "government_program_payments", "total_gross_annual_revenue"),
+    "establishment_costs": ("land_purchase_cost", "land_clearing", "laser_land_leveling", "levee_surveying_construction",
+                            "well_drilling_pump_system", "on_farm_irrigation_system_installation",
+                            "major_equipment_purchase_cost", "total_establishment_costs"),
+    "fixed_costs": ("property_taxes", "annual_land_rent", "crop_insurance", "g_a_overhead", "pickup_mileage_charge",
+                    "machinery_depreciation", "equipment_investment_interest", "management_fee_owner_labor"),
+    "operational_expenditures": ("total_main_crop_variable_costs", "total_ratoon_crop_variable_costs",
+                                 "total_annual_fixed_costs", "total_annual_operational_costs"),
+    "profitability": ("gross_profit_revenue_less_vc", "net_profit_before_tax"),
+    "roi": ("annual_operational_roi_percent", "roi_on_initial_establishment_percent"),
+}
+_COLUMN_SECTIONS = {name: section for section, names in _SECTION_COLUMNS.items() for name in names}
+
+# One field per BATCH_OUTPUT_COLUMNS entry, in that order.
+RESULT_SCHEMA = tuple(
+    ResultField(name, _COLUMN_SECTIONS[name], "percent" if name.endswith("_percent") else "usd", "float64")
+    for name in BATCH_OUTPUT_COLUMNS
+)
+RESULT_COLUMNS = tuple(field.name for field in RESULT_SCHEMA)
+_COLUMN_INDEX = {name: i for i, name in enumerate(RESULT_COLUMNS)}
+
+
+def _arrow_schema():
+    import pyarrow as pa
+    return pa.schema(
+        [pa.field(field.name, pa.float64(), nullable=False,
+                  metadata={"section": field.section, "unit": field.unit}) for field in RESULT_SCHEMA],
+        metadata={"schema": "rice_analysis.result_table", "version": "1"},
+    )
+
+
+class ResultTable:
+    """Results of n scenarios as a (len(RESULT_COLUMNS), n) float64 block."""
+
+    def __init__(self, block):
+        block = np.asarray(block)
+        if block.dtype != np.float64 or block.ndim != 2 or block.shape[0] != len(RESULT_COLUMNS) or not block.flags.c_contiguous:
+            raise ValueError(f"ResultTable needs a C-contiguous float64 block of shape ({len(RESULT_COLUMNS)}, n)")
+        self.block = block
+
+    @classmethod
+    def empty(cls, n):
+        return cls(np.zeros((len(RESULT_COLUMNS), n)))
+
+    @classmethod
+    def from_columns(cls, columns):
+        """From a dict of output columns such as run_full_model_batch returns (scalars broadcast)."""
+        n = max((np.size(columns[name]) for name in RESULT_COLUMNS), default=0)
+        table = cls(np.empty((len(RESULT_COLUMNS), n)))
+        for i, name in enumerate(RESULT_COLUMNS):
+            table.block[i] = columns[name]
+        return table
+
+    @classmethod
+    def from_model_results(cls, results):
+        """From a list of run_full_model result dicts; lines a result lacks (e.g. rent when owned) are 0."""
+        table = cls.empty(len(results))
+        for i, field in enumerate(RESULT_SCHEMA):
+            path = RESULT_SECTIONS[field.section]
+            for row, result in enumerate(results):
+                section = result
+                for key in path:
+                    section = section[key]
+                table.block[i, row] = section.get(field.name, 0.0)
+        return table
+
+    @classmethod
+    def from_arrow(cls, table):
+        """From an Arrow table with the RESULT_COLUMNS (extra columns are ignored; nulls become NaN)."""
+        result = cls(np.empty((len(RESULT_COLUMNS), table.num_rows)))
+        for i, name in enumerate(RESULT_COLUMNS):
+            array = table.column(name).combine_chunks().cast("float64")
+            values = np.frombuffer(array.buffers()[1], dtype=np.float64, count=array.offset + len(array))[array.offset:]
+            result.block[i] = values
+            if array.null_count:
+                result.block[i][np.asarray(array.is_null())] = np.nan
+        return result
+
+    @classmethod
+    def read_parquet(cls, path):
+        import pyarrow.parquet as pq
+        return cls.from_arrow(pq.read_table(path, columns=list(RESULT_COLUMNS)))
+
+    def __len__(self):
+        return self.block.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.block.nbytes
+
+    def column(self, name):
+        """A view of one column; writes go to the table."""
+        return self.block[_COLUMN_INDEX[name]]
+
+    def columns(self):
+        """{column: view}, in RESULT_COLUMNS order; accepted wherever a dict of result columns is."""
+        return {name: self.block[i] for i, name in enumerate(RESULT_COLUMNS)}
+
+    def row(self, index):
+        return dict(zip(RESULT_COLUMNS, self.block[:, index].tolist()))
+
+    def section(self, section, index=0):
+        """[(column, value), ...] of one section for one result, e.g. for a cost breakdown table."""
+        return [(name, float(self.column(name)[index])) for name in _SECTION_COLUMNS[section]]
+
+    def take(self, indices):
+        return ResultTable(np.ascontiguousarray(self.block[:, indices]))
+
+    def to_arrow(self):
+        """Arrow table whose column buffers are this table's memory."""
+        import pyarrow as pa
+        n = len(self)
+        arrays = [pa.Array.from_buffers(pa.float64(), n, [None, pa.py_buffer(self.block[i])]) for i in range(len(RESULT_COLUMNS))]
+        return pa.Table.from_arrays(arrays, schema=_arrow_schema())
+
+    def to_pandas(self, index=None):
+        """DataFrame over this table's memory: one float64 block, no copy."""
+        import pandas as pd
+        return pd.DataFrame(self.block.T, columns=list(RESULT_COLUMNS), index=index, copy=False)
+
+    def to_parquet(self, path, compression="zstd"):
+        import pyarrow.parquet as pq
+        # Dictionary encoding only slows down and grows files of continuous floats.
+        pq.write_table(self.to_arrow(), path, compression=compression, use_dictionary=False)
+
+
+def concat_tables(tables):
+    return ResultTable(np.concatenate([table.block for table in tables], axis=1))
+
+
+def run_full_model_table(frame, budget=None):
+    """run_full_model_batch as a ResultTable, written straight into the table's block."""
+    table = ResultTable(np.empty((len(RESULT_COLUMNS), row_count(frame))))
+    run_full_model_batch(frame, budget, out=table.block)
+    return table
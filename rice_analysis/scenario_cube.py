@@ -0,0 +1,87 @@
+# scenario_cube.py
+
+import numpy as np
+
+from .batch_calculations import BATCH_OUTPUT_COLUMNS, run_full_model_batch
+
+# Axis order of every metric array in the cube.
+CUBE_AXES = ("main_crop_yield_active", "price_active", "land_tenure", "ratoon_crop_cultivation")
+LAND_TENURE_OPTIONS = ("Owned", "Rented")
+RATOON_OPTIONS = ("Yes", "No")
+
+
+def value_grid(low, high, steps, extra_values=()):
+    """Evenly spaced grid from low to high, merged with extra points such as the named scenarios."""
+    grid = np.linspace(low, high, int(steps)) if steps > 1 else np.array([low], dtype=np.float64)
+    return np.unique(np.concatenate([grid, np.asarray(extra_values, dtype=np.float64)]))
+
+
+def build_scenario_cube(base_columns, main_crop_yields, prices,
+                        land_tenures=LAND_TENURE_OPTIONS, ratoon_options=RATOON_OPTIONS, budget=None):
+    """
+    Evaluates every yield x price x tenure x ratoon combination in one batch call.
+
+    `base_columns` holds the remaining batch inputs as scalars and must cover both
+    tenures (land purchase and property taxes for Owned cells, rent for Rented
+    cells). Returns {"axes": {...}, "metrics": {output column: array}} where every
+    metric array has shape (yields, prices, tenures, ratoon options) in CUBE_AXES order.
+    """
+    axes = {
+        "main_crop_yield_active": np.asarray(main_crop_yields, dtype=np.float64),
+        "price_active": np.asarray(prices, dtype=np.float64),
+        "land_tenure": tuple(land_tenures),
+        "ratoon_crop_cultivation": tuple(ratoon_options),
+    }
+    shape = tuple(len(axes[name]) for name in CUBE_AXES)
+    yield_grid, price_grid, tenure_grid, ratoon_grid = np.meshgrid(
+        axes["main_crop_yield_active"],
+        axes["price_active"],
+        np.array([tenure == "Owned" for tenure in axes["land_tenure"]]),
+        np.array([option == "Yes" for option in axes["ratoon_crop_cultivation"]]),
+        indexing="ij",
+    )
+
+    columns = dict(base_columns)
+    columns.update({
+        "main_crop_yield_active": yield_grid.ravel(),
+        "price_active": price_grid.ravel(),
+        "land_tenure": tenure_grid.ravel(),
+        "ratoon_crop_cultivation": ratoon_grid.ravel(),
+    })
+    results = run_full_model_batch(columns, budget)
+    return {
+        "axes": axes,
+        "metrics": {name: results[name].reshape(shape) for name in BATCH_OUTPUT_COLUMNS},
+    }
+
+
+def nearest_index(values, value):
+    # Nearest grid point, so slider values that drift by rounding still hit a cell.
+    return int(np.abs(np.asarray(values) - value).argmin())
+
+
+def _axis_index(cube, axis, value):
+    values = cube["axes"][axis]
+    if isinstance(values, tuple):
+        return values.index(value)
+    return nearest_index(values, value)
+
+
+def cube_slice(cube, metric, land_tenure, ratoon_crop_cultivation):
+    """2-D (yields x prices) view of one metric for a tenure / ratoon choice. No recomputation."""
+    return cube["metrics"][metric][
+        :, :,
+        _axis_index(cube, "land_tenure", land_tenure),
+        _axis_index(cube, "ratoon_crop_cultivation", ratoon_crop_cultivation),
+    ]
+
+
+def cube_cell(cube, main_crop_yield, price, land_tenure, ratoon_crop_cultivation):
+    """All outputs of the cell nearest to the given yield and price."""
+    index = (
+        _axis_index(cube, "main_crop_yield_active", main_crop_yield),
+        _axis_index(cube, "price_active", price),
+        _axis_index(cube, "land_tenure", land_tenure),
+        _axis_index(cube, "ratoon_crop_cultivation", ratoon_crop_cultivation),
+    )
+    return {name: float(values[index]) for name, values in cube["metrics"].items()}
@@ -0,0 +1,390 @@
+# scoring_service.py
+"""
+Local HTTP/JSON scoring service for other tools that need model results, e.g.
+
+    python -m rice_analysis serve --port 8765 --max-batch-size 256 --max-wait-ms 2
+    curl -s localhost:8765/score -d '{"farm_size_acres": 50, "land_tenure": "Owned", ...}'
+
+POST /score takes one scenario object or a list of them and returns the
+run_full_model outputs (BATCH_OUTPUT_COLUMNS) for each. Scenarios use the batch
+input names or the portfolio aliases, may carry the app's yield/price scenario
+dicts instead of active values, and may name a registered "budget_id"; an "id"
+field is echoed back. GET /stats reports latency percentiles and throughput,
+GET /health answers "ok".
+
+Request threads only parse and validate. Scenarios from concurrent requests are
+queued and a single batching thread evaluates them together with
+run_full_model_batch: a batch closes when it holds `max_batch_size` scenarios,
+when its oldest request has waited `max_wait_ms`, or at once when every request
+in flight is already in it, so a lone request does not wait at all.
+"""
+
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from .batch_calculations import BATCH_INPUT_COLUMNS, BATCH_OUTPUT_COLUMNS, params_to_columns, run_full_model_batch
+from .budgets import DEFAULT_BUDGET_ID, get_compiled_budget, load_budget_file
+from .portfolio import PORTFOLIO_COLUMN_ALIASES
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_MAX_WAIT_MS = 2.0
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+LATENCY_WINDOW = 100_000  # most recent requests kept for percentiles
+THROUGHPUT_WINDOW_SECONDS = 10.0
+
+NUMERIC_COLUMNS = tuple(name for name in BATCH_INPUT_COLUMNS if name not in ("land_tenure", "ratoon_crop_cultivation"))
+FLAG_VALUES = {"land_tenure": {"Owned": True, "Rented": False}, "ratoon_crop_cultivation": {"Yes": True, "No": False}}
+
+
+class BudgetRegistry:
+    """Compiled coefficients per budget id, compiled on first use and shared by every request."""
+
+    def __init__(self):
+        self._coefficients = {}
+
+    def get(self, budget_id):
+        coefficients = self._coefficients.get(budget_id)
+        if coefficients is None:
+            coefficients = self._coefficients[budget_id] = get_compiled_budget(budget_id)
+        return coefficients
+
+
+def parse_scenario(scenario, defaults, budgets):
+    """
+    Validates one request scenario into (numeric values, tenure flag, ratoon flag,
+    budget id). Raises ValueError with a message fit for the client.
+    """
+    if not isinstance(scenario, dict):
+        raise ValueError("Each scenario must be a JSON object")
+    if "main_crop_yield_scenarios" in scenario or "price_scenarios" in scenario:
+        try:
+            scenario = {**scenario, **params_to_columns(scenario)}
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Could not resolve the active yield/price scenario: {e}") from None
+    values = dict(defaults)
+    values.update((PORTFOLIO_COLUMN_ALIASES.get(name, name), value) for name, value in scenario.items())
+
+    missing = [name for name in BATCH_INPUT_COLUMNS if name not in values]
+    if missing:
+        raise ValueError(f"Missing inputs: {', '.join(missing)}")
+    numeric = []
+    for name in NUMERIC_COLUMNS:
+        try:
+            numeric.append(float(values[name]))
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number") from None
+    flags = []
+    for name, allowed in FLAG_VALUES.items():
+        value = values[name]
+        if isinstance(value, bool):
+            flags.append(value)
+        elif isinstance(value, str) and value in allowed:
+            flags.append(allowed[value])
+        else:
+            raise ValueError(f"{name} must be one of {', '.join(allowed)}")
+    budget_id = values.get("budget_id") or DEFAULT_BUDGET_ID
+    if not isinstance(budget_id, str):
+        raise ValueError("budget_id must be a string")
+    budgets.get(budget_id)  # unknown ids fail here, in the request's own thread
+    return tuple(numeric), flags[0], flags[1], budget_id
+
+
+def evaluate_scenarios(rows, budgets):
+    """
+    run_full_model_batch over parsed scenarios, one call per budget. Returns an
+    (n, len(BATCH_OUTPUT_COLUMNS)) float64 array.
+    """
+    n = len(rows)
+    numeric = np.array([row[0] for row in rows], dtype=np.float64).reshape(n, len(NUMERIC_COLUMNS))
+    columns = {name: numeric[:, i] for i, name in enumerate(NUMERIC_COLUMNS)}
+    columns["land_tenure"] = np.array([row[1] for row in rows], dtype=bool)
+    columns["ratoon_crop_cultivation"] = np.array([row[2] for row in rows], dtype=bool)
+    budget_ids = [row[3] for row in rows]
+
+    unique_budget_ids = set(budget_ids)
+    outputs = np.empty((n, len(BATCH_OUTPUT_COLUMNS)))
+    for budget_id in unique_budget_ids:
+        if len(unique_budget_ids) == 1:
+            selected, subset = slice(None), columns
+        else:
+            selected = np.array([other == budget_id for other in budget_ids])
+            subset = {name: values[selected] for name, values in columns.items()}
+        results = run_full_model_batch(subset, budgets.get(budget_id))
+        outputs[selected] = np.column_stack([results[name] for name in BATCH_OUTPUT_COLUMNS])
+    return outputs
+
+
+# repr() of a finite float is exactly what json.dumps writes, so finite rows skip building a dict per result.
+_RESULT_TEMPLATE = "{" + ",".join(f'"{name}":%r' for name in BATCH_OUTPUT_COLUMNS) + "%s}"
+
+
+def encode_result(values, finite, scenario):
+    """One result row as JSON, echoing the scenario's "id" when it has one."""
+    scenario_id = f',"id":{json.dumps(scenario["id"])}' if "id" in scenario else ""
+    if finite:
+        return _RESULT_TEMPLATE % (*values, scenario_id)
+    result = dict(zip(BATCH_OUTPUT_COLUMNS, values))
+    if "id" in scenario:
+        result["id"] = scenario["id"]
+    return json.dumps(result, separators=(",", ":"))
+
+
+class _Pending:
+    __slots__ = ("rows", "enqueued", "done", "results", "error")
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesces concurrently submitted scenarios into batches evaluated on one thread."""
+
+    def __init__(self, budgets, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS, stats=None):
+        self.budgets = budgets
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = stats
+        self._queue = queue.SimpleQueue()
+        self._active = 0  # requests between request_started() and request_finished()
+        self._active_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def request_started(self):
+        with self._active_lock:
+            self._active += 1
+
+    def request_finished(self):
+        with self._active_lock:
+            self._active -= 1
+
+    def score(self, rows):
+        """Blocks until `rows` (parsed scenarios) are evaluated; returns (output values, all finite) per row."""
+        pending = _Pending(rows)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.results
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, size = [first], len(first.rows)
+            deadline = first.enqueued + self.max_wait
+            while size < self.max_batch_size:
+                try:
+                    # Take whatever is already queued, then wait out the oldest request's budget.
+                    pending = self._queue.get_nowait()
+                except queue.Empty:
+                    remaining = deadline - time.perf_counter()
+                    # No point waiting when every request in flight is already in this batch.
+                    if remaining <= 0 or len(batch) >= self._active:
+                        break
+                    try:
+                        pending = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if pending is None:
+                    self._queue.put(None)
+                    break
+                batch.append(pending)
+                size += len(pending.rows)
+            self._evaluate(batch, size)
+
+    def _evaluate(self, batch, size):
+        try:
+            results = evaluate_scenarios([row for pending in batch for row in pending.rows], self.budgets)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].error = e
+                batch[0].done.set()
+                return
+            # One request's scenarios can fail the whole batch; re-run each request alone so only it fails.
+            for pending in batch:
+                self._evaluate([pending], len(pending.rows))
+            return
+        finite = np.isfinite(results).all(axis=1).tolist()
+        results = results.tolist()
+        start = 0
+        for pending in batch:
+            pending.results = list(zip(results[start:start + len(pending.rows)], finite[start:start + len(pending.rows)]))
+            start += len(pending.rows)
+            pending.done.set()
+        if self.stats is not None:
+            self.stats.record_batch(size)
+
+
+class ServiceStats:
+    """Request latencies (recent window), throughput and batch-size counters."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.started = time.time()
+        self._latencies = deque(maxlen=window)
+        self._finished_at = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "scenarios": 0, "errors": 0, "batches": 0, "batched_scenarios": 0}
+
+    def record_request(self, seconds, scenarios, error=False):
+        with self._lock:
+            self._latencies.append(seconds)
+            self._finished_at.append(time.perf_counter())
+            self._counts["requests"] += 1
+            self._counts["scenarios"] += scenarios
+            self._counts["errors"] += error
+
+    def record_batch(self, size):
+        with self._lock:
+            self._counts["batches"] += 1
+            self._counts["batched_scenarios"] += size
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+            latencies = np.array(self._latencies)
+            finished_at = np.array(self._finished_at)
+        now = time.perf_counter()
+        recent = np.count_nonzero(finished_at >= now - THROUGHPUT_WINDOW_SECONDS)
+        elapsed = min(THROUGHPUT_WINDOW_SECONDS, time.time() - self.started)
+        snapshot = dict(counts)
+        snapshot["uptime_seconds"] = time.time() - self.started
+        snapshot["mean_batch_size"] = counts["batched_scenarios"] / counts["batches"] if counts["batches"] else 0.0
+        snapshot["throughput_requests_per_second"] = recent / elapsed if elapsed > 0 else 0.0
+        snapshot["latency_ms"] = {}
+        if latencies.size:
+            for label, q in (("p50", 50), ("p90", 90), ("p99", 99), ("p999", 99.9)):
+                snapshot["latency_ms"][label] = float(np.percentile(latencies, q)) * 1e3
+            snapshot["latency_ms"]["max"] = float(latencies.max()) * 1e3
+        snapshot["latency_window"] = int(latencies.size)
+        return snapshot
+
+
+def _content_length(headers):
+    value = (headers.get("Content-Length") or "0").strip()
+    if not value.isdigit():
+        raise ValueError("Content-Length must be a non-negative integer")
+    return int(value)
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients do not pay a TCP handshake per request
+    disable_nagle_algorithm = True  # small responses would otherwise sit out the client's delayed ACK
+    server_version = "RiceScoring/1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        self._send_body(status, json.dumps(payload, separators=(",", ":")))
+
+    def _send_body(self, status, body):
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, "ok")
+        elif self.path == "/stats":
+            self._send_json(200, self.server.stats.snapshot())
+        else:
+            self._send_json(404, {"error": f"No route {self.path}"})
+
+    def do_POST(self):
+        self.server.batcher.request_started()
+        try:
+            self._score()
+        finally:
+            self.server.batcher.request_finished()
+
+    def _score(self):
+        started = time.perf_counter()
+        if self.path != "/score":
+            self._send_json(404, {"error": f"No route {self.path}"})
+            return
+        length, scenarios = None, 0
+        try:
+            length = _content_length(self.headers)
+            if length > MAX_REQUEST_BYTES:
+                self.close_connection = True
+                self._send_json(413, {"error": f"Request body over {MAX_REQUEST_BYTES} bytes"})
+                return
+            payload = json.loads(self.rfile.read(length))
+            single = not isinstance(payload, list)
+            scenarios_in = [payload] if single else payload
+            scenarios = len(scenarios_in)
+            service = self.server
+            rows = [parse_scenario(scenario, service.defaults, service.budgets) for scenario in scenarios_in]
+        except ValueError as e:  # includes JSON decode errors and a bad Content-Length
+            if length is None:
+                self.close_connection = True  # the body's length is unknown, so the connection cannot be reused
+            self._send_json(400, {"error": str(e)})
+            self.server.stats.record_request(time.perf_counter() - started, scenarios, error=True)
+            return
+
+        try:
+            results = self.server.batcher.score(rows) if rows else []
+            encoded = [encode_result(values, finite, scenario) for (values, finite), scenario in zip(results, scenarios_in)]
+        except Exception as e:
+            self._send_json(500, {"error": f"Scoring failed: {e}"})
+            self.server.stats.record_request(time.perf_counter() - started, scenarios, error=True)
+            return
+        self._send_body(200, encoded[0] if single else "[" + ",".join(encoded) + "]")
+        self.server.stats.record_request(time.perf_counter() - started, scenarios)
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # listen backlog; the default of 5 refuses connections under load
+
+    def __init__(self, address, defaults=None, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 verbose=False):
+        super().__init__(address, ScoringHandler)
+        self.defaults = {PORTFOLIO_COLUMN_ALIASES.get(name, name): value for name, value in (defaults or {}).items()}
+        self.budgets = BudgetRegistry()
+        self.stats = ServiceStats()
+        self.batcher = MicroBatcher(self.budgets, max_batch_size, max_wait_ms, self.stats)
+        self.verbose = verbose
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, defaults=None, budget_files=(), max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+          max_wait_ms=DEFAULT_MAX_WAIT_MS, verbose=False):
+    """Runs the service in the foreground until interrupted."""
+    for path in budget_files:
+        load_budget_file(path)
+    server = ScoringServer((host, port), defaults, max_batch_size, max_wait_ms, verbose)
+    bound_host, bound_port = server.server_address[:2]
+    print(f"Scoring service on http://{bound_host}:{bound_port} (batches of up to {max_batch_size}, "
+          f"max wait {max_wait_ms:g} ms)", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
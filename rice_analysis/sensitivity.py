@@ -0,0 +1,161 @@
+# sensitivity.py
+
+import numpy as np
+
+from .batch_calculations import read_batch_inputs, run_full_model_batch
+from .budgets import BUDGET_SECTIONS, compile_budget_cached
+from .model_calculations import AGRILIFE_DEFAULTS, PER_CWT_ITEMS
+
+# Scenario inputs we differentiate with respect to (batch column names).
+SCENARIO_INPUTS = (
+    "price_active",
+    "main_crop_yield_active",
+    "ratoon_crop_yield",
+    "farm_size_acres",
+    "government_program_payments",
+    "property_taxes_owned_total",
+    "annual_land_rent_per_acre",
+    "land_purchase_cost",
+    "land_clearing_cost",
+    "laser_land_leveling_cost_total",
+    "levee_surveying_construction_cost_total",
+    "well_drilling_pump_system_cost",
+    "on_farm_irrigation_system_installation_cost_total",
+    "major_equipment_purchase_cost",
+)
+ESTABLISHMENT_INPUTS = SCENARIO_INPUTS[7:]
+SENSITIVITY_METRICS = (
+    "net_profit_before_tax",
+    "annual_operational_roi_percent",
+    "roi_on_initial_establishment_percent",
+)
+
+
+def budget_input_names(budget=AGRILIFE_DEFAULTS):
+    """Budget line items as "section.item", e.g. "main_crop.seed"."""
+    return tuple(f"{section}.{item}" for section in BUDGET_SECTIONS for item in budget[section])
+
+
+def _budget_cost_slopes(budget, farm_size, main_yield, ratoon_yield, ratoon):
+    # d(total operational costs) / d(line item): every line item enters costs linearly.
+    slopes = {}
+    for item in budget["main_crop"]:
+        slopes[f"main_crop.{item}"] = farm_size * main_yield if item in PER_CWT_ITEMS else farm_size
+    for item in budget["ratoon_crop"]:
+        slopes[f"ratoon_crop.{item}"] = ratoon * farm_size * (ratoon_yield if item in PER_CWT_ITEMS else 1.0)
+    for item in budget["fixed_costs_per_acre"]:
+        slopes[f"fixed_costs_per_acre.{item}"] = ratoon * farm_size if item == "management_fee_ratoon_crop" else farm_size
+    return slopes
+
+
+def _safe_divide(numerator, denominator):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator != 0, numerator / np.where(denominator != 0, denominator, 1.0), np.nan)
+
+
+def calculate_sensitivities(frame, budget=None):
+    """
+    Break-even points and gradients for one or many scenarios in one evaluation.
+
+    For a fixed tenure / ratoon choice every model output is affine in each
+    input, so the partial derivatives of NPBT (and, by the quotient rule, of both
+    ROI measures) are closed-form. `frame` takes the same columns as
+    run_full_model_batch; `budget` is an uncompiled budget dict (AgriLife
+    defaults if omitted), needed because line-item values enter the elasticities.
+
+    Returns values and gradients as (scenarios x inputs) matrices with column
+    names in "inputs", NPBT elasticities, and break-even price, yields, farm size
+    and the maximum affordable land rent.
+    """
+    if budget is None:
+        budget = AGRILIFE_DEFAULTS
+    coefficients = compile_budget_cached(budget)
+    results = run_full_model_batch(frame, coefficients)
+    inputs = read_batch_inputs(frame)
+
+    f = inputs["farm_size_acres"]
+    y = inputs["main_crop_yield_active"]
+    p = inputs["price_active"]
+    owned = inputs["owned"].astype(np.float64)
+    rented = 1.0 - owned
+    ratoon = inputs["ratoon"].astype(np.float64)
+    r_yield = inputs["ratoon_crop_yield"] * ratoon
+    npbt = results["net_profit_before_tax"]
+    op_costs = results["total_annual_operational_costs"]
+    est_costs = results["total_establishment_costs"]
+
+    fixed_per_acre = sum(value for _, value in coefficients.fixed_costs_per_acre)
+    management_fee = coefficients.management_fee_main_crop + ratoon * coefficients.management_fee_ratoon_crop
+    ratoon_margin_costs = ratoon * (coefficients.ratoon_crop_per_acre + r_yield * coefficients.ratoon_crop_per_cwt)
+    zero = np.zeros_like(npbt)
+
+    # d(revenue), d(operational costs), d(establishment costs) for each scenario input
+    revenue_slopes = {
+        "price_active": f * y + f * r_yield,
+        "main_crop_yield_active": f * p,
+        "ratoon_crop_yield": ratoon * f * p,
+        "farm_size_acres": y * p + r_yield * p,
+        "government_program_payments": zero + 1.0,
+    }
+    cost_slopes = {
+        "main_crop_yield_active": f * coefficients.main_crop_per_cwt,
+        "ratoon_crop_yield": ratoon * f * coefficients.ratoon_crop_per_cwt,
+        "farm_size_acres": (coefficients.main_crop_per_acre + y * coefficients.main_crop_per_cwt + ratoon_margin_costs
+                            + rented * inputs["annual_land_rent_per_acre"] + fixed_per_acre + management_fee),
+        "property_taxes_owned_total": owned,
+        "annual_land_rent_per_acre": rented * f,
+    }
+    cost_slopes.update(_budget_cost_slopes(budget, f, y, inputs["ratoon_crop_yield"], ratoon))
+    establishment_slopes = {name: zero + 1.0 for name in ESTABLISHMENT_INPUTS}
+    establishment_slopes["land_purchase_cost"] = owned
+
+    names = SCENARIO_INPUTS + budget_input_names(budget)
+    values = np.column_stack(
+        [inputs[name] for name in SCENARIO_INPUTS] +
+        [np.full(npbt.shape, float(budget[section][item]))
+         for section, item in (name.split(".", 1) for name in names[len(SCENARIO_INPUTS):])]
+    )
+    d_revenue = np.column_stack([revenue_slopes.get(name, zero) for name in names])
+    d_costs = np.column_stack([cost_slopes.get(name, zero) for name in names])
+    d_establishment = np.column_stack([establishment_slopes.get(name, zero) for name in names])
+    d_npbt = d_revenue - d_costs
+
+    # Quotient rule on ROI = 100 * NPBT / denominator, zero where the model reports zero ROI.
+    op_col, est_col, npbt_col = op_costs[:, None], est_costs[:, None], npbt[:, None]
+    d_operational_roi = np.where(op_col > 0, 100 * _safe_divide(d_npbt * op_col - npbt_col * d_costs, op_col ** 2), 0.0)
+    d_establishment_roi = np.where(est_col > 0, 100 * _safe_divide(d_npbt * est_col - npbt_col * d_establishment, est_col ** 2), 0.0)
+
+    npbt_per_acre = d_npbt[:, names.index("farm_size_acres")]
+    return {
+        "inputs": names,
+        "values": values,
+        "outputs": {name: results[name] for name in SENSITIVITY_METRICS},
+        "gradients": {
+            "net_profit_before_tax": d_npbt,
+            "annual_operational_roi_percent": d_operational_roi,
+            "roi_on_initial_establishment_percent": d_establishment_roi,
+        },
+        "elasticities": {"net_profit_before_tax": _safe_divide(d_npbt * values, npbt_col)},
+        "break_even": {
+            "price_active": _safe_divide(op_costs - inputs["government_program_payments"], f * (y + r_yield)),
+            "main_crop_yield_active": y - _safe_divide(npbt, d_npbt[:, names.index("main_crop_yield_active")]),
+            "ratoon_crop_yield": np.where(ratoon > 0, inputs["ratoon_crop_yield"] - _safe_divide(npbt, d_npbt[:, names.index("ratoon_crop_yield")]), np.nan),
+            "farm_size_acres": f - _safe_divide(npbt, npbt_per_acre),
+            "annual_land_rent_per_acre": np.where(rented > 0, inputs["annual_land_rent_per_acre"] + _safe_divide(npbt, f), np.nan),
+        },
+    }
+
+
+def tornado(sensitivities, row=0, swing=0.10, metric="net_profit_before_tax", top=None):
+    """
+    Change in `metric` when each input moves by +/- `swing` (a fraction) on its own.
+
+    Exact for NPBT, which is affine in every input; a first-order approximation
+    for the ROI metrics. Returns [(input, low change, high change)] sorted by
+    width, largest first, skipping inputs that do not move the metric.
+    """
+    gradient = sensitivities["gradients"][metric][row]
+    delta = gradient * sensitivities["values"][row] * swing
+    order = np.argsort(-np.abs(delta), kind="stable")
+    bars = [(sensitivities["inputs"][i], -delta[i], delta[i]) for i in order if delta[i] != 0]
+    return bars[:top] if top else bars
@@ -0,0 +1,282 @@
+# table_io.py
+
+import csv
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+
+from .batch_calculations import BATCH_INPUT_COLUMNS
+
+# Columns read as float64; everything else (tenure, ratoon, ids, groups) stays text.
+NUMERIC_INPUT_COLUMNS = tuple(name for name in BATCH_INPUT_COLUMNS
+                              if name not in ("land_tenure", "ratoon_crop_cultivation"))
+TABLE_FORMATS = {".csv": "csv", ".parquet": "parquet", ".pq": "parquet", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+DEFAULT_CHUNK_ROWS = 100_000
+
+
+def detect_format(path):
+    extension = os.path.splitext(str(path))[1].lower()
+    try:
+        return TABLE_FORMATS[extension]
+    except KeyError:
+        raise ValueError(f"Unsupported table format: {path}") from None
+
+
+def _import_pyarrow():
+    # pyarrow is optional: CSV falls back to the csv module, Parquet needs it.
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def _arrow_valid_mask(array):
+    # Unpacks Arrow's little-endian validity bitmap; None when the array has no nulls.
+    if not array.null_count:
+        return None
+    bits = np.unpackbits(np.frombuffer(array.buffers()[0], dtype=np.uint8), bitorder="little")
+    return bits[array.offset:array.offset + len(array)].astype(bool)
+
+
+def _arrow_fixed_to_numpy(array, dtype, null_value):
+    values = np.frombuffer(array.buffers()[1], dtype=dtype, count=array.offset + len(array))[array.offset:]
+    valid = _arrow_valid_mask(array)
+    return values if valid is None else np.where(valid, values, null_value)
+
+
+def _arrow_text_to_numpy(array):
+    # Dictionary-encode so each distinct label becomes a Python string only once.
+    encoded = array.dictionary_encode()
+    labels = np.array(encoded.dictionary.to_pylist() + [""], dtype=object)
+    indices = _arrow_fixed_to_numpy(encoded.indices.cast("int64"), np.int64, len(labels) - 1)
+    return labels[indices]
+
+
+def _arrow_columns(table):
+    # pyarrow's own to_numpy() (and most conversions from Python values) import pandas,
+    # which costs more than a whole chunk of model work in a fresh worker process.
+    # Reading the Arrow buffers directly keeps the read path to pyarrow and NumPy.
+    import pyarrow as pa
+    columns = {}
+    for name in table.column_names:
+        array = table.column(name).combine_chunks()
+        if name in NUMERIC_INPUT_COLUMNS or pa.types.is_floating(array.type):
+            columns[name] = _arrow_fixed_to_numpy(array.cast("float64"), np.float64, np.nan)
+        elif pa.types.is_integer(array.type):
+            columns[name] = _arrow_fixed_to_numpy(array.cast("int64"), np.int64, 0)
+        elif pa.types.is_boolean(array.type):
+            bits = np.unpackbits(np.frombuffer(array.buffers()[1], dtype=np.uint8), bitorder="little")
+            valid = _arrow_valid_mask(array)
+            values = bits[array.offset:array.offset + len(array)].astype(bool)
+            columns[name] = values if valid is None else values & valid
+        elif pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+            columns[name] = _arrow_text_to_numpy(array)
+        else:
+            columns[name] = np.array(array.to_pylist(), dtype=object)
+    return columns
+
+
+def _numpy_to_arrow(values):
+    # Inverse of _arrow_columns: builds Arrow arrays from buffers rather than pa.array(),
+    # which would import pandas.
+    import pyarrow as pa
+    values = np.asarray(values)
+    if values.dtype == np.bool_:
+        return pa.Array.from_buffers(pa.bool_(), len(values), [None, pa.py_buffer(np.packbits(values, bitorder="little"))])
+    if values.dtype.kind in "iu":
+        return pa.Array.from_buffers(pa.int64(), len(values), [None, pa.py_buffer(np.ascontiguousarray(values, dtype=np.int64))])
+    if values.dtype.kind == "f":
+        return pa.Array.from_buffers(pa.float64(), len(values), [None, pa.py_buffer(np.ascontiguousarray(values, dtype=np.float64))])
+    labels, indices = np.unique(values.astype(str), return_inverse=True)
+    encoded = [label.encode("utf-8") for label in labels.tolist()]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int32)
+    np.cumsum([len(label) for label in encoded], out=offsets[1:])
+    dictionary = pa.Array.from_buffers(pa.string(), len(encoded), [None, pa.py_buffer(offsets), pa.py_buffer(b"".join(encoded))])
+    return dictionary.take(_numpy_to_arrow(indices.ravel()))
+
+
+def _arrow_table(columns):
+    import pyarrow as pa
+    return pa.Table.from_arrays([_numpy_to_arrow(values) for values in columns.values()], names=list(columns))
+
+
+def _json_tokens(values):
+    values = np.asarray(values)
+    if values.dtype.kind in "biuf":
+        items = values.tolist()
+        if values.dtype.kind == "f" and not np.isfinite(values).all():
+            # JSON has no NaN or Infinity, so non-finite values are written as null.
+            items = np.where(np.isfinite(values), values.astype(object), None).tolist()
+        # Numbers and null contain no ", ", so the encoded list splits back into one token per value.
+        return json.dumps(items, allow_nan=False)[1:-1].split(", ")
+    labels, indices = np.unique(values.astype(str), return_inverse=True)
+    return np.array([json.dumps(label) for label in labels.tolist()], dtype=object)[indices.ravel()].tolist()
+
+
+def _rebatch(batches, chunk_rows):
+    # Arrow readers pick their own batch sizes; regroup into exactly chunk_rows (last may be short).
+    import pyarrow as pa
+    pending, rows = [], 0
+    for batch in batches:
+        pending.append(batch)
+        rows += batch.num_rows
+        while rows >= chunk_rows:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, chunk_rows)
+            rest = table.slice(chunk_rows)
+            pending, rows = rest.to_batches(), rest.num_rows
+    if rows:
+        yield pa.Table.from_batches(pending)
+
+
+def _iter_csv_fallback(source, chunk_rows):
+    text = open(source, newline="", encoding="utf-8") if isinstance(source, (str, os.PathLike)) else io.TextIOWrapper(source, encoding="utf-8", newline="")
+    with text:
+        reader = csv.reader(text)
+        header = [name.strip() for name in next(reader)]
+        while True:
+            rows = [row for _, row in zip(range(chunk_rows), reader)]
+            if not rows:
+                break
+            values = list(zip(*rows))
+            yield {
+                name: np.array(column, dtype=np.float64 if name in NUMERIC_INPUT_COLUMNS else object)
+                for name, column in zip(header, values)
+            }
+
+
+def _iter_jsonl(source, chunk_rows):
+    text = open(source, encoding="utf-8") if isinstance(source, (str, os.PathLike)) else io.TextIOWrapper(source, encoding="utf-8")
+    with text:
+        records = (json.loads(line) for line in text if line.strip())
+        while True:
+            rows = [row for _, row in zip(range(chunk_rows), records)]
+            if not rows:
+                break
+            yield {
+                name: np.array([row.get(name) for row in rows], dtype=np.float64 if name in NUMERIC_INPUT_COLUMNS else None)
+                for name in rows[0]
+            }
+
+
+def iter_table_chunks(source, chunk_rows=DEFAULT_CHUNK_ROWS, file_format=None):
+    """
+    Streams a CSV, Parquet or JSON Lines table as dicts of NumPy columns, chunk_rows rows at a time.
+
+    `source` is a path or a binary file object (pass `file_format` for file objects).
+    Only one chunk is held in memory at a time.
+    """
+    file_format = file_format or detect_format(source)
+    pyarrow = _import_pyarrow()
+    if file_format == "parquet":
+        if pyarrow is None:
+            raise ImportError("Reading Parquet requires pyarrow")
+        import pyarrow.parquet as pq
+        for table in _rebatch(pq.ParquetFile(source).iter_batches(batch_size=chunk_rows), chunk_rows):
+            yield _arrow_columns(table)
+    elif file_format == "csv":
+        if pyarrow is None:
+            yield from _iter_csv_fallback(source, chunk_rows)
+            return
+        import pyarrow.csv as pacsv
+        convert = pacsv.ConvertOptions(column_types={name: pyarrow.float64() for name in NUMERIC_INPUT_COLUMNS})
+        reader = pacsv.open_csv(source, convert_options=convert)
+        for table in _rebatch(reader, chunk_rows):
+            yield _arrow_columns(table)
+    elif file_format == "jsonl":
+        yield from _iter_jsonl(source, chunk_rows)
+    else:
+        raise ValueError(f"Unsupported table format: {file_format}")
+
+
+def _parquet_writer(path, schema):
+    # Dictionary-encode text columns only: trying it on high-cardinality float outputs
+    # makes writes several times slower and files larger.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    text_columns = [field.name for field in schema if pa.types.is_string(field.type)]
+    return pq.ParquetWriter(path, schema, use_dictionary=text_columns)
+
+
+def count_rows(source, file_format=None):
+    """Row count from Parquet metadata; None for text formats, which would need a full scan."""
+    if (file_format or detect_format(source)) != "parquet":
+        return None
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(source).metadata.num_rows
+
+
+def concatenate_tables(paths, output_path, file_format=None):
+    """Concatenates tables written by TableWriter (same columns, same format) into one file."""
+    file_format = file_format or detect_format(output_path)
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for path in paths:
+                parquet_file = pq.ParquetFile(path)
+                if writer is None:
+                    writer = _parquet_writer(output_path, parquet_file.schema_arrow)
+                for group in range(parquet_file.num_row_groups):
+                    writer.write_table(parquet_file.read_row_group(group))
+        finally:
+            if writer is not None:
+                writer.close()
+        return
+    with open(output_path, "wb") as out:
+        for i, path in enumerate(paths):
+            with open(path, "rb") as part:
+                if file_format == "csv" and i > 0:
+                    part.readline()  # header
+                shutil.copyfileobj(part, out)
+
+
+class TableWriter:
+    """Appends dicts of NumPy columns to a CSV, Parquet or JSON Lines file, one chunk at a time."""
+
+    def __init__(self, path, file_format=None):
+        self.path = path
+        self.file_format = file_format or detect_format(path)
+        self._writer = None
+        self._file = None
+
+    def write(self, columns):
+        if self.file_format == "parquet":
+            table = _arrow_table(columns)
+            if self._writer is None:
+                self._writer = _parquet_writer(self.path, table.schema)
+            self._writer.write_table(table)
+        elif self.file_format == "jsonl":
+            if self._file is None:
+                self._file = open(self.path, "w", encoding="utf-8")
+            # One %-template per chunk with JSON-encoded columns is ~10x faster than json.dumps per row.
+            template = "{" + ", ".join(json.dumps(name).replace("%", "%%") + ": %s" for name in columns) + "}\n"
+            self._file.writelines(template % row for row in zip(*(_json_tokens(values) for values in columns.values())))
+        elif _import_pyarrow() is not None:
+            import pyarrow.csv as pacsv
+            table = _arrow_table(columns)
+            if self._writer is None:
+                self._writer = pacsv.CSVWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            if self._writer is None:
+                self._file = open(self.path, "w", newline="", encoding="utf-8")
+                self._writer = csv.writer(self._file)
+                self._writer.writerow(list(columns))
+            self._writer.writerows(zip(*(np.asarray(values).tolist() for values in columns.values())))
+
+    def close(self):
+        if self._file is None and self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from rice_analysis.batch_calculations import BATCH_INPUT_COLUMNS, params_to_columns
+from rice_analysis.model_calculations import DEFAULT_SCENARIO_PARAMS
+
+
+def random_scenario(rng):
+    """DEFAULT_SCENARIO_PARAMS with every model input redrawn, both tenures and both ratoon choices."""
+    acres = float(rng.uniform(20.0, 2000.0))
+    return dict(
+        DEFAULT_SCENARIO_PARAMS,
+        farm_size_acres=acres,
+        land_tenure=str(rng.choice(["Owned", "Rented"])),
+        ratoon_crop_cultivation=str(rng.choice(["Yes", "No"])),
+        main_crop_yield_scenarios={"Low": float(rng.uniform(40, 65)), "Average": float(rng.uniform(65, 85)),
+                                   "High": float(rng.uniform(85, 100))},
+        active_yield_scenario=str(rng.choice(["Low", "Average", "High"])),
+        ratoon_crop_yield=float(rng.uniform(5.0, 30.0)),
+        price_scenarios={"Baseline": float(rng.uniform(10.0, 22.0))},
+        active_price_scenario="Baseline",
+        government_program_payments=float(rng.uniform(0.0, 50_000.0)),
+        # Positive: the model only counts a purchase above zero, so zero is a kink for finite differences.
+        land_purchase_cost=float(rng.uniform(1000.0, 5000.0) * acres),
+        land_clearing_cost=float(rng.uniform(0.0, 200.0) * acres),
+        laser_land_leveling_cost_total=float(rng.uniform(50.0, 300.0) * acres),
+        levee_surveying_construction_cost_total=float(rng.uniform(10.0, 100.0) * acres),
+        well_drilling_pump_system_cost=float(rng.uniform(0.0, 150_000.0)),
+        on_farm_irrigation_system_installation_cost_total=float(rng.uniform(20.0, 200.0) * acres),
+        major_equipment_purchase_cost=float(rng.uniform(0.0, 500_000.0)),
+        property_taxes_owned_total=float(rng.uniform(0.0, 20.0) * acres),
+        annual_land_rent_per_acre=float(rng.uniform(50.0, 250.0)),
+    )
+
+
+def scenario_columns(scenarios):
+    """run_full_model_batch input columns for a list of scalar params dicts."""
+    rows = [params_to_columns(params) for params in scenarios]
+    return {name: np.array([row[name] for row in rows]) for name in BATCH_INPUT_COLUMNS}
+
+
+@pytest.fixture
+def scenarios():
+    rng = np.random.default_rng(20240617)
+    return [random_scenario(rng) for _ in range(200)]
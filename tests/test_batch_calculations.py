@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from conftest import scenario_columns
+from rice_analysis import batch_calculations
+from rice_analysis.batch_calculations import BATCH_OUTPUT_COLUMNS, params_to_columns, run_full_model_batch
+from rice_analysis.model_calculations import DEFAULT_SCENARIO_PARAMS, run_full_model
+from rice_analysis.result_table import ResultTable
+
+
+def _batch_block(results):
+    return np.vstack([results[name] for name in BATCH_OUTPUT_COLUMNS])
+
+
+def test_batch_matches_scalar_model(scenarios):
+    scenarios = scenarios + [dict(params, land_purchase_cost=0.0, property_taxes_owned_total=0.0) for params in scenarios[::4]]
+    expected = ResultTable.from_model_results([run_full_model(params) for params in scenarios]).block
+    actual = _batch_block(run_full_model_batch(scenario_columns(scenarios)))
+    # Same operations in the same order as the scalar model, so equal to the last bit.
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_single_value_columns_broadcast():
+    columns = params_to_columns(DEFAULT_SCENARIO_PARAMS)
+    columns["farm_size_acres"] = np.array([50.0, 120.0, 800.0])
+    results = run_full_model_batch(columns)
+    for i, acres in enumerate(columns["farm_size_acres"]):
+        expected = ResultTable.from_model_results([run_full_model(dict(DEFAULT_SCENARIO_PARAMS, farm_size_acres=acres))])
+        np.testing.assert_array_equal(_batch_block(results)[:, i], expected.block[:, 0])
+
+
+def test_row_blocks_do_not_change_results(scenarios, monkeypatch):
+    columns = scenario_columns(scenarios)
+    whole = _batch_block(run_full_model_batch(columns))
+    monkeypatch.setattr(batch_calculations, "BLOCK_ROWS", 7)
+    np.testing.assert_array_equal(_batch_block(run_full_model_batch(columns)), whole)
+
+
+def test_writes_into_a_caller_buffer(scenarios):
+    columns = scenario_columns(scenarios)
+    out = np.full((len(BATCH_OUTPUT_COLUMNS), len(scenarios)), np.nan)
+    results = run_full_model_batch(columns, out=out)
+    np.testing.assert_array_equal(out, _batch_block(run_full_model_batch(columns)))
+    assert all(np.shares_memory(results[name], out) for name in BATCH_OUTPUT_COLUMNS)
+
+    with pytest.raises(ValueError):
+        run_full_model_batch(columns, out=np.empty((len(BATCH_OUTPUT_COLUMNS), len(scenarios) + 1)))
@@ -0,0 +1,38 @@
+import os
+
+import numpy as np
+import pytest
+from conftest import scenario_columns
+
+from rice_analysis.batch_calculations import run_full_model_batch
+from rice_analysis.batch_runner import run_batch_file
+from rice_analysis.table_io import TableWriter, iter_table_chunks
+
+
+def _scenario_file(path, columns):
+    with TableWriter(str(path)) as writer:
+        writer.write(columns)
+    return str(path)
+
+
+def test_output_matches_one_batch(tmp_path, scenarios):
+    columns = scenario_columns(scenarios)
+    output = str(tmp_path / "results.jsonl")
+    summary = run_batch_file(_scenario_file(tmp_path / "scenarios.jsonl", columns), output, chunk_rows=64, progress=False)
+    assert (summary["rows"], summary["partitions"]) == (200, 4)
+    assert not os.path.exists(output + ".parts")
+
+    written = next(iter_table_chunks(output, chunk_rows=200))
+    expected = run_full_model_batch(columns)
+    for name, values in expected.items():
+        np.testing.assert_array_equal(written[name], values)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_unknown_labels_name_the_file_row(tmp_path, scenarios, workers):
+    columns = scenario_columns(scenarios)
+    columns["ratoon_crop_cultivation"] = columns["ratoon_crop_cultivation"].astype(object)
+    columns["ratoon_crop_cultivation"][150] = "yes"
+    source = _scenario_file(tmp_path / "scenarios.jsonl", columns)
+    with pytest.raises(ValueError, match="ratoon_crop_cultivation label 'yes' in row 151"):
+        run_batch_file(source, str(tmp_path / "results.jsonl"), workers=workers, chunk_rows=64, progress=False)
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from rice_analysis import budgets
+from rice_analysis.budgets import (DEFAULT_BUDGET_ID, apply_overrides, budget_overrides, compile_budget_cached,
+                                   get_budget, get_compiled_budget, parse_budget_csv, parse_budget_json)
+
+
+def test_overrides_layer_over_a_copy():
+    base = get_budget()
+    overrides = {"main_crop": {"seed": 52.0}, "fixed_costs_per_acre": {"crop_insurance": 1.0}}
+    merged = apply_overrides(base, {"main_crop": {"seed": "52"}, "fixed_costs_per_acre": {"crop_insurance": 1}})
+    assert base["main_crop"]["seed"] != 52.0
+    assert budget_overrides(merged, base) == overrides
+    assert apply_overrides(merged, budget_overrides(base, merged)) == base
+
+
+@pytest.mark.parametrize("overrides, message", [({"main_crops": {}}, "section"), ({"main_crop": {"seeds": 1}}, "line item")])
+def test_unknown_overrides_are_rejected(overrides, message):
+    with pytest.raises(ValueError, match=message):
+        apply_overrides(get_budget(), overrides)
+
+
+def test_compiled_budgets_are_cached_by_content(monkeypatch):
+    monkeypatch.setattr(budgets, "_COMPILED_BUDGETS", type(budgets._COMPILED_BUDGETS)())
+    monkeypatch.setattr(budgets, "COMPILED_BUDGET_CACHE_SIZE", 2)
+    first = get_compiled_budget(overrides={"main_crop": {"seed": 50.0}})
+    # Equal content in a fresh dict is a hit; other overrides are not.
+    assert compile_budget_cached(apply_overrides(get_budget(), {"main_crop": {"seed": 50.0}})) is first
+    assert get_compiled_budget() is not first
+    assert len(budgets._COMPILED_BUDGETS) == 2
+
+    get_compiled_budget()
+    get_compiled_budget(overrides={"main_crop": {"seed": 60.0}})
+    assert len(budgets._COMPILED_BUDGETS) == 2
+    assert get_compiled_budget(overrides={"main_crop": {"seed": 50.0}}) is not first  # evicted
+
+
+def test_json_bases_resolve_within_the_file():
+    text = json.dumps({"budgets": [
+        {"budget_id": "delta_2026", "base": "region_2026", "main_crop": {"fertilizer_materials": 200.0}},
+        {"budget_id": "region_2026", "main_crop": {"seed": 50.0}},
+    ]})
+    parsed = parse_budget_json(text)
+    assert parsed["region_2026"]["main_crop"]["seed"] == 50.0
+    assert parsed["delta_2026"]["main_crop"]["seed"] == 50.0
+    assert parsed["delta_2026"]["main_crop"]["fertilizer_materials"] == 200.0
+    assert budget_overrides(parsed["region_2026"], get_budget(DEFAULT_BUDGET_ID)) == {"main_crop": {"seed": 50.0}}
+
+
+def test_csv_bases_resolve_within_the_file():
+    text = "\n".join([
+        "budget_id,base,section,item,value",
+        "region_2026,,main_crop,seed,50",
+        "delta_2026,region_2026,main_crop,fertilizer_materials,200",
+    ])
+    parsed = parse_budget_csv(text)
+    assert parsed["delta_2026"]["main_crop"]["seed"] == 50.0
+    assert parsed["delta_2026"]["main_crop"]["fertilizer_materials"] == 200.0
+
+
+def test_circular_bases_are_rejected():
+    text = json.dumps({"budgets": [{"budget_id": "a", "base": "b"}, {"budget_id": "b", "base": "a"}]})
+    with pytest.raises(ValueError, match="own base"):
+        parse_budget_json(text)
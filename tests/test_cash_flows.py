@@ -0,0 +1,29 @@
+import numpy as np
+
+from rice_analysis.cash_flows import build_cash_flow_schedule, calculate_investment_metrics, irr, npv
+
+
+def test_npv_is_zero_at_irr():
+    rng = np.random.default_rng(7)
+    establishment = rng.uniform(50_000.0, 2_000_000.0, 500)
+    annual = establishment * rng.uniform(0.02, 0.6, 500)
+    horizon = rng.integers(3, 31, 500)
+    salvage = rng.uniform(0.0, 0.3, 500) * establishment
+    schedule = build_cash_flow_schedule(establishment, annual, horizon, salvage)
+
+    rates = irr(schedule)
+    assert np.isfinite(rates).all()
+    np.testing.assert_allclose(npv(schedule, rates), 0.0, atol=1e-6 * np.abs(schedule).sum(axis=1).max())
+
+
+def test_irr_is_nan_without_a_sign_change():
+    schedule = build_cash_flow_schedule(np.array([-1000.0, 1000.0]), np.array([100.0, -100.0]), 5)
+    assert np.isnan(irr(schedule)).all()
+
+
+def test_investment_metrics_of_a_known_annuity():
+    # 1000 now for 10 years of 162.745...: an annuity at exactly 10%.
+    annual = 1000.0 * 0.1 / (1 - 1.1 ** -10)
+    metrics = calculate_investment_metrics(1000.0, annual, 0.1, 10)
+    np.testing.assert_allclose(metrics["npv"], 0.0, atol=1e-9)
+    np.testing.assert_allclose(metrics["irr"], 0.1, rtol=1e-9)
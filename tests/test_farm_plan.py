@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from rice_analysis.farm_plan import optimize_farm_plan, pareto_frontier
+from rice_analysis.model_calculations import DEFAULT_SCENARIO_PARAMS
+
+
+def _brute_force_frontier(expected_return, risk):
+    # Plans that no other plan matches or beats on both measures while strictly beating on one.
+    return {
+        i for i in range(risk.size)
+        if not np.any((expected_return >= expected_return[i]) & (risk <= risk[i])
+                      & ((expected_return > expected_return[i]) | (risk < risk[i])))
+    }
+
+
+def test_frontier_matches_brute_force():
+    rng = np.random.default_rng(3)
+    for _ in range(50):
+        expected_return, risk = rng.normal(size=(2, int(rng.integers(1, 200))))
+        frontier = pareto_frontier(expected_return, risk)
+        assert set(frontier.tolist()) == _brute_force_frontier(expected_return, risk)
+        assert np.all(np.diff(risk[frontier]) > 0)
+
+
+def test_frontier_keeps_one_of_equal_plans():
+    frontier = pareto_frontier(np.array([5.0, 5.0, 1.0, 7.0]), np.array([2.0, 2.0, 1.0, 2.0]))
+    assert frontier.tolist() == [2, 3]
+
+
+@pytest.mark.parametrize("risk_measure", ["cvar", "probability_of_loss"])
+def test_plan_frontier_matches_brute_force(risk_measure):
+    plan = optimize_farm_plan(DEFAULT_SCENARIO_PARAMS, acreages=[100.0, 400.0, 1200.0], ratoon_shares=[0.0, 0.5, 1.0],
+                              risk_measure=risk_measure, n_draws=500, seed=1)
+    candidates = plan["candidates"]
+    expected_return, risk = candidates["expected_return"], candidates["risk"]
+    frontier = set(plan["frontier"].tolist())
+    brute_force = _brute_force_frontier(expected_return, risk)
+    assert frontier <= brute_force
+    # Exact ties (common for probability of loss) keep just one of the equal plans.
+    assert {(expected_return[i], risk[i]) for i in frontier} == {(expected_return[i], risk[i]) for i in brute_force}
+    assert plan["best"] == int(np.argmax(expected_return))
+
+
+def test_risk_limit_picks_the_best_feasible_plan():
+    arguments = dict(acreages=[100.0, 400.0, 1200.0], ratoon_shares=[0.0, 0.5, 1.0], objective="npbt", n_draws=500, seed=1)
+    unconstrained = optimize_farm_plan(DEFAULT_SCENARIO_PARAMS, **arguments)
+    cvar = unconstrained["candidates"]["cvar"]
+    # Halfway between the least risky plan and the unconstrained best: some plans pass, the best does not.
+    risk_limit = 0.5 * (cvar.min() + cvar[unconstrained["best"]])
+    feasible = cvar <= risk_limit
+    assert feasible.any() and not feasible.all() and not feasible[unconstrained["best"]]
+
+    plan = optimize_farm_plan(DEFAULT_SCENARIO_PARAMS, risk_limit=risk_limit, **arguments)
+    expected_return = plan["candidates"]["expected_return"]
+    assert plan["candidates"]["cvar"][plan["best"]] <= risk_limit
+    assert plan["best"] == np.flatnonzero(feasible)[np.argmax(expected_return[feasible])]
+    assert expected_return[plan["best"]] < expected_return[unconstrained["best"]]
+
+    assert optimize_farm_plan(DEFAULT_SCENARIO_PARAMS, risk_limit=cvar.min() - 1.0, **arguments)["best"] is None
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from rice_analysis.history_bootstrap import DEFAULT_PERCENTILES, bootstrap_summary, run_bootstrap, summarize_bootstrap
+from rice_analysis.history_store import ingest_history, list_datasets, open_history
+from rice_analysis.model_calculations import DEFAULT_SCENARIO_PARAMS
+
+YEARS = np.arange(1990, 2020)
+
+
+@pytest.fixture
+def store(tmp_path):
+    rng = np.random.default_rng(8)
+    prices = tmp_path / "prices.csv"
+    prices.write_text("Year,Price,Notes\n" + "".join(f"{year},{price:.4f},x\n" for year, price in
+                                                     zip(YEARS[::-1], rng.uniform(8.0, 20.0, YEARS.size))))
+    yields = tmp_path / "yields.csv"
+    yields.write_text("year,main_crop_yield\n" + "".join(f"{year},{value:.4f}\n" for year, value in
+                                                        zip(YEARS[2:], rng.uniform(55.0, 90.0, YEARS.size - 2))))
+    store_dir = str(tmp_path / "store")
+    ingest_history([str(prices), str(yields)], "demo", store_dir)
+    return store_dir, prices, yields
+
+
+def test_ingest_and_open_round_trip(store):
+    store_dir, prices, yields = store
+    entry = list_datasets(store_dir)["demo"]
+    assert (entry["rows"], entry["first_year"], entry["last_year"]) == (28, 1992, 2019)
+
+    history = open_history("demo", store_dir)
+    expected_prices = np.loadtxt(prices, delimiter=",", skiprows=1, usecols=(0, 1))
+    expected_prices = expected_prices[np.argsort(expected_prices[:, 0])][2:]
+    np.testing.assert_array_equal(history["year"], YEARS[2:])
+    np.testing.assert_array_equal(history["price"], expected_prices[:, 1])
+    np.testing.assert_array_equal(history["main_crop_yield"], np.loadtxt(yields, delimiter=",", skiprows=1)[:, 1])
+    assert not history["price"].flags.writeable
+
+    window = open_history("demo", store_dir, years=(2000, 2004))
+    np.testing.assert_array_equal(window["year"], np.arange(2000, 2005))
+    with pytest.raises(ValueError, match="No 'demo' history"):
+        open_history("demo", store_dir, years=(1900, 1950))
+
+
+def test_bootstrap_shapes_and_determinism(store):
+    history = open_history("demo", store[0])
+    results = run_bootstrap(DEFAULT_SCENARIO_PARAMS, history, n_paths=1000, horizon=12, block_length=4, seed=3)
+    assert results["cumulative_cash"].shape == (1000, 13) and results["npv"].shape == (1000,)
+    np.testing.assert_array_equal(results["cumulative_cash"][:, 0], -results["establishment_costs"])
+
+    again = run_bootstrap(DEFAULT_SCENARIO_PARAMS, history, n_paths=1000, horizon=12, block_length=4, seed=3)
+    np.testing.assert_array_equal(again["cumulative_cash"], results["cumulative_cash"])
+    np.testing.assert_array_equal(again["npv"], results["npv"])
+    other_seed = run_bootstrap(DEFAULT_SCENARIO_PARAMS, history, n_paths=1000, horizon=12, block_length=4, seed=4)
+    assert not np.array_equal(other_seed["npv"], results["npv"])
+
+
+def test_summary_matches_the_full_path_matrix(store):
+    history = open_history("demo", store[0])
+    arguments = dict(n_paths=5000, horizon=15, block_length=3, seed=11, chunk_paths=700)
+    exact = summarize_bootstrap(run_bootstrap(DEFAULT_SCENARIO_PARAMS, history, **arguments))
+    summary = bootstrap_summary(DEFAULT_SCENARIO_PARAMS, history, bins=1024, **arguments)
+
+    for name in ("npv", "final_cumulative_cash"):
+        assert summary[name] == exact[name]
+    for name in ("probability_npv_negative", "probability_cash_negative_at_horizon", "probability_payback_within_horizon"):
+        assert summary[name] == exact[name]
+
+    bands, exact_bands = summary["cumulative_cash_by_year"], exact["cumulative_cash_by_year"]
+    np.testing.assert_array_equal(bands["years"], exact_bands["years"])
+    # Every year's histogram spans the cash that year can reach; bands are within a bin of exact.
+    annual_cash = run_bootstrap(DEFAULT_SCENARIO_PARAMS, history, n_paths=1)["annual_cash_by_history_year"]
+    bin_width = bands["years"] * np.ptp(annual_cash) / 1024
+    for p in DEFAULT_PERCENTILES:
+        assert np.all(np.abs(bands["percentiles"][p] - exact_bands["percentiles"][p]) <= bin_width + 1e-6)
@@ -0,0 +1,52 @@
+import pytest
+
+from rice_analysis import instrumentation, model_calculations
+from rice_analysis.instrumentation import MODEL_STAGES
+from rice_analysis.model_calculations import DEFAULT_SCENARIO_PARAMS
+
+
+@pytest.fixture
+def instrumented():
+    originals = {name: getattr(model_calculations, name) for name in MODEL_STAGES}
+    instrumentation.reset()
+    instrumentation.enable()
+    yield originals
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_stage_timings_are_recorded(instrumented):
+    expected = instrumented["run_full_model"](DEFAULT_SCENARIO_PARAMS)
+    instrumentation.reset()
+    assert model_calculations.run_full_model(DEFAULT_SCENARIO_PARAMS) == expected
+    model_calculations.run_full_model(DEFAULT_SCENARIO_PARAMS)
+    with instrumentation.section("app.test"):
+        pass
+
+    stats = instrumentation.snapshot()
+    assert stats["model.run_full_model"]["calls"] == 2
+    # run_full_model looks its stages up at call time, so each one is timed inside it.
+    assert stats["model.calculate_revenue"]["calls"] == 2
+    assert stats["model.run_full_model"]["seconds_total"] >= stats["model.calculate_revenue"]["seconds_total"] > 0
+    assert stats["app.test"]["calls"] == 1
+    assert 'rice_model_section_calls_total{section="model.run_full_model"} 2' in instrumentation.export_prometheus()
+
+
+def test_disable_restores_the_original_stages(instrumented):
+    assert instrumentation.is_enabled()
+    assert all(getattr(model_calculations, name) is not instrumented[name] for name in MODEL_STAGES)
+
+    instrumentation.disable()
+    assert not instrumentation.is_enabled()
+    assert all(getattr(model_calculations, name) is instrumented[name] for name in MODEL_STAGES)
+    model_calculations.run_full_model(DEFAULT_SCENARIO_PARAMS)
+    assert instrumentation.snapshot() == {}
+    with instrumentation.section("app.test"):
+        pass
+    assert instrumentation.snapshot() == {}
+
+
+def test_second_enable_does_not_wrap_twice(instrumented):
+    instrumentation.enable()
+    model_calculations.run_full_model(DEFAULT_SCENARIO_PARAMS)
+    assert instrumentation.snapshot()["model.run_full_model"]["calls"] == 1
@@ -0,0 +1,112 @@
+import time
+from concurrent.futures import CancelledError
+
+import numpy as np
+import pytest
+
+from rice_analysis.job_runner import JobRunner, JobSpec, run_spec
+from rice_analysis.model_calculations import DEFAULT_SCENARIO_PARAMS
+from rice_analysis.monte_carlo import monte_carlo_job, run_monte_carlo
+from rice_analysis.result_cache import ResultCache
+
+
+def _echo(value, delay):
+    time.sleep(delay)
+    return value
+
+
+def _ordered_spec(values, delays):
+    return JobSpec(
+        prepare=lambda: ([], list(zip(values, delays))),
+        task=_echo,
+        merge=lambda state, part: state + [part],
+        finish=lambda state, tasks_done: list(state),
+    )
+
+
+@pytest.fixture
+def runner():
+    runner = JobRunner(max_workers=2)
+    yield runner
+    runner.shutdown()
+
+
+def test_parts_merge_in_task_order(runner):
+    # Later tasks finish first; merge order must not follow completion order.
+    values = list(range(8))
+    job = runner.submit("ordered", values, _ordered_spec(values, [0.2 - 0.025 * value for value in values]))
+    assert job.result(timeout=30) == values
+    assert job.progress == 1.0
+
+
+def test_equal_inputs_share_one_job(runner):
+    first = runner.submit("ordered", [1, 2], _ordered_spec([1, 2], [0.1, 0.1]), owner="a")
+    second = runner.submit("ordered", (1, 2), _ordered_spec([1, 2], [0.1, 0.1]), owner="b")
+    assert second is first
+    assert runner.stats()["deduplicated"] == 1
+    assert first.result(timeout=30) == [1, 2]
+
+
+def test_job_is_cancelled_once_every_owner_releases_it(runner):
+    values = list(range(40))
+    job = runner.submit("slow", values, _ordered_spec(values, [0.1] * 40), owner="a")
+    runner.submit("slow", values, _ordered_spec(values, [0.1] * 40), owner="b")
+    runner.release(job, "a")
+    time.sleep(0.3)
+    assert job.status == "running"
+
+    runner.release(job, "b")
+    with pytest.raises(CancelledError):
+        job.result(timeout=30)
+    assert job.status == "cancelled"
+    assert job.tasks_done < len(values)
+
+
+def test_more_adds_rounds_that_depend_on_earlier_parts(runner):
+    # Round two doubles the sum of round one, as a pilot-dependent round would.
+    spec = JobSpec(
+        prepare=lambda: ({"total": 0, "round": 1}, [(1, 0.0), (2, 0.0)]),
+        task=_echo,
+        merge=lambda state, part: dict(state, total=state["total"] + part),
+        finish=lambda state, tasks_done: (state["total"], tasks_done),
+        more=lambda state: (dict(state, round=2), [(2 * state["total"], 0.0)]) if state["round"] == 1 else (state, []),
+    )
+    job = runner.submit("rounds", 1, spec)
+    assert job.result(timeout=30) == (9, 3)
+    assert job.tasks_total == 3
+    assert run_spec(spec) == (9, 3)
+
+
+def test_monte_carlo_pilot_runs_as_a_task(runner):
+    spec = monte_carlo_job(DEFAULT_SCENARIO_PARAMS, n_draws=100_000, seed=5)
+    state, tasks = spec.prepare()
+    assert len(tasks) == 1 and state["totals"] is None
+    assert spec.finish(state, 0) is None
+
+    job = runner.submit("monte_carlo", 5, spec)
+    result = job.result(timeout=120)
+    assert job.tasks_total > 1
+    expected = run_monte_carlo(DEFAULT_SCENARIO_PARAMS, n_draws=100_000, seed=5)
+    assert result["conditional_value_at_risk"] == expected["conditional_value_at_risk"]
+    assert result["net_profit_before_tax"]["percentiles"] == expected["net_profit_before_tax"]["percentiles"]
+    np.testing.assert_array_equal(result["net_profit_before_tax"]["histogram"]["counts"],
+                                  expected["net_profit_before_tax"]["histogram"]["counts"])
+
+
+def test_persisted_jobs_finish_from_the_result_cache(tmp_path):
+    values = [1, 2, 3]
+    runner = JobRunner(max_workers=1, result_cache=ResultCache(disk_dir=str(tmp_path)))
+    try:
+        assert runner.submit("ordered", values, _ordered_spec(values, [0.0] * 3), persist=True).result(timeout=30) == values
+    finally:
+        runner.shutdown()
+
+    # A new runner (as after a restart) reads the result from disk without running a task.
+    runner = JobRunner(max_workers=1, result_cache=ResultCache(disk_dir=str(tmp_path)))
+    try:
+        job = runner.submit("ordered", values, _ordered_spec([], []), persist=True)
+        assert job.result(timeout=30) == values
+        assert job.tasks_done == 0 and job.progress == 1.0
+        assert runner.result_cache.stats()["namespaces"]["ordered"]["disk_hits"] == 1
+    finally:
+        runner.shutdown()
@@ -0,0 +1,61 @@
+import pytest
+
+from rice_analysis.model_calculations import DEFAULT_SCENARIO_PARAMS, run_full_model
+from rice_analysis.model_graph import FULL_MODEL_NODES, ModelGraph
+
+
+@pytest.fixture
+def graph():
+    graph = ModelGraph()
+    graph.set_inputs(DEFAULT_SCENARIO_PARAMS)
+    graph.full_model_results()
+    return graph
+
+
+def test_results_match_run_full_model(graph):
+    assert graph.full_model_results() == run_full_model(DEFAULT_SCENARIO_PARAMS)
+    changed = dict(DEFAULT_SCENARIO_PARAMS, land_tenure="Rented", annual_land_rent_per_acre=150.0)
+    graph.set_inputs(changed)
+    assert graph.full_model_results() == run_full_model(changed)
+
+
+@pytest.mark.parametrize("name, value, dirty", [
+    ("property_taxes_owned_total", 900.0, {"fixed_costs", "operational_expenditures", "profitability", "roi"}),
+    ("land_clearing_cost", 1234.0, {"establishment_costs", "roi"}),
+    ("government_program_payments", 5000.0, {"revenue", "profitability", "roi"}),
+    ("active_price_scenario", "Alternative 1 ($14.20)", {"price_active", "revenue", "profitability", "roi", "inputs_summary"}),
+    ("discount_rate", 9.0, set()),
+])
+def test_changes_dirty_only_downstream_nodes(graph, name, value, dirty):
+    assert graph.set_inputs({name: value}) == dirty
+    assert {node for node in FULL_MODEL_NODES if graph.is_dirty(node)} == dirty & set(FULL_MODEL_NODES)
+
+    before = dict(graph.recomputed)
+    graph.full_model_results()
+    assert {node for node, count in graph.recomputed.items() if count != before.get(node)} == dirty
+
+
+def test_unchanged_inputs_dirty_nothing(graph):
+    assert graph.set_inputs(dict(DEFAULT_SCENARIO_PARAMS)) == set()
+    assert not any(graph.is_dirty(node) for node in FULL_MODEL_NODES)
+
+
+def test_attached_node_recomputes_only_when_its_inputs_change(graph):
+    calls = []
+    graph.add_node("npbt_per_acre", ("profitability", "farm_size_acres"),
+                   lambda v: calls.append(1) or v["profitability"]["net_profit_before_tax"] / v["farm_size_acres"])
+    graph.get("npbt_per_acre")
+    graph.set_inputs({"land_clearing_cost": 99.0})
+    graph.get("npbt_per_acre")
+    assert len(calls) == 1
+    graph.set_inputs({"property_taxes_owned_total": 1.0})
+    graph.get("npbt_per_acre")
+    assert len(calls) == 2
+
+    graph.invalidate("revenue")
+    assert graph.is_dirty("npbt_per_acre")
+
+
+def test_missing_input_raises():
+    with pytest.raises(KeyError):
+        ModelGraph().get("revenue")
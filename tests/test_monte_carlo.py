@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from rice_analysis import monte_carlo
+from rice_analysis.batch_calculations import params_to_columns
+from rice_analysis.model_calculations import DEFAULT_SCENARIO_PARAMS
+from rice_analysis.monte_carlo import (_evaluate_chunk, default_risk_config, histogram_for_display, monte_carlo_job,
+                                       run_monte_carlo)
+
+
+@pytest.mark.parametrize("entry_point", [run_monte_carlo, monte_carlo_job])
+@pytest.mark.parametrize("sizes", [{"n_draws": 0}, {"n_draws": -5}, {"n_draws": 100, "chunk_size": 0}])
+def test_rejects_empty_runs(entry_point, sizes):
+    with pytest.raises(ValueError, match="at least 1"):
+        entry_point(DEFAULT_SCENARIO_PARAMS, **sizes)
+
+
+def test_same_seed_gives_same_results():
+    first = run_monte_carlo(DEFAULT_SCENARIO_PARAMS, n_draws=5000, seed=4, chunk_size=1000)
+    second = run_monte_carlo(DEFAULT_SCENARIO_PARAMS, n_draws=5000, seed=4, chunk_size=1000)
+    assert first["n_draws"] == 5000
+    for name in ("mean", "std", "percentiles"):
+        assert first["net_profit_before_tax"][name] == second["net_profit_before_tax"][name]
+    assert first["conditional_value_at_risk"] == second["conditional_value_at_risk"]
+
+
+def _exact_npbt(n_draws, seed, chunk_size):
+    sizes = [min(chunk_size, n_draws - start) for start in range(0, n_draws, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    columns, config = params_to_columns(DEFAULT_SCENARIO_PARAMS), default_risk_config(DEFAULT_SCENARIO_PARAMS)
+    return np.concatenate([_evaluate_chunk(columns, config, None, chunk_seed, size)["net_profit_before_tax"]
+                           for chunk_seed, size in zip(seeds, sizes)])
+
+
+def test_narrow_pilot_range_is_widened():
+    # A two-draw pilot cannot bracket the distribution; the run repeats on the observed range.
+    result = run_monte_carlo(DEFAULT_SCENARIO_PARAMS, n_draws=4000, seed=2, chunk_size=2)
+    npbt = result["net_profit_before_tax"]
+    assert npbt["histogram"]["underflow"] == npbt["histogram"]["overflow"] == 0
+    assert npbt["histogram"]["counts"].sum() == 4000
+
+    exact = _exact_npbt(4000, 2, 2)
+    bin_width = np.diff(npbt["histogram"]["edges"]).max()
+    for p, value in npbt["percentiles"].items():
+        assert abs(value - np.percentile(exact, p)) <= bin_width
+
+
+def test_display_histogram_keeps_out_of_range_draws(monkeypatch):
+    monkeypatch.setattr(monte_carlo, "OUT_OF_RANGE_TOLERANCE", 1.0)
+    npbt = run_monte_carlo(DEFAULT_SCENARIO_PARAMS, n_draws=4000, seed=2, chunk_size=2)["net_profit_before_tax"]
+    histogram = npbt["histogram"]
+    assert histogram["underflow"] > 0 and histogram["overflow"] > 0
+
+    centres, counts = histogram_for_display(npbt, bins=20)
+    assert counts.sum() == 4000
+    assert len(counts) <= 20
+    assert centres[0] < histogram["edges"][0] and centres[-1] > histogram["edges"][-1]
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import rice_analysis
+
+HEAVY_MODULES = ("numpy", "pandas", "pyarrow")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _imported_after(code):
+    # A fresh interpreter, since this one has long since imported NumPy.
+    script = f"import sys\n{code}\nprint(' '.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    return subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                          cwd=REPO_ROOT).stdout.split()
+
+
+@pytest.mark.parametrize("code", [
+    "import rice_analysis",
+    "import rice_analysis; rice_analysis.run_full_model(rice_analysis.model_calculations.DEFAULT_SCENARIO_PARAMS)",
+    "from rice_analysis import budgets, instrumentation, job_runner, model_graph, result_cache; budgets.get_compiled_budget()",
+    "from rice_analysis import history_store, cli; cli.build_parser()",
+])
+def test_light_imports_do_not_load_numpy(code):
+    assert _imported_after(code) == []
+
+
+def test_batch_engine_loads_numpy_on_first_use():
+    assert _imported_after("import rice_analysis; rice_analysis.run_full_model_batch") == ["numpy"]
+
+
+def test_lazy_names_resolve_to_their_submodules():
+    from rice_analysis import batch_calculations, model_calculations, result_table
+    assert rice_analysis.run_full_model is model_calculations.run_full_model
+    assert rice_analysis.run_full_model_batch is batch_calculations.run_full_model_batch
+    assert rice_analysis.ResultTable is result_table.ResultTable
+    assert set(rice_analysis.__all__) <= set(dir(rice_analysis))
+    with pytest.raises(AttributeError, match="no attribute 'run_everything'"):
+        rice_analysis.run_everything
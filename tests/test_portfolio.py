@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from conftest import scenario_columns
+
+from rice_analysis.batch_calculations import run_full_model_batch
+from rice_analysis.portfolio import AGGREGATE_COLUMNS, evaluate_portfolio
+from rice_analysis.table_io import TableWriter, iter_table_chunks
+
+
+def _field_table(path, columns):
+    with TableWriter(str(path)) as writer:
+        writer.write(columns)
+    return str(path)
+
+
+def test_group_sums_match_one_unchunked_batch(tmp_path, scenarios):
+    columns = scenario_columns(scenarios)
+    columns["farm"] = np.array([f"farm-{i % 7}" for i in range(len(scenarios))])
+    source = _field_table(tmp_path / "fields.jsonl", columns)
+    portfolio = evaluate_portfolio(source, chunk_rows=37, output_path=str(tmp_path / "results.jsonl"))
+
+    expected = run_full_model_batch(columns)
+    expected["farm_size_acres"] = columns["farm_size_acres"]
+    assert portfolio["total"]["fields"] == len(scenarios)
+    for name in AGGREGATE_COLUMNS:
+        assert portfolio["total"][name] == pytest.approx(expected[name].sum(), rel=1e-12)
+    for column in ("farm", "land_tenure"):
+        groups = portfolio["groups"][column]
+        assert sorted(groups) == sorted(set(columns[column].tolist()))
+        for key, total in groups.items():
+            rows = columns[column] == key
+            assert total["fields"] == rows.sum()
+            for name in AGGREGATE_COLUMNS:
+                assert total[name] == pytest.approx(expected[name][rows].sum(), rel=1e-12)
+            assert total["net_profit_before_tax_per_acre"] == pytest.approx(
+                expected["net_profit_before_tax"][rows].sum() / columns["farm_size_acres"][rows].sum(), rel=1e-12)
+
+    written = next(iter_table_chunks(str(tmp_path / "results.jsonl"), chunk_rows=len(scenarios)))
+    np.testing.assert_array_equal(written["net_profit_before_tax"], expected["net_profit_before_tax"])
+
+
+@pytest.mark.parametrize("column, label", [("land_tenure", "owned"), ("land_tenure", "OWNED"), ("land_tenure", "Own"),
+                                           ("ratoon_crop_cultivation", "yes")])
+def test_unknown_flag_labels_are_rejected(tmp_path, scenarios, column, label):
+    columns = scenario_columns(scenarios)
+    columns[column] = columns[column].astype(object)
+    columns[column][41] = label
+    source = _field_table(tmp_path / "fields.jsonl", columns)
+    # Row numbers count data rows from 1 across chunks.
+    with pytest.raises(ValueError, match=f"{column} label '{label}' in row 42"):
+        evaluate_portfolio(source, chunk_rows=37)
+
+
+def test_unknown_default_label_is_rejected(tmp_path, scenarios):
+    columns = scenario_columns(scenarios)
+    del columns["land_tenure"]
+    source = _field_table(tmp_path / "fields.jsonl", columns)
+    with pytest.raises(ValueError, match="land_tenure label 'yes' in the default"):
+        evaluate_portfolio(source, defaults={"land_tenure": "yes"})
@@ -0,0 +1,120 @@
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from rice_analysis import result_cache
+from rice_analysis.result_cache import ResultCache, content_hash
+
+Point = namedtuple("Point", ("x", "y"))
+
+
+def test_content_hash_ignores_spelling_of_equal_inputs():
+    key = content_hash("metrics", {"farm_size_acres": 50.0, "horizon": [1, 2], "point": {"x": 1.5, "y": 2}})
+    assert content_hash("metrics", {"point": Point(1.5, 2.0), "horizon": (1.0, 2.0), "farm_size_acres": 50}) == key
+    assert content_hash("metrics", {"farm_size_acres": np.float64(50.0), "horizon": np.array([1, 2]),
+                                    "point": {"y": np.int64(2), "x": 1.5}}) == key
+
+
+def test_content_hash_separates_namespaces_and_values():
+    key = content_hash("metrics", {"farm_size_acres": 50.0})
+    assert content_hash("sweep", {"farm_size_acres": 50.0}) != key
+    assert content_hash("metrics", {"farm_size_acres": 50.5}) != key
+    assert content_hash("metrics", {"farm_size_acres": "50"}) != key
+    assert content_hash("metrics", {"farm_size_acres": True}) != content_hash("metrics", {"farm_size_acres": 1})
+
+
+def test_content_hash_rejects_unhashable_inputs():
+    with pytest.raises(TypeError):
+        content_hash("metrics", {"callback": print})
+
+
+def test_hits_misses_and_copies():
+    cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"npv": np.array([1.0, 2.0]), "years": [1, 2]}
+
+    first = cache.get_or_compute("metrics", {"rate": 0.07}, compute)
+    first["npv"][0] = -1.0
+    first["years"].append(3)
+    second = cache.get_or_compute("metrics", {"rate": 0.07}, compute)
+    cache.get_or_compute("metrics", {"rate": 0.08}, compute)
+
+    assert len(calls) == 2
+    np.testing.assert_array_equal(second["npv"], [1.0, 2.0])
+    assert second["years"] == [1, 2]
+    stats = cache.stats()["namespaces"]["metrics"]
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    for rate in (1, 2, 1, 3):  # 1 is used again before 3 arrives, so 2 is the one evicted
+        cache.get_or_compute("metrics", rate, lambda: rate)
+    assert cache.stats()["namespaces"]["metrics"]["evictions"] == 1
+    assert cache.get_or_compute("metrics", 1, lambda: "recomputed") == 1
+    assert cache.get_or_compute("metrics", 2, lambda: "recomputed") == "recomputed"
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+    cache = ResultCache(ttl_seconds=60)
+    cache.get_or_compute("metrics", 1, lambda: "first")
+    now[0] += 30
+    assert cache.get_or_compute("metrics", 1, lambda: "second") == "first"
+    now[0] += 31
+    assert cache.get_or_compute("metrics", 1, lambda: "second") == "second"
+    assert cache.stats()["namespaces"]["metrics"]["expirations"] == 1
+
+
+def test_disk_store_survives_a_new_cache(tmp_path):
+    ResultCache(disk_dir=str(tmp_path)).get_or_compute("sweep", {"horizon": 30}, lambda: {"npv": [1.0]}, persist=True)
+    cache = ResultCache(disk_dir=str(tmp_path))
+    assert cache.get_or_compute("sweep", {"horizon": 30}, lambda: None, persist=True) == {"npv": [1.0]}
+    assert cache.stats()["namespaces"]["sweep"]["disk_hits"] == 1
+
+    cache.clear(disk=True)
+    assert cache.get_or_compute("sweep", {"horizon": 30}, lambda: "recomputed", persist=True) == "recomputed"
+
+
+def test_disk_store_round_trips_numpy_results(tmp_path):
+    result = {
+        "percentiles": {5: -1.5, 50.0: 2.0},
+        "histogram": {"edges": np.linspace(0.0, 1.0, 4), "counts": np.array([3, 0, 7], dtype=np.int64)},
+        "inputs": ("price_active", "farm_size_acres"),
+        "labels": np.array(["Owned", "Rented"]),
+        "grid": np.zeros((0, 3)),
+        "best": np.int64(2),
+        "cvar": float("nan"),
+        "frontier": [np.array([1, 2])],
+        "__tuple__": "a key that looks like a tag",
+    }
+    ResultCache(disk_dir=str(tmp_path)).get_or_compute("farm_plan", {"seed": 1}, lambda: result, persist=True)
+    cached = ResultCache(disk_dir=str(tmp_path)).get_or_compute("farm_plan", {"seed": 1}, lambda: None, persist=True)
+
+    assert cached["percentiles"] == {5: -1.5, 50.0: 2.0}
+    assert cached["inputs"] == ("price_active", "farm_size_acres")
+    for path in (("histogram", "edges"), ("histogram", "counts")):
+        expected, actual = result[path[0]][path[1]], cached[path[0]][path[1]]
+        assert actual.dtype == expected.dtype
+        np.testing.assert_array_equal(actual, expected)
+    assert cached["labels"].tolist() == ["Owned", "Rented"] and cached["grid"].shape == (0, 3)
+    assert cached["best"] == 2 and np.isnan(cached["cvar"])
+    np.testing.assert_array_equal(cached["frontier"][0], [1, 2])
+    assert cached["__tuple__"] == "a key that looks like a tag"
+
+
+def test_get_and_put_share_entries_with_get_or_compute():
+    cache = ResultCache()
+    assert cache.get("monte_carlo", {"seed": 1}, "missing") == "missing"
+    result = {"mean": np.array([1.0])}
+    cache.put("monte_carlo", {"seed": 1}, result)
+    result["mean"][0] = -1.0  # the cache keeps its own copy
+    assert cache.get_or_compute("monte_carlo", {"seed": 1}, lambda: None)["mean"].tolist() == [1.0]
+    stats = cache.stats()["namespaces"]["monte_carlo"]
+    assert (stats["hits"], stats["misses"]) == (1, 1)
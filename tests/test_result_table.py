@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from conftest import scenario_columns
+
+from rice_analysis.batch_calculations import run_full_model_batch
+from rice_analysis.model_calculations import run_full_model
+from rice_analysis.result_table import RESULT_COLUMNS, ResultTable, concat_tables, run_full_model_table
+
+
+def test_table_matches_batch_outputs(scenarios):
+    columns = scenario_columns(scenarios)
+    table = run_full_model_table(columns)
+    expected = run_full_model_batch(columns)
+    assert len(table) == len(scenarios)
+    for name in RESULT_COLUMNS:
+        np.testing.assert_array_equal(table.column(name), expected[name])
+    np.testing.assert_array_equal(ResultTable.from_columns(expected).block, table.block)
+
+
+def test_table_from_model_results_matches_batch(scenarios):
+    table = ResultTable.from_model_results([run_full_model(params) for params in scenarios])
+    np.testing.assert_array_equal(table.block, run_full_model_table(scenario_columns(scenarios)).block)
+
+
+def test_rows_sections_and_take(scenarios):
+    table = run_full_model_table(scenario_columns(scenarios))
+    result = run_full_model(scenarios[7])
+    assert table.row(7)["net_profit_before_tax"] == result["profitability"]["net_profit_before_tax"]
+    assert dict(table.section("roi", 7)) == result["roi"]
+    subset = table.take([7, 3])
+    np.testing.assert_array_equal(subset.block, table.block[:, [7, 3]])
+    np.testing.assert_array_equal(concat_tables([subset, subset]).block, table.block[:, [7, 3, 7, 3]])
+
+
+def test_rejects_blocks_of_the_wrong_shape():
+    with pytest.raises(ValueError, match="C-contiguous float64"):
+        ResultTable(np.zeros((len(RESULT_COLUMNS) - 1, 4)))
+    with pytest.raises(ValueError, match="C-contiguous float64"):
+        ResultTable(np.zeros((4, len(RESULT_COLUMNS))).T)
+
+
+def test_parquet_round_trip(tmp_path, scenarios):
+    pytest.importorskip("pyarrow")
+    table = run_full_model_table(scenario_columns(scenarios))
+    path = str(tmp_path / "results.parquet")
+    table.to_parquet(path)
+    np.testing.assert_array_equal(ResultTable.read_parquet(path).block, table.block)
+
+    import pyarrow.parquet as pq
+    schema = pq.read_schema(path)
+    assert schema.names == list(RESULT_COLUMNS)
+    assert schema.field("annual_operational_roi_percent").metadata[b"unit"] == b"percent"
+
+
+def test_arrow_shares_memory_and_nulls_read_as_nan(scenarios):
+    pa = pytest.importorskip("pyarrow")
+    table = run_full_model_table(scenario_columns(scenarios))
+    arrow = table.to_arrow()
+    assert arrow.column(0).chunk(0).buffers()[1].address == table.block[0].ctypes.data
+
+    values = arrow.column("net_profit_before_tax").to_pylist()
+    values[5] = None
+    with_null = arrow.set_column(RESULT_COLUMNS.index("net_profit_before_tax"), "net_profit_before_tax", pa.array(values))
+    restored = ResultTable.from_arrow(with_null.slice(2))
+    assert np.isnan(restored.column("net_profit_before_tax")[3])
+    np.testing.assert_array_equal(np.delete(restored.block, 3, axis=1), np.delete(table.block[:, 2:], 3, axis=1))
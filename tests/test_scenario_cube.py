@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from rice_analysis.batch_calculations import BATCH_OUTPUT_COLUMNS, params_to_columns, run_full_model_batch
+from rice_analysis.model_calculations import DEFAULT_SCENARIO_PARAMS
+from rice_analysis.scenario_cube import build_scenario_cube, cube_cell, cube_slice, value_grid
+
+YIELDS = value_grid(60.0, 90.0, 7, extra_values=(75.0, 77.5))
+PRICES = value_grid(12.0, 18.0, 5)
+
+
+@pytest.fixture(scope="module")
+def cube():
+    base = dict(params_to_columns(DEFAULT_SCENARIO_PARAMS), land_purchase_cost=150_000.0, annual_land_rent_per_acre=120.0)
+    return base, build_scenario_cube(base, YIELDS, PRICES)
+
+
+def test_value_grid_merges_extra_points():
+    assert YIELDS.tolist() == [60.0, 65.0, 70.0, 75.0, 77.5, 80.0, 85.0, 90.0]
+    assert value_grid(3.0, 9.0, 1).tolist() == [3.0]
+
+
+@pytest.mark.parametrize("i, j, tenure, ratoon", [(0, 0, "Owned", "Yes"), (4, 2, "Rented", "No"), (7, 4, "Owned", "No"),
+                                                  (3, 1, "Rented", "Yes")])
+def test_cells_match_run_full_model_batch(cube, i, j, tenure, ratoon):
+    base, cube = cube
+    expected = run_full_model_batch(dict(base, main_crop_yield_active=YIELDS[i], price_active=PRICES[j],
+                                         land_tenure=tenure, ratoon_crop_cultivation=ratoon))
+    cell = cube_cell(cube, YIELDS[i] + 0.01, PRICES[j] - 0.01, tenure, ratoon)  # nearest grid point
+    assert cell == {name: float(expected[name][0]) for name in BATCH_OUTPUT_COLUMNS}
+
+
+def test_slice_is_a_view_of_one_choice(cube):
+    base, cube = cube
+    npbt = cube_slice(cube, "net_profit_before_tax", "Rented", "Yes")
+    assert npbt.shape == (YIELDS.size, PRICES.size)
+    assert np.shares_memory(npbt, cube["metrics"]["net_profit_before_tax"])
+    expected = run_full_model_batch(dict(base, main_crop_yield_active=np.repeat(YIELDS, PRICES.size),
+                                         price_active=np.tile(PRICES, YIELDS.size), land_tenure="Rented",
+                                         ratoon_crop_cultivation="Yes"))
+    np.testing.assert_array_equal(npbt.ravel(), expected["net_profit_before_tax"])
@@ -0,0 +1,120 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from rice_analysis import scoring_service
+from rice_analysis.batch_calculations import BATCH_OUTPUT_COLUMNS
+from rice_analysis.model_calculations import DEFAULT_SCENARIO_PARAMS, run_full_model
+from rice_analysis.scoring_service import BudgetRegistry, MicroBatcher, ScoringServer, _Pending, parse_scenario
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = ScoringServer(("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _post(server, body, headers=None):
+    data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    try:
+        connection.putrequest("POST", "/score")
+        for name, value in (headers or {"Content-Length": str(len(data))}).items():
+            connection.putheader(name, value)
+        connection.endheaders()
+        connection.send(data)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def test_scores_a_scenario(server):
+    status, result = _post(server, dict(DEFAULT_SCENARIO_PARAMS, id="base"))
+    assert status == 200
+    assert result["id"] == "base"
+    expected = run_full_model(DEFAULT_SCENARIO_PARAMS)["profitability"]["net_profit_before_tax"]
+    assert result["net_profit_before_tax"] == pytest.approx(expected)
+
+
+def test_scores_a_list_in_order(server):
+    status, results = _post(server, [dict(DEFAULT_SCENARIO_PARAMS, id=i, farm_size_acres=100.0 * i) for i in (1, 2, 3)])
+    assert status == 200
+    assert [result["id"] for result in results] == [1, 2, 3]
+
+
+@pytest.mark.parametrize("body", [
+    b"{not json",
+    b"",
+    b"[1, 2]",
+    dict(DEFAULT_SCENARIO_PARAMS, farm_size_acres="many"),
+    dict(DEFAULT_SCENARIO_PARAMS, farm_size_acres=[50.0]),
+    dict(DEFAULT_SCENARIO_PARAMS, land_tenure="Leased"),
+    dict(DEFAULT_SCENARIO_PARAMS, land_tenure={"Owned": True}),
+    dict(DEFAULT_SCENARIO_PARAMS, ratoon_crop_cultivation=["Yes"]),
+    dict(DEFAULT_SCENARIO_PARAMS, active_price_scenario="Unknown"),
+    dict(DEFAULT_SCENARIO_PARAMS, budget_id=["default"]),
+    dict(DEFAULT_SCENARIO_PARAMS, budget_id="no-such-budget"),
+    {"farm_size_acres": 50.0},
+])
+def test_malformed_bodies_get_400(server, body):
+    status, result = _post(server, body)
+    assert status == 400
+    assert result["error"]
+
+
+@pytest.mark.parametrize("length", ["abc", "-3", "1e3"])
+def test_bad_content_length_gets_400(server, length):
+    status, result = _post(server, b"{}", {"Content-Length": length})
+    assert status == 400
+    assert "Content-Length" in result["error"]
+
+
+def test_service_keeps_serving_after_errors(server):
+    _post(server, b"{not json")
+    status, _ = _post(server, DEFAULT_SCENARIO_PARAMS)
+    assert status == 200
+
+
+def test_batch_failure_only_fails_the_request_that_caused_it():
+    class Budgets(BudgetRegistry):
+        def get(self, budget_id):
+            if budget_id == "broken":
+                raise RuntimeError("budget failed to compile")
+            return super().get(budget_id)
+
+    batcher = MicroBatcher(Budgets())
+    try:
+        good = parse_scenario(DEFAULT_SCENARIO_PARAMS, {}, batcher.budgets)
+        batch = [_Pending([good, good]), _Pending([good[:3] + ("broken",)]), _Pending([good])]
+        batcher._evaluate(batch, 4)
+    finally:
+        batcher.close()
+    assert all(pending.done.is_set() for pending in batch)
+    assert isinstance(batch[1].error, RuntimeError) and batch[1].results is None
+    expected = run_full_model(DEFAULT_SCENARIO_PARAMS)["profitability"]["net_profit_before_tax"]
+    for pending in (batch[0], batch[2]):
+        assert pending.error is None
+        assert [values[BATCH_OUTPUT_COLUMNS.index("net_profit_before_tax")] for values, _ in pending.results] == \
+            pytest.approx([expected] * len(pending.rows))
+
+
+def test_scoring_errors_get_500(server, monkeypatch):
+    def fail(rows, budgets):
+        raise RuntimeError("out of memory")
+
+    monkeypatch.setattr(scoring_service, "evaluate_scenarios", fail)
+    status, result = _post(server, DEFAULT_SCENARIO_PARAMS)
+    assert status == 500
+    assert "out of memory" in result["error"]
+
+    monkeypatch.undo()
+    status, _ = _post(server, DEFAULT_SCENARIO_PARAMS)
+    assert status == 200
@@ -0,0 +1,53 @@
+import copy
+
+import numpy as np
+
+from conftest import scenario_columns
+from rice_analysis.batch_calculations import run_full_model_batch
+from rice_analysis.budgets import compile_budget
+from rice_analysis.model_calculations import AGRILIFE_DEFAULTS
+from rice_analysis.sensitivity import (SCENARIO_INPUTS, SENSITIVITY_METRICS, budget_input_names,
+                                       calculate_sensitivities)
+
+
+def _central_difference(evaluate, step):
+    upper, lower = evaluate(step), evaluate(-step)
+    return {metric: (upper[metric] - lower[metric]) / (2 * step) for metric in SENSITIVITY_METRICS}
+
+
+def _assert_gradients_match(sensitivities, name, estimate):
+    column = sensitivities["inputs"].index(name)
+    for metric in SENSITIVITY_METRICS:
+        exact = sensitivities["gradients"][metric][:, column]
+        np.testing.assert_allclose(exact, estimate[metric], rtol=1e-5, atol=1e-6 * (1 + np.abs(exact).max()),
+                                   err_msg=f"d {metric} / d {name}")
+
+
+def test_scenario_gradients_match_finite_differences(scenarios):
+    columns = scenario_columns(scenarios)
+    sensitivities = calculate_sensitivities(columns)
+    for name in SCENARIO_INPUTS:
+        def evaluate(step):
+            return run_full_model_batch(dict(columns, **{name: columns[name] + step}))
+        _assert_gradients_match(sensitivities, name, _central_difference(evaluate, 1e-3))
+
+
+def test_budget_gradients_match_finite_differences(scenarios):
+    columns = scenario_columns(scenarios)
+    sensitivities = calculate_sensitivities(columns)
+    for name in budget_input_names():
+        section, item = name.split(".", 1)
+
+        def evaluate(step):
+            budget = copy.deepcopy(AGRILIFE_DEFAULTS)
+            budget[section][item] += step
+            return run_full_model_batch(columns, compile_budget(budget))
+        _assert_gradients_match(sensitivities, name, _central_difference(evaluate, 1e-3))
+
+
+def test_break_even_price_zeroes_profit(scenarios):
+    columns = scenario_columns(scenarios)
+    break_even = calculate_sensitivities(columns)["break_even"]["price_active"]
+    results = run_full_model_batch(dict(columns, price_active=break_even))
+    np.testing.assert_allclose(results["net_profit_before_tax"], 0.0,
+                               atol=1e-7 * np.abs(results["total_annual_operational_costs"]).max())
@@ -0,0 +1,34 @@
+import json
+
+import numpy as np
+
+from rice_analysis.table_io import TableWriter, iter_table_chunks
+
+
+def test_jsonl_writes_null_for_non_finite_values(tmp_path):
+    path = tmp_path / "results.jsonl"
+    with TableWriter(str(path)) as writer:
+        writer.write({
+            "scenario_id": np.array([1, 2, 3, 4]),
+            "land_tenure": np.array(["Owned", "Rented", "Owned", "Rented"]),
+            "net_profit_before_tax": np.array([1.5, np.nan, np.inf, -np.inf]),
+        })
+
+    rows = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [row["net_profit_before_tax"] for row in rows] == [1.5, None, None, None]
+    assert [row["scenario_id"] for row in rows] == [1, 2, 3, 4]
+    assert [row["land_tenure"] for row in rows] == ["Owned", "Rented", "Owned", "Rented"]
+
+
+def test_jsonl_round_trip(tmp_path):
+    path = tmp_path / "scenarios.jsonl"
+    columns = {"farm_size_acres": np.array([50.0, 0.1, 1e6]), "land_tenure": np.array(["Owned", "Rented", "Owned"])}
+    with TableWriter(str(path)) as writer:
+        writer.write(columns)
+        writer.write(columns)
+
+    chunks = list(iter_table_chunks(str(path), chunk_rows=4))
+    assert [chunk["farm_size_acres"].size for chunk in chunks] == [4, 2]
+    np.testing.assert_array_equal(np.concatenate([chunk["farm_size_acres"] for chunk in chunks]),
+                                  np.tile(columns["farm_size_acres"], 2))
+    assert np.concatenate([chunk["land_tenure"] for chunk in chunks]).tolist() == ["Owned", "Rented", "Owned"] * 2